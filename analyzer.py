@@ -0,0 +1,769 @@
+"""
+Анализ собранных данных без ноутбука
+Конвейер analysis.ipynb в виде этапов: загрузка -> очистка -> предобработка ->
+тональность, намерение и темы -> агрегаты -> графики -> отчет.
+
+Результат каждого этапа сохраняется в data/analysis_cache/ под ключом из хэша
+входных данных (размер и время изменения файлов, параметры, ключи предыдущих
+этапов) и исходного кода функций этапа. Если ключ не изменился, этап берется из
+кэша, а предыдущие этапы не загружаются вовсе: после правки только графиков
+повторный запуск читает из кэша одни агрегаты
+"""
+
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import lexicon_matcher
+import lexicons
+from lexicons import LDA_STOPWORDS, SENTIMENT_LABELS
+import label_cache
+from label_cache import LABEL_CACHE_PATH, USE_LABEL_CACHE, LabelCache, label_texts
+from merge_all_data import KINDS, load_merged
+import scoring_executor
+import text_preprocessing
+from text_preprocessing import preprocess_series
+from topic_index import TopicIndex
+
+
+CACHE_DIR = 'data/analysis_cache'
+VISUALIZATIONS_DIR = 'data/visualizations'
+
+# Увеличить, если меняется формат файлов кэша
+CACHE_VERSION = 1
+
+# Минимальная длина текста после очистки (символов)
+MIN_TEXT_LENGTH = {'posts': 10, 'comments': 3}
+
+LENGTH_BINS = [0, 50, 100, 200, 500, float('inf')]
+LENGTH_LABELS = ['Очень короткие (0-50)', 'Короткие (50-100)', 'Средние (100-200)',
+                 'Длинные (200-500)', 'Очень длинные (500+)']
+
+LDA_TOPICS = 5
+
+
+# ---------------------------------------------------------------------------
+# Кэш этапов
+# ---------------------------------------------------------------------------
+
+def _code_hash(code: Sequence) -> str:
+    """Хэш исходного кода функций и модулей этапа"""
+    digest = hashlib.sha1()
+    for item in code:
+        try:
+            digest.update(inspect.getsource(item).encode('utf-8'))
+        except (OSError, TypeError):
+            digest.update(repr(item).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def file_signature(path: str) -> Dict:
+    """Подпись файла для ключа кэша: путь, размер, время изменения"""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class Pipeline:
+    """
+    Этапы анализа с кэшем результатов на диске
+
+    Этап - функция, которая получает результаты этапов deps (в том же порядке)
+    и именованные params. Ключ этапа зависит от имени, кода (сама функция и
+    перечисленные в code), params и ключей этапов deps. Результаты вычисляются
+    лениво: этап из кэша не требует загрузки предыдущих
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, use_cache: bool = True):
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.stages = {}
+        self._keys = {}
+        self._results = {}
+        self.sources = {}
+
+    def add(self, name: str, func: Callable, deps: Sequence[str] = (), code: Sequence = (),
+            params: Optional[Dict] = None, cache: bool = True):
+        """
+        Добавить этап
+
+        Args:
+            name: Имя этапа
+            func: Функция этапа
+            deps: Имена этапов, результаты которых передаются в функцию
+            code: Дополнительные функции и модули, от кода которых зависит результат
+            params: Параметры этапа (должны сериализоваться в JSON)
+            cache: Сохранять ли результат на диск
+        """
+        self.stages[name] = {'func': func, 'deps': list(deps), 'code': [func] + list(code),
+                             'params': params or {}, 'cache': cache}
+
+    def key(self, name: str) -> str:
+        """Ключ кэша этапа"""
+        if name not in self._keys:
+            stage = self.stages[name]
+            payload = json.dumps({
+                'version': CACHE_VERSION,
+                'stage': name,
+                'code': _code_hash(stage['code']),
+                'params': stage['params'],
+                'deps': [self.key(dep) for dep in stage['deps']],
+            }, sort_keys=True, default=str)
+            self._keys[name] = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        return self._keys[name]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}_{self.key(name)[:16]}.pkl")
+
+    def _load(self, name: str):
+        path = self._path(name)
+        if not (self.use_cache and self.stages[name]['cache'] and os.path.exists(path)):
+            return False, None
+        try:
+            with open(path, 'rb') as f:
+                return True, pickle.load(f)
+        except Exception as e:
+            print(f"⚠ Кэш этапа {name} не прочитан: {e}")
+            return False, None
+
+    def _save(self, name: str, result):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(name)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠ Кэш этапа {name} не сохранен: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        # Результаты этого этапа с другими ключами больше не понадобятся
+        for old_path in glob.glob(os.path.join(self.cache_dir, f"{name}_*.pkl")):
+            if old_path != path:
+                os.remove(old_path)
+
+    def get(self, name: str):
+        """Результат этапа: из памяти, из кэша или вычисленный заново"""
+        if name in self._results:
+            return self._results[name]
+        found, result = self._load(name)
+        if found:
+            self.sources[name] = 'кэш'
+        else:
+            stage = self.stages[name]
+            args = [self.get(dep) for dep in stage['deps']]
+            print(f"→ Этап {name}...")
+            result = stage['func'](*args, **stage['params'])
+            self.sources[name] = 'вычислено'
+            if self.use_cache and stage['cache']:
+                self._save(name, result)
+        self._results[name] = result
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Этапы
+# ---------------------------------------------------------------------------
+
+def load_stage(posts_path: Dict, comments_path: Dict) -> Dict:
+    """Загрузка объединенных файлов и колонки года и месяца"""
+    frames = {}
+    for kind, signature in (('posts', posts_path), ('comments', comments_path)):
+        frame = load_merged(kind, signature['path'])
+        frame['date'] = pd.to_datetime(frame['date'])
+        frame['year'] = frame['date'].dt.year
+        frame['month'] = frame['date'].dt.month
+        frame['year_month'] = frame['date'].dt.to_period('M')
+        frames[kind] = frame
+        print(f"✓ Загружено {KINDS[kind]['label']}: {len(frame):,}")
+    return frames
+
+
+def clean_stage(frames: Dict, min_text_length: Dict = MIN_TEXT_LENGTH) -> Dict:
+    """Удаление дубликатов и записей с пустым или слишком коротким текстом (короче min_text_length[kind])"""
+    result = {'stats': {}}
+    for kind, frame in frames.items():
+        initial = len(frame)
+        frame = frame.drop_duplicates(subset=['owner_id', KINDS[kind]['id']], keep='first')
+        duplicates = initial - len(frame)
+        frame = frame[frame['text'].notna()]
+        frame = frame[frame['text'].astype(str).str.strip() != '']
+        frame = frame[frame['text_length'] >= min_text_length[kind]]
+        result[kind] = frame.reset_index(drop=True)
+        result['stats'][kind] = {'initial': initial, 'duplicates': duplicates,
+                                 'short': initial - duplicates - len(frame), 'rows': len(frame)}
+    return result
+
+
+def preprocess_stage(cleaned: Dict, workers: Optional[int] = None) -> Dict:
+    """Предобработанные тексты постов и комментариев (Series с индексом очищенных таблиц)"""
+    return {kind: preprocess_series(cleaned[kind]['text'], workers=workers) for kind in ('posts', 'comments')}
+
+
+def score_stage(cleaned: Dict, processed: Dict, label_cache_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Тональность и намерение по предобработанному тексту, темы по исходному (в пуле процессов)
+
+    label_cache_path - файл кэша меток: оцениваются только комментарии, которых в нем нет
+    """
+    cache = LabelCache(label_cache_path) if label_cache_path else None
+    try:
+        scores = label_texts(processed['comments'], cleaned['comments']['text'], cache)
+    finally:
+        if cache is not None:
+            stats = cache.stats()
+            print(f"✓ Кэш меток: {stats['hits']:,} найдено, {stats['misses']:,} оценено, "
+                  f"записей {stats['entries']:,}")
+            cache.close()
+    scores['sentiment_label'] = scores['sentiment'].map(SENTIMENT_LABELS)
+    return scores
+
+
+def _period_sentiment(comments: pd.DataFrame, by, count_label: str) -> pd.DataFrame:
+    """Средняя тональность, число комментариев и средние лайки по группам"""
+    table = comments.groupby(by, observed=False).agg({'sentiment': ['mean', 'count'], 'likes': 'mean'})
+    table.columns = ['Средняя_тональность', count_label, 'Средние_лайки']
+    return table
+
+
+def _top_words(texts: pd.Series) -> Counter:
+    """Частоты слов длиннее 3 символов"""
+    return Counter(word for text in texts.astype(str) for word in text.split() if len(word) > 3)
+
+
+def _forecast(yearly: pd.DataFrame) -> Optional[Dict]:
+    """Линейный тренд средней тональности по годам и прогноз на следующий год"""
+    if len(yearly) < 2:
+        return None
+    years = yearly.index.to_numpy(dtype=float)
+    values = yearly['Средняя_тональность'].to_numpy(dtype=float)
+    slope, intercept = np.polyfit(years, values, 1)
+    fitted = slope * years + intercept
+    residual = float(((values - fitted) ** 2).sum())
+    total = float(((values - values.mean()) ** 2).sum())
+    next_year = int(years.max()) + 1
+    return {
+        'years': years.astype(int).tolist(),
+        'values': values.tolist(),
+        'fitted': fitted.tolist(),
+        'next_year': next_year,
+        'predicted': float(slope * next_year + intercept),
+        'slope': float(slope),
+        'r2': 1 - residual / total if total else (1.0 if residual == 0 else 0.0),
+        'mse': residual / len(values),
+    }
+
+
+def aggregates_stage(cleaned: Dict, processed: Dict, scores: pd.DataFrame, length_bins: List = LENGTH_BINS,
+                     length_labels: List = LENGTH_LABELS) -> Dict:
+    """Все таблицы и показатели для графиков и отчета (length_bins, length_labels - группы по длине текста)"""
+    posts = cleaned['posts']
+    comments = cleaned['comments'].assign(text_processed=processed['comments'], **scores)
+    result = {'clean': cleaned['stats']}
+
+    result['posts_stats'] = {
+        'count': len(posts),
+        'likes_mean': posts['likes'].mean(),
+        'likes_median': posts['likes'].median(),
+        'likes_max': posts['likes'].max(),
+        'reposts_mean': posts['reposts'].mean(),
+        'comments_mean': posts['comments_count'].mean(),
+        'engagement_mean': posts['engagement'].mean(),
+        'text_length_mean': posts['text_length'].mean(),
+        'processed_length_mean': processed['posts'].str.len().mean(),
+        'views_sum': posts['views'].sum(),
+        'start': posts['date'].min(),
+        'end': posts['date'].max(),
+    }
+    result['comments_stats'] = {
+        'count': len(comments),
+        'likes_mean': comments['likes'].mean(),
+        'likes_max': comments['likes'].max(),
+        'text_length_mean': comments['text_length'].mean(),
+        'processed_length_mean': comments['text_processed'].str.len().mean(),
+        'authors': comments['author_id'].nunique(),
+        'start': comments['date'].min(),
+        'end': comments['date'].max(),
+    }
+    result['likes'] = posts['likes'].to_numpy()
+    result['engagement'] = posts['engagement'].to_numpy()
+    result['posts_by_month'] = posts.groupby('year_month').size()
+
+    result['sentiment_counts'] = comments['sentiment'].value_counts()
+    result['intent_counts'] = comments['intent'].value_counts()
+    result['intent_sentiment'] = pd.crosstab(comments['intent'], comments['sentiment_label'],
+                                             normalize='index') * 100
+
+    result['yearly_sentiment'] = _period_sentiment(comments, 'year', 'Количество_комментариев')
+    year_quarter = comments['year'].astype(str) + '-Q' + comments['date'].dt.quarter.astype(str)
+    result['quarterly_sentiment'] = _period_sentiment(comments, year_quarter.rename('year_quarter'),
+                                                      'Количество')
+    length_category = pd.cut(comments['text_length'], bins=length_bins, labels=length_labels)
+    result['length_sentiment'] = _period_sentiment(comments, length_category.rename('text_length_category'),
+                                                   'Количество')
+
+    topic_index = TopicIndex.from_lists(comments['topics'])
+    result['topic_sentiment'] = sorted(topic_index.sentiment_summary(comments['sentiment']).items(),
+                                       key=lambda x: x[1]['count'], reverse=True)
+    result['topic_yearly'] = topic_index.crosstab(comments['year']).T
+
+    # Посты разных сообществ различаются по (owner_id, post_id)
+    keyed = comments.assign(owner_id=comments['owner_id'].astype('int64'),
+                            negative=comments['sentiment'] == -1, positive=comments['sentiment'] == 1)
+    post_sentiment = keyed.groupby(['owner_id', 'post_id']).agg(
+        Средняя_тональность=('sentiment', 'mean'), Всего_комментариев=('sentiment', 'count'),
+        Отрицательных=('negative', 'sum'), Положительных=('positive', 'sum'), Средние_лайки=('likes', 'mean'))
+    post_sentiment = post_sentiment.sort_values('Отрицательных', ascending=False)
+    posts_keyed = posts.assign(owner_id=posts['owner_id'].astype('int64'))
+    top_negative = post_sentiment.head(10).reset_index().merge(
+        posts_keyed[['owner_id', 'post_id', 'date', 'text', 'likes', 'comments_count']],
+        on=['owner_id', 'post_id'], how='left', suffixes=('', '_post'))
+    result['top_negative_posts'] = top_negative
+    posts_with_sentiment = posts_keyed.merge(
+        post_sentiment[['Средняя_тональность', 'Всего_комментариев', 'Отрицательных']].reset_index(),
+        on=['owner_id', 'post_id'], how='left')
+    result['correlation'] = posts_with_sentiment[['engagement', 'likes', 'comments_count',
+                                                  'Средняя_тональность']].corr()
+
+    result['yearly_words'] = {int(year): _top_words(comments.loc[comments['year'] == year, 'text_processed'])
+                              .most_common(10) for year in sorted(comments['year'].dropna().unique())}
+    positive_freq = _top_words(comments.loc[comments['sentiment'] == 1, 'text_processed'])
+    negative_freq = _top_words(comments.loc[comments['sentiment'] == -1, 'text_processed'])
+    result['positive_only'] = sorted(((w, positive_freq[w]) for w in positive_freq.keys() - negative_freq.keys()),
+                                     key=lambda x: x[1], reverse=True)[:15]
+    result['negative_only'] = sorted(((w, negative_freq[w]) for w in negative_freq.keys() - positive_freq.keys()),
+                                     key=lambda x: x[1], reverse=True)[:15]
+
+    result['forecast'] = _forecast(result['yearly_sentiment'])
+    return result
+
+
+def _gensim_version() -> Optional[str]:
+    try:
+        import gensim
+        return gensim.__version__
+    except ImportError:
+        return None
+
+
+def lda_stage(cleaned: Dict, processed: Dict, scores: pd.DataFrame, num_topics: int = LDA_TOPICS,
+              gensim_version: Optional[str] = None) -> Optional[Dict]:
+    """Тематическое моделирование нейтральных комментариев (LDA, нужен gensim)"""
+    if gensim_version is None:
+        print("⚠ Тематическое моделирование недоступно (требуется установка gensim)")
+        return None
+    from gensim import corpora
+    from gensim.models import LdaModel
+
+    neutral = processed['comments'][scores['sentiment'] == 0]
+    if len(neutral) <= 100:
+        print("⚠ Недостаточно нейтральных комментариев для анализа")
+        return None
+    texts = []
+    for text in neutral:
+        if text and len(text) > 3:
+            words = [w for w in text.split() if len(w) > 2 and w not in LDA_STOPWORDS]
+            if len(words) > 2:
+                texts.append(words)
+    if len(texts) <= 50:
+        print("⚠ Недостаточно текстов для тематического моделирования (нужно >50)")
+        return None
+
+    dictionary = corpora.Dictionary(texts)
+    dictionary.filter_extremes(no_below=5, no_above=0.5)
+    corpus = [dictionary.doc2bow(text) for text in texts]
+    lda_model = LdaModel(corpus=corpus, id2word=dictionary, num_topics=num_topics,
+                         random_state=42, passes=10, alpha='auto', per_word_topics=True)
+    topic_distribution = []
+    for doc in corpus:
+        topic_probs = lda_model.get_document_topics(doc)
+        if topic_probs:
+            topic_distribution.append(max(topic_probs, key=lambda x: x[1])[0])
+    topic_counts = Counter(topic_distribution)
+    examples = cleaned['comments'].loc[neutral.index[:100], 'text'].astype(str).tolist()
+    return {
+        'texts': len(texts),
+        'topics': lda_model.print_topics(num_words=10),
+        'counts': [topic_counts.get(i, 0) for i in range(num_topics)],
+        'examples': [examples[i % len(examples)][:80] + "..." for i in range(min(3, num_topics))] if examples else [],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Графики
+# ---------------------------------------------------------------------------
+
+def charts_stage(aggregates: Dict, lda: Optional[Dict], output_dir: str = VISUALIZATIONS_DIR) -> List[str]:
+    """
+    Графики ноутбука в output_dir (PNG, 300 dpi)
+
+    Returns:
+        Пути сохраненных файлов (пустой список, если matplotlib не установлен)
+    """
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠ matplotlib не установлен, графики пропущены")
+        return []
+    plt.rcParams['font.family'] = ['Arial Unicode MS', 'DejaVu Sans', 'sans-serif']
+    os.makedirs(output_dir, exist_ok=True)
+    saved = []
+
+    def save(fig, name):
+        path = os.path.join(output_dir, name)
+        fig.tight_layout()
+        fig.savefig(path, dpi=300, bbox_inches='tight')
+        plt.close(fig)
+        saved.append(path)
+
+    counts = aggregates['sentiment_counts']
+    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+    labels = ['Положительные', 'Нейтральные', 'Отрицательные']
+    values = [counts.get(1, 0), counts.get(0, 0), counts.get(-1, 0)]
+    colors = ['green', 'gray', 'red']
+    axes[0].pie(values, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90, textprops={'fontsize': 12})
+    axes[0].set_title('Распределение тональности комментариев', fontsize=14, fontweight='bold')
+    axes[1].bar(labels, values, color=colors, alpha=0.7, edgecolor='black')
+    axes[1].set_title('Количество комментариев по тональности', fontsize=14, fontweight='bold')
+    axes[1].set_ylabel('Количество комментариев')
+    axes[1].grid(True, alpha=0.3, axis='y')
+    save(fig, 'sentiment_distribution.png')
+
+    intent_counts = aggregates['intent_counts']
+    fig, axes = plt.subplots(1, 2, figsize=(18, 7))
+    intent_labels = [i.replace('_', ' ').title() for i in intent_counts.index]
+    colors_intent = plt.cm.Set3(range(len(intent_counts)))
+    axes[0].pie(intent_counts.values, labels=intent_labels, autopct='%1.1f%%',
+                colors=colors_intent, startangle=90, textprops={'fontsize': 10})
+    axes[0].set_title('Распределение комментариев по намерению', fontsize=14, fontweight='bold', pad=20)
+    axes[1].barh(range(len(intent_counts)), intent_counts.values, color=colors_intent, alpha=0.7, edgecolor='black')
+    axes[1].set_yticks(range(len(intent_counts)))
+    axes[1].set_yticklabels(intent_labels)
+    axes[1].set_title('Количество комментариев по типу намерения', fontsize=14, fontweight='bold')
+    axes[1].set_xlabel('Количество комментариев')
+    axes[1].grid(True, alpha=0.3, axis='x')
+    save(fig, 'intent_distribution.png')
+
+    yearly = aggregates['yearly_sentiment']
+    fig, axes = plt.subplots(2, 1, figsize=(14, 10))
+    axes[0].plot(yearly.index, yearly['Средняя_тональность'], marker='o', linewidth=3, markersize=10, color='blue')
+    axes[0].axhline(y=0, color='gray', linestyle='--', alpha=0.5, linewidth=1)
+    axes[0].set_title('Динамика тональности комментариев о медицине по годам', fontsize=14, fontweight='bold', pad=20)
+    axes[0].set_xlabel('Год', fontsize=12)
+    axes[0].set_ylabel('Средняя тональность\n(-1 = отрицательная, +1 = положительная)', fontsize=12)
+    axes[0].grid(True, alpha=0.3)
+    axes[0].set_ylim(-1, 1)
+    axes[1].bar(yearly.index, yearly['Количество_комментариев'], color='green', alpha=0.7, edgecolor='black')
+    axes[1].set_title('Количество комментариев по годам', fontsize=14, fontweight='bold', pad=20)
+    axes[1].set_xlabel('Год', fontsize=12)
+    axes[1].set_ylabel('Количество комментариев', fontsize=12)
+    axes[1].grid(True, alpha=0.3, axis='y')
+    save(fig, 'sentiment_timeline.png')
+
+    if lda:
+        fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+        topics_list = [f"Тема {i + 1}" for i in range(len(lda['counts']))]
+        axes[0].bar(topics_list, lda['counts'], color='steelblue', alpha=0.7, edgecolor='black')
+        axes[0].set_title('Распределение комментариев по темам', fontsize=14, fontweight='bold')
+        axes[0].set_ylabel('Количество комментариев')
+        axes[0].grid(True, alpha=0.3, axis='y')
+        axes[0].tick_params(axis='x', rotation=45)
+        axes[1].axis('off')
+        axes[1].text(0.1, 0.9, 'Примеры комментариев по темам:', fontsize=12, fontweight='bold',
+                     transform=axes[1].transAxes)
+        y_pos = 0.8
+        for topic_idx, example in enumerate(lda['examples']):
+            axes[1].text(0.1, y_pos, f'Тема {topic_idx + 1}:', fontsize=10, fontweight='bold',
+                         transform=axes[1].transAxes)
+            axes[1].text(0.15, y_pos - 0.1, example, fontsize=9, transform=axes[1].transAxes, wrap=True)
+            y_pos -= 0.25
+        save(fig, 'lda_topics.png')
+
+    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+    axes[0].hist(aggregates['likes'], bins=50, edgecolor='black', alpha=0.7, color='skyblue')
+    axes[0].set_title('Распределение лайков по постам', fontsize=14, fontweight='bold')
+    axes[0].set_xlabel('Количество лайков')
+    axes[0].set_ylabel('Частота')
+    axes[0].grid(True, alpha=0.3)
+    axes[1].hist(aggregates['engagement'], bins=50, edgecolor='black', alpha=0.7, color='lightgreen')
+    axes[1].set_title('Распределение engagement по постам', fontsize=14, fontweight='bold')
+    axes[1].set_xlabel('Engagement (лайки + репосты + комментарии)')
+    axes[1].set_ylabel('Частота')
+    axes[1].grid(True, alpha=0.3)
+    save(fig, 'likes_engagement_distribution.png')
+
+    fig, ax = plt.subplots(figsize=(16, 6))
+    aggregates['posts_by_month'].plot(kind='line', marker='o', linewidth=2, markersize=4, ax=ax)
+    ax.set_title('Динамика публикации постов по времени', fontsize=14, fontweight='bold', pad=20)
+    ax.set_xlabel('Период (год-месяц)', fontsize=12)
+    ax.set_ylabel('Количество постов', fontsize=12)
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(True, alpha=0.3)
+    save(fig, 'posts_timeline.png')
+
+    sorted_topics = aggregates['topic_sentiment'][:8]
+    if sorted_topics:
+        topics_list = [t[0] for t in sorted_topics]
+        sentiments = [t[1]['avg_sentiment'] for t in sorted_topics]
+        fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+        axes[0].barh(topics_list, [t[1]['count'] for t in sorted_topics], color='steelblue', alpha=0.7)
+        axes[0].set_title('Количество упоминаний тем', fontsize=14, fontweight='bold')
+        axes[0].set_xlabel('Количество упоминаний')
+        axes[0].grid(True, alpha=0.3, axis='x')
+        colors = ['green' if s > 0.1 else 'red' if s < -0.1 else 'gray' for s in sentiments]
+        axes[1].barh(topics_list, sentiments, color=colors, alpha=0.7)
+        axes[1].axvline(x=0, color='black', linestyle='--', alpha=0.5)
+        axes[1].set_title('Средняя тональность по темам', fontsize=14, fontweight='bold')
+        axes[1].set_xlabel('Тональность (-1 = отрицательная, +1 = положительная)')
+        axes[1].grid(True, alpha=0.3, axis='x')
+        save(fig, 'topics_analysis.png')
+
+    for table, name, title_mean, title_count, color in (
+            (aggregates['quarterly_sentiment'], 'quarterly_analysis.png', 'Динамика тональности по кварталам',
+             'Количество комментариев по кварталам', 'green'),
+            (aggregates['length_sentiment'], 'length_sentiment_analysis.png',
+             'Средняя тональность по длине комментариев', 'Распределение комментариев по длине', 'orange')):
+        quarterly = name == 'quarterly_analysis.png'
+        fig, axes = plt.subplots(2, 1, figsize=(16, 10)) if quarterly else plt.subplots(1, 2, figsize=(16, 6))
+        positions = range(len(table))
+        if quarterly:
+            axes[0].plot(positions, table['Средняя_тональность'], marker='o', linewidth=2, markersize=8, color='blue')
+            axes[0].set_ylim(-1, 1)
+        else:
+            axes[0].bar(positions, table['Средняя_тональность'], color='steelblue', alpha=0.7, edgecolor='black')
+        axes[0].axhline(y=0, color='gray', linestyle='--', alpha=0.5)
+        axes[1].bar(positions, table['Количество'], color=color, alpha=0.7, edgecolor='black')
+        for ax, title, ylabel in ((axes[0], title_mean, 'Средняя тональность'),
+                                  (axes[1], title_count, 'Количество комментариев')):
+            ax.set_xticks(positions)
+            ax.set_xticklabels(table.index.astype(str), rotation=45, ha='right')
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3, axis='y')
+        save(fig, name)
+
+    forecast = aggregates['forecast']
+    if forecast:
+        fig, ax = plt.subplots(figsize=(14, 8))
+        ax.plot(forecast['years'], forecast['values'], marker='o', linewidth=3, markersize=10,
+                label='Исторические данные', color='blue')
+        ax.plot(forecast['years'], forecast['fitted'], '--', linewidth=2, label='Линия регрессии',
+                color='green', alpha=0.7)
+        ax.plot([forecast['next_year']], [forecast['predicted']], marker='*', markersize=20,
+                label=f"Прогноз на {forecast['next_year']} год", color='red')
+        ax.set_xlabel('Год', fontsize=12)
+        ax.set_ylabel('Средняя тональность', fontsize=12)
+        ax.set_title('Прогнозирование тональности комментариев о медицине', fontsize=14, fontweight='bold', pad=20)
+        ax.legend(fontsize=11)
+        ax.grid(True, alpha=0.3)
+        ax.axhline(y=0, color='gray', linestyle=':', alpha=0.5)
+        save(fig, 'sentiment_forecast.png')
+
+    print(f"✓ Сохранено графиков: {len(saved)} в {output_dir}/")
+    return saved
+
+
+# ---------------------------------------------------------------------------
+# Отчет
+# ---------------------------------------------------------------------------
+
+def print_report(aggregates: Dict, lda: Optional[Dict]):
+    """Итоговый текстовый отчет"""
+    posts = aggregates['posts_stats']
+    comments = aggregates['comments_stats']
+    print("\n" + "=" * 70)
+    print("ОЧИСТКА ДАННЫХ")
+    print("=" * 70)
+    for kind, stats in aggregates['clean'].items():
+        print(f"{KINDS[kind]['title']}: было {stats['initial']:,}, дубликатов {stats['duplicates']:,}, "
+              f"пустых/коротких {stats['short']:,}, осталось {stats['rows']:,}")
+
+    print("\n" + "=" * 70)
+    print("БАЗОВАЯ СТАТИСТИКА")
+    print("=" * 70)
+    print(f"Постов: {posts['count']:,} ({posts['start']} - {posts['end']})")
+    print(f"  Лайки: среднее {posts['likes_mean']:.2f}, медиана {posts['likes_median']:.2f}, "
+          f"максимум {posts['likes_max']}")
+    print(f"  Репосты: {posts['reposts_mean']:.2f}, комментарии: {posts['comments_mean']:.2f}, "
+          f"engagement: {posts['engagement_mean']:.2f}")
+    print(f"  Длина текста: {posts['text_length_mean']:.1f} (после обработки {posts['processed_length_mean']:.1f})")
+    print(f"  Всего просмотров: {posts['views_sum']:,}")
+    print(f"Комментариев: {comments['count']:,} ({comments['start']} - {comments['end']})")
+    print(f"  Лайки: среднее {comments['likes_mean']:.2f}, максимум {comments['likes_max']}")
+    print(f"  Длина текста: {comments['text_length_mean']:.1f} "
+          f"(после обработки {comments['processed_length_mean']:.1f})")
+    print(f"  Уникальных авторов: {comments['authors']:,}")
+
+    total = max(comments['count'], 1)
+    counts = aggregates['sentiment_counts']
+    print("\n" + "=" * 70)
+    print("ТОНАЛЬНОСТЬ И НАМЕРЕНИЕ")
+    print("=" * 70)
+    for value, label in ((1, 'Положительных'), (0, 'Нейтральных'), (-1, 'Отрицательных')):
+        print(f"{label}: {counts.get(value, 0):,} ({counts.get(value, 0) / total * 100:.1f}%)")
+    print()
+    for intent, count in aggregates['intent_counts'].items():
+        print(f"  {intent.replace('_', ' ').title()}: {count:,} ({count / total * 100:.1f}%)")
+    print("\nСвязь намерения и тональности (%):")
+    print(aggregates['intent_sentiment'].round(1))
+
+    print("\nДинамика по годам:")
+    print(aggregates['yearly_sentiment'].round(3))
+    print("\nПо кварталам:")
+    print(aggregates['quarterly_sentiment'].round(3))
+    print("\nПо длине комментариев:")
+    print(aggregates['length_sentiment'].round(3))
+
+    print("\n" + "=" * 70)
+    print("КЛЮЧЕВЫЕ ТЕМЫ")
+    print("=" * 70)
+    for topic, stats in aggregates['topic_sentiment']:
+        print(f"{topic}: {stats['count']:,} упоминаний, положительных {stats['positive'] / stats['count'] * 100:.1f}%, "
+              f"отрицательных {stats['negative'] / stats['count'] * 100:.1f}%, "
+              f"средняя тональность {stats['avg_sentiment']:.3f}")
+    problem_topics = [(t, s) for t, s in aggregates['topic_sentiment'] if s['negative'] / s['count'] > 0.3]
+    if problem_topics:
+        print("Проблемные темы (>30% отрицательных): " + ', '.join(t for t, _ in problem_topics[:5]))
+    if not aggregates['topic_yearly'].empty:
+        print("\nУпоминания тем по годам:")
+        print(aggregates['topic_yearly'].to_string())
+
+    if lda:
+        print("\nТемы нейтральных комментариев (LDA):")
+        for idx, topic in enumerate(lda['topics']):
+            print(f"  Тема {idx + 1} ({lda['counts'][idx]:,}): {topic[1]}")
+
+    print("\nПосты с наибольшим числом отрицательных комментариев:")
+    for idx, row in enumerate(aggregates['top_negative_posts'].itertuples(index=False), 1):
+        text = '' if pd.isna(row.text) else str(row.text)
+        preview = text[:150] + "..." if len(text) > 150 else text
+        print(f"{idx}. Пост {row.owner_id}_{row.post_id}: {int(row.Отрицательных)} из "
+              f"{int(row.Всего_комментариев)} отрицательных - {preview}")
+    print("\nКорреляция тональности и активности:")
+    print(aggregates['correlation'].round(3))
+
+    print("\nЧастые слова по годам:")
+    for year, words in aggregates['yearly_words'].items():
+        print(f"  {year}: " + ', '.join(f"{word} ({count})" for word, count in words))
+    print("Только в положительных: " + ', '.join(w for w, _ in aggregates['positive_only']))
+    print("Только в отрицательных: " + ', '.join(w for w, _ in aggregates['negative_only']))
+
+    forecast = aggregates['forecast']
+    if forecast:
+        trend = 'улучшается' if forecast['slope'] > 0 else 'ухудшается' if forecast['slope'] < 0 else 'стабильна'
+        print(f"\nПрогноз на {forecast['next_year']} год: {forecast['predicted']:.3f} "
+              f"(тональность {trend}, R² {forecast['r2']:.3f}, MSE {forecast['mse']:.6f})")
+
+
+# ---------------------------------------------------------------------------
+# Запуск
+# ---------------------------------------------------------------------------
+
+def _find_merged(kind: str, data_dir: str) -> str:
+    """
+    Объединенный файл типа kind
+
+    Основной файл merge_all_data.py (vk_data_ALL_*_merged.csv) в data_dir, а без
+    него - самый новый из старых выгрузок vk_data_ALL_*
+    """
+    merged = os.path.join(data_dir, os.path.basename(KINDS[kind]['output']))
+    if os.path.exists(merged):
+        return merged
+    pattern = 'vk_data_ALL_POSTS_*.csv' if kind == 'posts' else 'vk_data_ALL_COMMENTS_*.csv'
+    files = glob.glob(os.path.join(data_dir, pattern))
+    if not files:
+        raise FileNotFoundError(f"Не найдены файлы {pattern} в папке {data_dir}/. "
+                                f"Сначала запустите merge_all_data.py")
+    return max(files, key=os.path.getmtime)
+
+
+def build_pipeline(posts_path: str, comments_path: str, cache_dir: str = CACHE_DIR, use_cache: bool = True,
+                   output_dir: str = VISUALIZATIONS_DIR) -> Pipeline:
+    """Конвейер анализа для объединенных файлов постов и комментариев"""
+    pipeline = Pipeline(cache_dir, use_cache)
+    pipeline.add('load', load_stage, code=[load_merged],
+                 params={'posts_path': file_signature(posts_path), 'comments_path': file_signature(comments_path)})
+    # Константы модуля, от которых зависит результат, передаются в params и входят в ключи этапов
+    pipeline.add('clean', clean_stage, deps=['load'], params={'min_text_length': MIN_TEXT_LENGTH})
+    pipeline.add('preprocess', preprocess_stage, deps=['clean'], code=[text_preprocessing])
+    pipeline.add('score', score_stage, deps=['clean', 'preprocess'],
+                 code=[lexicon_matcher, lexicons, scoring_executor, label_cache],
+                 params={'label_cache_path': LABEL_CACHE_PATH if use_cache and USE_LABEL_CACHE else None})
+    pipeline.add('aggregates', aggregates_stage, deps=['clean', 'preprocess', 'score'],
+                 code=[_period_sentiment, _top_words, _forecast, TopicIndex, lexicons],
+                 params={'length_bins': LENGTH_BINS, 'length_labels': LENGTH_LABELS})
+    pipeline.add('lda', lda_stage, deps=['clean', 'preprocess', 'score'], code=[lexicons],
+                 params={'num_topics': LDA_TOPICS, 'gensim_version': _gensim_version()})
+    pipeline.add('charts', charts_stage, deps=['aggregates', 'lda'], params={'output_dir': output_dir}, cache=False)
+    return pipeline
+
+
+def run_analysis(data_dir: str = 'data', posts_path: Optional[str] = None, comments_path: Optional[str] = None,
+                 use_cache: bool = True, charts: bool = True, cache_dir: str = CACHE_DIR,
+                 output_dir: str = VISUALIZATIONS_DIR) -> Dict:
+    """
+    Выполнить анализ
+
+    Args:
+        data_dir: Папка с объединенными файлами
+        posts_path: Файл постов (None - объединенный файл постов в data_dir)
+        comments_path: Файл комментариев (None - объединенный файл комментариев в data_dir)
+        use_cache: Брать неизменившиеся этапы из кэша и сохранять новые
+        charts: Строить графики
+        cache_dir: Папка кэша этапов
+        output_dir: Папка графиков
+
+    Returns:
+        Агрегаты анализа
+    """
+    pipeline = build_pipeline(posts_path or _find_merged('posts', data_dir),
+                              comments_path or _find_merged('comments', data_dir),
+                              cache_dir, use_cache, output_dir)
+    aggregates = pipeline.get('aggregates')
+    lda = pipeline.get('lda')
+    if charts:
+        pipeline.get('charts')
+    print_report(aggregates, lda)
+    print("\nИсточники этапов: " + ', '.join(f"{name} - {source}" for name, source in pipeline.sources.items()))
+    return aggregates
+
+
+def main():
+    """Анализ собранных данных (запускается из run.py или командной строки)"""
+    arg_parser = argparse.ArgumentParser(description='Анализ собранных данных')
+    arg_parser.add_argument('--data-dir', default='data', help='Папка с объединенными файлами')
+    arg_parser.add_argument('--posts', help='Файл постов')
+    arg_parser.add_argument('--comments', help='Файл комментариев')
+    arg_parser.add_argument('--cache-dir', default=CACHE_DIR, help='Папка кэша этапов')
+    arg_parser.add_argument('--output-dir', default=VISUALIZATIONS_DIR, help='Папка графиков')
+    arg_parser.add_argument('--no-cache', action='store_true', help='Пересчитать все этапы без кэша')
+    arg_parser.add_argument('--no-charts', action='store_true', help='Не строить графики')
+    # Из run.py main() вызывается без аргументов, аргументы меню не относятся к анализу
+    args = arg_parser.parse_args([] if __name__ != "__main__" else None)
+
+    print("=" * 60)
+    print("АНАЛИЗ ДАННЫХ")
+    print("=" * 60)
+    try:
+        run_analysis(args.data_dir, args.posts, args.comments, use_cache=not args.no_cache,
+                     charts=not args.no_charts, cache_dir=args.cache_dir, output_dir=args.output_dir)
+    except FileNotFoundError as e:
+        print(f"✗ {e}")
+    except Exception as e:
+        print(f"✗ Ошибка анализа: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Кэш ответов VK API на диске
+Ответы хранятся в SQLite в сжатом виде с ключом по методу и нормализованным
+параметрам. Срок хранения зависит от возраста данных: комментарии к старым
+постам почти не меняются и хранятся бессрочно, свежие данные - недолго
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+
+CACHE_PATH = 'data/cache/api_cache.sqlite'
+
+# Методы с постраничной выдачей по смещению: при появлении новых постов содержимое
+# страницы с тем же offset сдвигается, поэтому такие ответы хранятся только короткое время
+OFFSET_PAGED_METHODS = {'wall.get'}
+
+# Методы, ради которых запрашиваются счетчики (лайки, репосты, просмотры): они
+# меняются и у старых постов, поэтому такие ответы тоже хранятся только короткое время
+COUNTER_METHODS = {'wall.getById'}
+
+# Режимы работы кэша
+MODE_READWRITE = 'readwrite'  # читать из кэша, промахи запрашивать у API и сохранять
+MODE_REPLAY = 'replay'        # только чтение из кэша, промах - ошибка CacheMiss
+MODE_REFRESH = 'refresh'      # всегда запрашивать у API и обновлять кэш
+
+_MISSING = object()
+
+
+class CacheMiss(Exception):
+    """Ответа нет в кэше, а запросы к API запрещены (режим replay)"""
+
+
+class APICache:
+    """Потокобезопасный кэш ответов API с TTL по возрасту данных и вытеснением по размеру"""
+
+    def __init__(self, path: str = CACHE_PATH, mode: str = MODE_READWRITE,
+                 max_size_mb: float = 500, recent_ttl: int = 3600,
+                 immutable_after_days: int = 30, info_ttl: int = 86400):
+        """
+        Инициализация кэша
+
+        Args:
+            path: Путь к файлу SQLite
+            mode: Режим работы: 'readwrite', 'replay' или 'refresh'
+            max_size_mb: Максимальный суммарный размер сжатых ответов (МБ)
+            recent_ttl: Срок хранения ответов со свежими данными (секунды)
+            immutable_after_days: Возраст данных, после которого ответ хранится бессрочно
+            info_ttl: Срок хранения ответов без дат (информация о группах и пользователях)
+        """
+        if mode not in (MODE_READWRITE, MODE_REPLAY, MODE_REFRESH):
+            raise ValueError(f"Неизвестный режим кэша: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.recent_ttl = recent_ttl
+        self.immutable_after = immutable_after_days * 86400
+        self.info_ttl = info_ttl
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " method TEXT NOT NULL,"
+            " data BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(method: str, params: Dict) -> str:
+        """
+        Ключ кэша по методу и нормализованным параметрам
+
+        Значения приводятся к строкам, а пустые параметры отбрасываются, поэтому
+        owner_id=-1 и owner_id='-1' дают один и тот же ключ.
+        """
+        normalized = {k: str(v) for k, v in params.items() if v is not None and k not in ('access_token', 'v')}
+        payload = json.dumps([method, normalized], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def ttl_for(self, method: str, params: Dict, response) -> Optional[int]:
+        """
+        Срок хранения ответа в секундах (None - бессрочно)
+
+        Ответ считается неизменным, если самая новая дата в нем старше
+        immutable_after_days. Для execute учитываются вложенные вызовы.
+        """
+        methods = {method}
+        if method == 'execute':
+            methods = set(re.findall(r'API\.([\w.]+)\(', params.get('code', '')))
+        if methods & (OFFSET_PAGED_METHODS | COUNTER_METHODS):
+            return self.recent_ttl
+
+        dates = []
+        has_pages = False
+        responses = response if isinstance(response, list) and method == 'execute' else [response]
+        for item in responses:
+            if isinstance(item, dict) and 'items' in item:
+                has_pages = True
+                dates.extend(entry.get('date', 0) for entry in item['items'] if isinstance(entry, dict))
+        if not has_pages:
+            # Справочная информация о группах и пользователях
+            return self.info_ttl
+        if dates and time.time() - max(dates) > self.immutable_after:
+            return None
+        # Свежие данные и пустые страницы еще могут измениться
+        return self.recent_ttl
+
+    def get(self, method: str, params: Dict):
+        """
+        Ответ из кэша
+
+        Returns:
+            Сохраненный ответ или _MISSING
+
+        Raises:
+            CacheMiss: в режиме replay, если ответа нет
+        """
+        if self.mode == MODE_REFRESH:
+            return _MISSING
+        key = self.make_key(method, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            # В режиме replay устаревшие ответы тоже используются: обновить их все равно нельзя
+            if row and (row[1] is None or row[1] > now or self.mode == MODE_REPLAY):
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return json.loads(zlib.decompress(row[0]))
+            self.misses += 1
+        if self.mode == MODE_REPLAY:
+            raise CacheMiss(f"Нет ответа в кэше для {method} {params}")
+        return _MISSING
+
+    def put(self, method: str, params: Dict, response):
+        """
+        Сохранить ответ API
+
+        Ответ execute, в котором часть вложенных вызовов не выполнилась (False),
+        не сохраняется: иначе временный сбой повторялся бы из кэша
+        """
+        if self.mode == MODE_REPLAY:
+            return
+        if method == 'execute' and isinstance(response, list) and any(item is False for item in response):
+            return
+        key = self.make_key(method, params)
+        data = zlib.compress(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+        ttl = self.ttl_for(method, params, response)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, method, data, size, created_at, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, method, data, len(data), now, now + ttl if ttl is not None else None, now)
+            )
+            self._size += len(data) - (old[0] if old else 0)
+            if self._size > self.max_size:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Удалить просроченные, затем давно не использованные ответы до 90% лимита"""
+        self._conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = int(self.max_size * 0.9)
+        while self._size > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 500"
+            ).fetchall()
+            if not rows:
+                break
+            removed = []
+            for key, size in rows:
+                if self._size <= target:
+                    break
+                removed.append((key,))
+                self._size -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+
+    def call(self, method: str, params: Dict, fetch):
+        """
+        Вернуть ответ из кэша или получить его через fetch() и сохранить
+
+        Args:
+            method: Название метода API
+            params: Параметры метода
+            fetch: Функция без аргументов, выполняющая запрос к API
+        """
+        cached = self.get(method, params)
+        if cached is not _MISSING:
+            return cached
+        response = fetch()
+        self.put(method, params, response)
+        return response
+
+    async def call_async(self, method: str, params: Dict, fetch):
+        """Асинхронный вариант call: fetch - корутинная функция без аргументов"""
+        cached = self.get(method, params)
+        if cached is not _MISSING:
+            return cached
+        response = await fetch()
+        self.put(method, params, response)
+        return response
+
+    def stats(self) -> Dict:
+        """Попадания, промахи и размер кэша"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {'hits': self.hits, 'misses': self.misses, 'entries': entries,
+                    'size_mb': round(self._size / 1024 / 1024, 2)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
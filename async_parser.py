@@ -0,0 +1,589 @@
+"""
+Асинхронный парсер данных из ВКонтакте
+Тот же набор методов, что у VKParser, поверх пула keep-alive соединений aiohttp.
+Запросы не ждут друг друга: одновременно в работе находится столько запросов,
+сколько позволяет бюджет токена, поэтому время сбора определяется лимитом
+частоты API, а не задержкой сети
+"""
+
+import asyncio
+import threading
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+from vk_api.exceptions import ApiError
+
+from api_cache import APICache, CacheMiss
+from checkpoint import CheckpointStore
+from parser import VKParser
+from parser_common import (EXECUTE_BATCH_SIZE, POSTS_PAGE_SIZE, OffsetSearch, PostPager, TargetRun,
+                           comments_closed, empty_comments_page, is_screen_name)
+from normalizer import POST_COLUMNS, COMMENT_COLUMNS, posts_frame, comments_frame
+from rate_limiter import RateLimiter, RateLimitError, default_rate_limiter
+from sinks import CSVSink, TargetSink
+
+
+API_URL = 'https://api.vk.ru/method'
+
+# Та же версия API, что у vk_api по умолчанию: ответы совпадают с VKParser
+API_VERSION = '5.92'
+
+
+class AsyncVKParser:
+    """
+    Асинхронный парсер ВКонтакте
+
+    Использование:
+        async with AsyncVKParser(token) as parser:
+            data = await parser.parse_target('-123')
+    """
+
+    def __init__(self, access_token: str, rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[APICache] = None, api_url: Optional[str] = None,
+                 max_in_flight: int = 10):
+        """
+        Инициализация парсера
+
+        Args:
+            access_token: Токен доступа VK API
+            rate_limiter: Ограничитель частоты запросов (по умолчанию общий для всех парсеров)
+            cache: Кэш ответов API (None - без кэша)
+            api_url: Адрес API (по умолчанию https://api.vk.ru/method)
+            max_in_flight: Максимальное число одновременных HTTP-соединений
+        """
+        self.access_token = access_token
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.cache = cache
+        self.api_url = (api_url or API_URL).rstrip('/')
+        self.max_in_flight = max_in_flight
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def open(self):
+        """Создать пул соединений (вызывается внутри работающего цикла событий)"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=60))
+
+    async def close(self):
+        """Закрыть пул соединений"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _request(self, method: str, params: Dict):
+        """Один HTTP-запрос к методу API"""
+        data = {k: str(v) for k, v in params.items() if v is not None}
+        data['access_token'] = self.access_token
+        data['v'] = API_VERSION
+        async with self._session.post(f"{self.api_url}/{method}", data=data) as response:
+            response.raise_for_status()
+            body = await response.json(content_type=None)
+        if 'error' in body:
+            raise ApiError(None, method, params, False, body['error'])
+        return body['response']
+
+    async def _call(self, method: str, **params):
+        """
+        Вызвать метод API с учетом бюджета токена и повторами при ошибках 6/9/10
+
+        Если задан кэш, ответ сначала ищется в нем.
+        """
+        async def fetch():
+            return await self.rate_limiter.call_async(self.access_token, self._request, method, params)
+
+        if self.cache:
+            return await self.cache.call_async(method, params, fetch)
+        return await fetch()
+
+    async def execute_calls(self, calls: List[Tuple[str, Dict]]) -> List:
+        """
+        Выполнить до EXECUTE_BATCH_SIZE методов API одним запросом execute
+
+        Returns:
+            Список ответов в порядке вызовов; для неудавшихся вызовов - False
+        """
+        if len(calls) > EXECUTE_BATCH_SIZE:
+            raise ValueError(f"execute поддерживает не более {EXECUTE_BATCH_SIZE} вызовов")
+
+        results = await self._call('execute', code=VKParser.build_execute_code(calls))
+        # VK может вернуть null вместо массива, если все вызовы завершились ошибкой
+        if not isinstance(results, list):
+            return [False] * len(calls)
+        return results
+
+    async def _execute_chunk(self, chunk: List[Tuple[str, Dict]]) -> List:
+        try:
+            if len(chunk) == 1:
+                # Одиночный вызов дешевле выполнить напрямую
+                return [await self._call(chunk[0][0], **chunk[0][1])]
+            return await self.execute_calls(chunk)
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            if len(chunk) == 1:
+                print(f"Ошибка при вызове {chunk[0][0]}: {e}")
+                return [False]
+            print(f"Ошибка execute: {e}. Перехожу к вызовам по одному")
+        return await asyncio.gather(*(self._call_or_false(method, params) for method, params in chunk))
+
+    async def _call_or_false(self, method: str, params: Dict):
+        try:
+            return await self._call(method, **params)
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при вызове {method}: {e}")
+            return False
+
+    async def execute_many(self, calls: List[Tuple[str, Dict]]) -> List:
+        """
+        Выполнить произвольное количество методов API, упаковывая их в execute
+
+        Пакеты по EXECUTE_BATCH_SIZE вызовов отправляются одновременно.
+
+        Returns:
+            Список ответов в порядке вызовов; для неудавшихся вызовов - False
+        """
+        chunks = [calls[i:i + EXECUTE_BATCH_SIZE] for i in range(0, len(calls), EXECUTE_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._execute_chunk(chunk) for chunk in chunks))
+        return [response for chunk_results in results for response in chunk_results]
+
+    async def get_group_by_screen_name(self, screen_name: str) -> Dict:
+        """Получить информацию о группе по короткому имени (screen_name), включая owner_id"""
+        try:
+            screen_name = screen_name.lstrip('@/')
+            groups = await self._call('groups.getById', group_id=screen_name)
+            if groups:
+                group_info = groups[0]
+                group_info['owner_id'] = f"-{group_info['id']}"
+                return group_info
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при получении информации о группе {screen_name}: {e}")
+        return {}
+
+    async def get_group_info(self, group_id: str) -> Dict:
+        """Получить информацию о группе по ID (с минусом или без)"""
+        try:
+            groups = await self._call('groups.getById', group_id=group_id.lstrip('-'))
+            if groups:
+                return groups[0]
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при получении информации о группе {group_id}: {e}")
+        return {}
+
+    async def get_user_info(self, user_id: str) -> Dict:
+        """Получить информацию о пользователе"""
+        try:
+            users = await self._call('users.get', user_ids=user_id, fields='city,country,sex,bdate')
+            if users:
+                return users[0]
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при получении информации о пользователе {user_id}: {e}")
+        return {}
+
+    async def get_posts(self, owner_id: str, count: int = 100, offset: int = 0) -> List[Dict]:
+        """Получить страницу постов со стены"""
+        try:
+            posts = await self._call('wall.get', owner_id=owner_id, count=min(count, 100),
+                                     offset=offset, extended=0)
+            return posts.get('items', [])
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при получении постов для {owner_id}: {e}")
+            return []
+
+    async def get_posts_batch(self, owner_id: str, offsets: List[int], count: int = 100) -> List[List[Dict]]:
+        """Получить несколько страниц постов (до EXECUTE_BATCH_SIZE) одним запросом execute"""
+        calls = [
+            ('wall.get', {'owner_id': owner_id, 'count': min(count, 100), 'offset': offset, 'extended': 0})
+            for offset in offsets
+        ]
+        try:
+            responses = await self.execute_calls(calls)
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка execute при получении постов для {owner_id}: {e}. Перехожу к постраничным запросам")
+            return list(await asyncio.gather(*(self.get_posts(owner_id, count, offset) for offset in offsets)))
+
+        async def page(offset, response):
+            if response:
+                return response.get('items', [])
+            # Отдельный вызов внутри execute завершился ошибкой - повторяем его напрямую
+            return await self.get_posts(owner_id, count=count, offset=offset)
+
+        return list(await asyncio.gather(*(page(o, r) for o, r in zip(offsets, responses))))
+
+    async def find_offset_for_date(self, owner_id: str, timestamp: int) -> int:
+        """
+        Найти смещение первого поста стены, опубликованного не позже timestamp
+
+        Алгоритм тот же, что у VKParser.find_offset_for_date.
+        """
+        try:
+            head = await self._call('wall.get', owner_id=owner_id, count=2, offset=0, extended=0)
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при поиске смещения для {owner_id}: {e}. Начинаю с начала стены")
+            return 0
+
+        search = OffsetSearch(head, timestamp)
+        while not search.done:
+            probes = search.probes()
+            responses = await self.execute_many(OffsetSearch.probe_calls(owner_id, probes))
+            if not search.update(probes, responses):
+                break
+        return search.lo
+
+    async def iter_post_pages(self, owner_id: str, max_posts: int = 100,
+                              start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None,
+                              seek: bool = True) -> AsyncIterator[List[Dict]]:
+        """
+        Постранично получить посты с фильтрацией по дате (как VKParser.iter_post_pages)
+
+        Следующий пакет страниц запрашивается заранее, пока обрабатывается текущий.
+
+        Yields:
+            Непустые страницы постов, отфильтрованных по дате, от новых к старым
+        """
+        pager = PostPager(max_posts, start_date, end_date)
+        if seek and pager.end_timestamp:
+            pager.offset = await self.find_offset_for_date(owner_id, pager.end_timestamp)
+            if pager.offset:
+                print(f"Начало периода найдено на смещении {pager.offset}", flush=True)
+
+        def fetch_batch(batch_offset):
+            return asyncio.ensure_future(self.get_posts_batch(owner_id, pager.plan(batch_offset),
+                                                              count=POSTS_PAGE_SIZE))
+
+        next_batch = fetch_batch(pager.offset)
+        try:
+            while not pager.done:
+                pages = await (next_batch or fetch_batch(pager.offset))
+                next_batch = None
+                # Если все страницы полные и их может не хватить, следующий пакет
+                # начинается сразу за ними - запрашиваем его заранее
+                prefetch_offset = pager.prefetch_offset(pages)
+                if prefetch_offset is not None:
+                    next_batch = fetch_batch(prefetch_offset)
+                for posts in pager.consume(pages):
+                    yield posts
+        finally:
+            if next_batch:
+                next_batch.cancel()
+
+    async def get_all_posts(self, owner_id: str, max_posts: int = 100,
+                            start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None,
+                            seek: bool = True) -> List[Dict]:
+        """Получить все посты с учетом ограничений API и фильтрации по дате"""
+        all_posts = []
+        async for page in self.iter_post_pages(owner_id, max_posts, start_date, end_date, seek):
+            all_posts.extend(page)
+        return all_posts
+
+    async def get_comments(self, owner_id: str, post_id: int, max_comments: Optional[int] = 50) -> List[Dict]:
+        """
+        Получить комментарии к посту
+
+        Args:
+            owner_id: ID владельца поста
+            post_id: ID поста
+            max_comments: Максимальное количество комментариев
+                (None - все комментарии вместе с ветками ответов)
+        """
+        if max_comments is None:
+            return await self.get_all_comments(owner_id, post_id)
+        try:
+            comments = await self._call('wall.getComments', owner_id=owner_id, post_id=post_id,
+                                        count=min(max_comments, 100), extended=0, need_likes=1)
+            return comments.get('items', [])
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при получении комментариев для поста {post_id}: {e}")
+            return []
+
+    async def _retry_comment_call(self, method: str, params: Dict):
+        try:
+            return await self._call(method, **params)
+        except ApiError as e:
+            if not comments_closed(e):
+                raise
+            return empty_comments_page()
+
+    async def _get_comment_pages(self, calls: List[Tuple[str, Dict]]) -> List:
+        """
+        Выполнить вызовы wall.getComments пакетами execute (как VKParser._get_comment_pages)
+
+        Вызовы, завершившиеся внутри execute ошибкой (False), повторяются по
+        одному. Пустой страницей считается только ошибка закрытых комментариев,
+        другие ошибки пробрасываются
+        """
+        responses = await self.execute_many(calls)
+        failed = [i for i, response in enumerate(responses) if response is False]
+        retried = await asyncio.gather(*(self._retry_comment_call(*calls[i]) for i in failed))
+        for i, response in zip(failed, retried):
+            responses[i] = response
+        return responses
+
+    async def get_comments_batch(self, owner_id: str, post_ids: List[int],
+                                 max_comments: int = 50) -> Dict[int, List[Dict]]:
+        """Получить первые max_comments комментариев к нескольким постам (пакеты отправляются одновременно)"""
+        responses = await self._get_comment_pages([
+            ('wall.getComments', {'owner_id': owner_id, 'post_id': post_id,
+                                  'count': min(max_comments, 100), 'extended': 0, 'need_likes': 1})
+            for post_id in post_ids
+        ])
+        return {post_id: (response or {}).get('items', []) for post_id, response in zip(post_ids, responses)}
+
+    async def _complete_threads(self, owner_id: str, post_id: int, items: List[Dict]) -> List[Dict]:
+        """Комментарии страницы вместе с полными ветками ответов (ответы сразу за родителем)"""
+        calls = []
+        call_owners = []
+        for comment in items:
+            thread = comment.get('thread') or {}
+            for offset in range(len(thread.get('items', [])), thread.get('count', 0), 100):
+                calls.append(('wall.getComments',
+                              VKParser._comments_page_params(owner_id, post_id, offset, comment_id=comment['id'])))
+                call_owners.append(comment['id'])
+
+        extra_replies = {}
+        for comment_id, response in zip(call_owners, await self._get_comment_pages(calls)):
+            if response:
+                extra_replies.setdefault(comment_id, []).extend(response.get('items', []))
+
+        comments = []
+        for comment in items:
+            thread = comment.get('thread') or {}
+            replies = thread.pop('items', [])
+            comments.append(comment)
+            comments.extend(replies)
+            comments.extend(extra_replies.get(comment['id'], []))
+        return comments
+
+    async def get_all_comments(self, owner_id: str, post_id: int,
+                               comments_count: Optional[int] = None,
+                               thread_items_count: int = 10,
+                               first_page: Optional[Dict] = None) -> List[Dict]:
+        """
+        Получить все комментарии к посту вместе с ветками ответов
+
+        После первой страницы число страниц известно, поэтому все остальные
+        запрашиваются одновременно.
+
+        Args:
+            owner_id: ID владельца поста
+            post_id: ID поста
+            comments_count: comments.count поста, если известен
+            thread_items_count: Сколько ответов получать вместе с комментарием (не более 10)
+            first_page: Уже полученная первая страница
+
+        Returns:
+            Комментарии в хронологическом порядке, ответы - сразу за родителем
+        """
+        if comments_count == 0:
+            return []
+
+        page_size = 100
+
+        def page_call(offset):
+            return ('wall.getComments',
+                    VKParser._comments_page_params(owner_id, post_id, offset, thread_items_count))
+
+        if first_page is None:
+            planned_pages = -(-comments_count // page_size) if comments_count else 1
+            offsets = [i * page_size for i in range(min(planned_pages, EXECUTE_BATCH_SIZE))]
+            pages = await self._get_comment_pages([page_call(offset) for offset in offsets])
+        else:
+            offsets = [0]
+            pages = [first_page]
+
+        first = pages[0] or {}
+        total = first.get('current_level_count', first.get('count', 0))
+        rest = list(range(offsets[-1] + page_size, total, page_size))
+        if rest:
+            pages = list(pages) + await self._get_comment_pages([page_call(offset) for offset in rest])
+
+        threads = await asyncio.gather(*(
+            self._complete_threads(owner_id, post_id, page.get('items', []))
+            for page in pages if page
+        ))
+        return [comment for thread in threads for comment in thread]
+
+    async def harvest_comments(self, owner_id: str, posts: List[Dict],
+                               thread_items_count: int = 10) -> Dict[int, List[Dict]]:
+        """
+        Получить все комментарии и ответы для списка постов
+
+        Первые страницы запрашиваются пакетами по EXECUTE_BATCH_SIZE постов, все пакеты
+        и дополнительные страницы отправляются одновременно.
+
+        Returns:
+            Словарь {post_id: комментарии} в порядке постов
+        """
+        pending = [post for post in posts if (post.get('comments') or {}).get('count', 1) > 0]
+
+        async def harvest_chunk(chunk):
+            first_pages = await self._get_comment_pages([
+                ('wall.getComments', VKParser._comments_page_params(owner_id, post['id'], 0, thread_items_count))
+                for post in chunk
+            ])
+            return await asyncio.gather(*(
+                self.get_all_comments(owner_id, post['id'],
+                                      comments_count=(post.get('comments') or {}).get('count'),
+                                      thread_items_count=thread_items_count,
+                                      first_page=first_page or {})
+                for post, first_page in zip(chunk, first_pages)
+            ))
+
+        chunks = [pending[i:i + EXECUTE_BATCH_SIZE] for i in range(0, len(pending), EXECUTE_BATCH_SIZE)]
+        results = await asyncio.gather(*(harvest_chunk(chunk) for chunk in chunks))
+        comments_by_post = {post.get('id'): [] for post in posts}
+        for chunk, chunk_comments in zip(chunks, results):
+            for post, comments in zip(chunk, chunk_comments):
+                comments_by_post[post['id']] = comments
+        return comments_by_post
+
+    async def get_posts_comments(self, owner_id: str, posts: List[Dict], max_comments: Optional[int] = 50,
+                                 batch_comments: bool = True) -> Dict[int, List[Dict]]:
+        """
+        Получить комментарии к постам
+
+        Args:
+            owner_id: ID владельца постов
+            posts: Посты
+            max_comments: Максимальное количество комментариев на пост
+                (None - все комментарии вместе с ветками ответов)
+            batch_comments: Получать комментарии пакетами через execute
+
+        Returns:
+            Словарь {post_id: комментарии} в порядке постов
+        """
+        if max_comments is None:
+            return await self.harvest_comments(owner_id, posts)
+        post_ids = [post.get('id') for post in posts]
+        if batch_comments:
+            return await self.get_comments_batch(owner_id, post_ids, max_comments)
+        comments = await asyncio.gather(*(self.get_comments(owner_id, post_id, max_comments) for post_id in post_ids))
+        return dict(zip(post_ids, comments))
+
+    async def parse_target(self, target_id: str, max_posts: int = 100, max_comments: Optional[int] = 50,
+                           years_back: int = None, batch_comments: bool = True,
+                           checkpoints: Optional[CheckpointStore] = None,
+                           comment_refresh_days: int = 3, sink: Optional[TargetSink] = None) -> Dict:
+        """
+        Полный парсинг целевого объекта (группы или пользователя)
+
+        Параметры и результат те же, что у VKParser.parse_target.
+        """
+        print(f"Начинаю парсинг {target_id}...", flush=True)
+
+        owner_id = target_id
+        if is_screen_name(target_id):
+            print(f"Определен screen_name: {target_id}", flush=True)
+            info = await self.get_group_by_screen_name(target_id)
+            if info and 'owner_id' in info:
+                owner_id = info['owner_id']
+                print(f"Найден ID группы: {owner_id}", flush=True)
+            else:
+                print(f"Ошибка: не удалось найти группу {target_id}", flush=True)
+                return {}
+        elif target_id.startswith('-'):
+            info = await self.get_group_info(target_id)
+        else:
+            info = await self.get_user_info(target_id.lstrip('-'))
+
+        if sink:
+            sink.open_target(target_id, owner_id, info)
+
+        run = TargetRun(target_id, years_back, checkpoints, comment_refresh_days, sink)
+
+        print(f"Получаю посты и комментарии...", flush=True)
+        async for page in self.iter_post_pages(owner_id, max_posts, start_date=run.start_date,
+                                               end_date=run.end_date, seek=False):
+            posts_to_process = run.add_posts(page)
+            comments_by_post = await self.get_posts_comments(owner_id, posts_to_process,
+                                                             max_comments, batch_comments)
+            for post_id, comments in comments_by_post.items():
+                run.add_comments(post_id, comments)
+            run.commit_page(posts_to_process)
+
+        return run.result(owner_id, info)
+
+
+class AsyncBackedVKParser:
+    """
+    Синхронный интерфейс VKParser поверх AsyncVKParser
+
+    Цикл событий работает в отдельном потоке, поэтому методы можно вызывать из
+    обычного кода и из потоков data_collector без изменений.
+    """
+
+    def __init__(self, access_token: str, rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[APICache] = None, api_url: Optional[str] = None,
+                 max_in_flight: int = 10):
+        """
+        Args:
+            access_token: Токен доступа VK API
+            rate_limiter: Ограничитель частоты запросов (по умолчанию общий для всех парсеров)
+            cache: Кэш ответов API (None - без кэша)
+            api_url: Адрес API (по умолчанию https://api.vk.ru/method)
+            max_in_flight: Максимальное число одновременных HTTP-соединений
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.parser = AsyncVKParser(access_token, rate_limiter, cache, api_url, max_in_flight)
+        self._run(self.parser.open())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_posts(self, owner_id: str, count: int = 100, offset: int = 0) -> List[Dict]:
+        return self._run(self.parser.get_posts(owner_id, count, offset))
+
+    def get_all_posts(self, owner_id: str, max_posts: int = 100,
+                      start_date: Optional[datetime] = None,
+                      end_date: Optional[datetime] = None, seek: bool = True) -> List[Dict]:
+        return self._run(self.parser.get_all_posts(owner_id, max_posts, start_date, end_date, seek))
+
+    def get_comments(self, owner_id: str, post_id: int, max_comments: Optional[int] = 50) -> List[Dict]:
+        return self._run(self.parser.get_comments(owner_id, post_id, max_comments))
+
+    def parse_target(self, target_id: str, **kwargs) -> Dict:
+        return self._run(self.parser.parse_target(target_id, **kwargs))
+
+    def create_sink(self, base_filename: str, compress: bool = False,
+                    shared_posts: Optional[CSVSink] = None,
+                    shared_comments: Optional[CSVSink] = None, raw=None) -> TargetSink:
+        """Создать приемник данных цели (см. VKParser.create_sink)"""
+        return TargetSink(base_filename, POST_COLUMNS, COMMENT_COLUMNS,
+                          posts_frame, comments_frame, compress=compress,
+                          shared_posts=shared_posts, shared_comments=shared_comments, raw=raw)
+
+    def close(self):
+        """Закрыть соединения и остановить цикл событий"""
+        if self._loop.is_running():
+            self._run(self.parser.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
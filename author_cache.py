@@ -0,0 +1,100 @@
+"""
+Кэш сведений об авторах комментариев
+Хранит в SQLite ответы users.get и groups.getById по ID автора, чтобы повторные
+запуски обогащения запрашивали у API только новых авторов. Записи старше TTL
+считаются устаревшими и запрашиваются заново
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable
+
+
+AUTHOR_CACHE_PATH = 'data/cache/authors.sqlite'
+
+# Максимальное число параметров в одном SQL запросе
+_SQL_BATCH = 500
+
+
+class AuthorCache:
+    """Потокобезопасный кэш авторов: пользователи с положительным ID, сообщества - с отрицательным"""
+
+    def __init__(self, path: str = AUTHOR_CACHE_PATH, ttl_days: float = 30):
+        """
+        Инициализация кэша
+
+        Args:
+            path: Путь к файлу SQLite
+            ttl_days: Срок хранения сведений об авторе (дни)
+        """
+        self.path = path
+        self.ttl = ttl_days * 86400
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS authors ("
+            " author_id INTEGER PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, author_ids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Актуальные записи об авторах
+
+        Args:
+            author_ids: ID авторов
+
+        Returns:
+            Словарь ID -> сведения для авторов, найденных в кэше и не устаревших.
+            Для авторов, которых API не вернул, сведения содержат 'missing': True
+        """
+        ids = list(author_ids)
+        since = time.time() - self.ttl
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), _SQL_BATCH):
+                chunk = ids[i:i + _SQL_BATCH]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT author_id, data FROM authors WHERE author_id IN ({placeholders}) AND fetched_at > ?",
+                    (*chunk, since)
+                ).fetchall()
+                found.update((author_id, json.loads(data)) for author_id, data in rows)
+        return found
+
+    def put_many(self, records: Dict[int, Dict]):
+        """
+        Сохранить сведения об авторах
+
+        Args:
+            records: Словарь ID -> сведения (ответ API или {'missing': True})
+        """
+        now = time.time()
+        rows = [(author_id, json.dumps(data, ensure_ascii=False), now) for author_id, data in records.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO authors (author_id, data, fetched_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Количество записей в кэше, в том числе устаревших"""
+        with self._lock:
+            total, stale = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(fetched_at <= ?), 0) FROM authors",
+                (time.time() - self.ttl,)
+            ).fetchone()
+        return {'entries': total, 'stale': stale}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,215 @@
+"""
+Замеры скорости сбора данных на локальной заглушке VK API
+Запускает vk_stub_server в фоне и измеряет время, запросы в секунду и посты
+в секунду для parse_target, collect_data и collect_additional_data. Сбор идет
+во временной папке с конфигурацией, подставленной вместо config.py
+
+Запуск:
+    python benchmark.py
+    python benchmark.py --posts 5000 --latency 0.05 --rate 3 --output bench.json
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+import parser as vk_parser
+from parser import VKParser
+from rate_limiter import RateLimiter
+from vk_stub_server import StubServer
+
+
+BENCHMARK_TOKEN = 'benchmark-token'
+
+
+def make_rate_limiter(args) -> RateLimiter:
+    """
+    Ограничитель с заданной скоростью
+
+    Скорость не снижается на ошибках заглушки, а повторы быстрые, чтобы
+    искусственные ошибки не искажали замер.
+    """
+    return RateLimiter(rate=args.rate, min_rate=args.rate, max_rate=args.rate, burst=max(1.0, args.rate),
+                       backoff_base=0.05, backoff_max=1.0)
+
+
+def install_config(server: StubServer, args):
+    """Подставить модуль config, направляющий скрипты сбора на заглушку"""
+    config = types.ModuleType('config')
+    config.VK_ACCESS_TOKEN = BENCHMARK_TOKEN
+    config.VK_ACCESS_TOKENS = [f"{BENCHMARK_TOKEN}-{i}" for i in range(args.tokens)] if args.tokens > 1 else []
+    config.TARGET_IDS = [f"-{i + 1}" for i in range(args.targets)]
+    config.MAX_POSTS_PER_GROUP = args.posts
+    config.MAX_COMMENTS_PER_POST = None
+    config.YEARS_BACK = args.years_back
+    config.VK_API_URL = server.api_url
+    config.USE_ASYNC_PARSER = args.use_async
+    config.ASYNC_MAX_IN_FLIGHT = args.in_flight
+    sys.modules['config'] = config
+    # Скрипты читают конфигурацию при импорте, поэтому импортируем их заново
+    for name in ('data_collector', 'collect_additional_data'):
+        sys.modules.pop(name, None)
+    # Парсеры, создаваемые скриптами, используют общий ограничитель
+    vk_parser.default_rate_limiter = make_rate_limiter(args)
+
+
+def count_rows(pattern: str) -> int:
+    """Суммарное число строк в CSV файлах по маске"""
+    return sum(len(pd.read_csv(path, encoding='utf-8-sig')) for path in glob.glob(pattern))
+
+
+def measure(name: str, server: StubServer, func: Callable[[], Tuple[int, int]], verbose: bool) -> Dict:
+    """
+    Выполнить замер
+
+    Args:
+        name: Название замера
+        server: Заглушка API (по ней считаются запросы)
+        func: Функция сбора, возвращающая (число постов, число комментариев)
+        verbose: Показывать вывод сбора
+
+    Returns:
+        Результаты замера
+    """
+    server.api.reset_stats()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        posts, comments = func()
+    elapsed = time.perf_counter() - start
+    stats = server.api.stats()
+    requests = stats.get('requests', 0)
+    return {
+        'benchmark': name,
+        'seconds': round(elapsed, 3),
+        'requests': requests,
+        'api_calls': stats.get('calls', 0),
+        'errors': stats.get('errors', 0),
+        'posts': posts,
+        'comments': comments,
+        'requests_per_sec': round(requests / elapsed, 2) if elapsed else 0.0,
+        'posts_per_sec': round(posts / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def bench_parse_target(server: StubServer, args) -> Tuple[int, int]:
+    parser = VKParser(BENCHMARK_TOKEN, rate_limiter=make_rate_limiter(args), api_url=server.api_url)
+    data = parser.parse_target('-1', max_posts=args.posts, max_comments=None, years_back=args.years_back)
+    return len(data['posts']), len(data['comments'])
+
+
+def bench_parse_target_async(server: StubServer, args) -> Tuple[int, int]:
+    from async_parser import AsyncBackedVKParser
+    parser = AsyncBackedVKParser(BENCHMARK_TOKEN, rate_limiter=make_rate_limiter(args), api_url=server.api_url,
+                                 max_in_flight=args.in_flight)
+    try:
+        data = parser.parse_target('-1', max_posts=args.posts, max_comments=None, years_back=args.years_back)
+    finally:
+        parser.close()
+    return len(data['posts']), len(data['comments'])
+
+
+def bench_collect_data(server: StubServer, args) -> Tuple[int, int]:
+    install_config(server, args)
+    importlib.import_module('data_collector').collect_data()
+    summary_files = glob.glob('data/vk_data_summary_*.json')
+    if not summary_files:
+        return 0, 0
+    with open(max(summary_files, key=os.path.getmtime), 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    return summary['posts_count'], summary['comments_count']
+
+
+def bench_collect_additional_data(server: StubServer, args) -> Tuple[int, int]:
+    install_config(server, args)
+    importlib.import_module('collect_additional_data').main()
+    # Файлы по годам: vk_data_<цель>_<год>_<время>_posts.csv
+    return (count_rows('data/vk_data_*_[12][0-9][0-9][0-9]_*_posts.csv'),
+            count_rows('data/vk_data_*_[12][0-9][0-9][0-9]_*_comments.csv'))
+
+
+BENCHMARKS = {
+    'parse_target': bench_parse_target,
+    'parse_target_async': bench_parse_target_async,
+    'collect_data': bench_collect_data,
+    'collect_additional_data': bench_collect_additional_data,
+}
+
+
+def print_results(results):
+    print("\n" + "=" * 96)
+    print(f"{'Замер':<26}{'Время, с':>10}{'Запросов':>10}{'Вызовов':>10}{'Ошибок':>8}"
+          f"{'Постов':>9}{'Коммент.':>10}{'Запр/с':>9}{'Постов/с':>10}")
+    print("-" * 96)
+    for r in results:
+        print(f"{r['benchmark']:<26}{r['seconds']:>10.2f}{r['requests']:>10}{r['api_calls']:>10}{r['errors']:>8}"
+              f"{r['posts']:>9}{r['comments']:>10}{r['requests_per_sec']:>9.1f}{r['posts_per_sec']:>10.1f}")
+    print("=" * 96)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Замеры скорости сбора на заглушке VK API')
+    arg_parser.add_argument('--posts', type=int, default=2000, help='Постов на каждой стене')
+    arg_parser.add_argument('--comments', type=int, default=3, help='Среднее число комментариев на пост')
+    arg_parser.add_argument('--replies', type=int, default=1, help='Среднее число ответов на комментарий')
+    arg_parser.add_argument('--interval', type=int, default=0,
+                            help='Интервал между постами, с (по умолчанию стена уходит в 2019 год)')
+    arg_parser.add_argument('--targets', type=int, default=2, help='Количество целей для collect_data')
+    arg_parser.add_argument('--tokens', type=int, default=1, help='Количество токенов для collect_data')
+    arg_parser.add_argument('--years-back', type=int, default=1, help='YEARS_BACK для collect_data')
+    arg_parser.add_argument('--rate', type=float, default=1000.0, help='Запросов в секунду на токен')
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа заглушки, с')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов с ошибкой 6')
+    arg_parser.add_argument('--rps-limit', type=float, default=0, help='Лимит заглушки, запросов в секунду')
+    arg_parser.add_argument('--async', dest='use_async', action='store_true',
+                            help='collect_data через асинхронный парсер')
+    arg_parser.add_argument('--in-flight', type=int, default=10, help='Одновременных запросов у асинхронного парсера')
+    arg_parser.add_argument('--only', choices=list(BENCHMARKS), action='append', help='Выполнить только эти замеры')
+    arg_parser.add_argument('--output', help='Сохранить результаты в JSON')
+    arg_parser.add_argument('--verbose', action='store_true', help='Показывать вывод сбора')
+    args = arg_parser.parse_args()
+
+    interval = args.interval or int((time.time() - datetime(2019, 6, 1).timestamp()) / args.posts)
+    server = StubServer(posts=args.posts, comments_per_post=args.comments, replies_per_comment=args.replies,
+                        interval=interval, latency=args.latency, error_rate=args.error_rate,
+                        rps_limit=args.rps_limit)
+
+    print(f"Заглушка: {args.posts} постов на стене, интервал {interval} с, задержка {args.latency} с, "
+          f"ошибки {args.error_rate:.0%}, скорость {args.rate} запр/с")
+
+    results = []
+    cwd = os.getcwd()
+    with server, tempfile.TemporaryDirectory() as workdir:
+        sys.path.insert(0, cwd)
+        os.chdir(workdir)
+        os.makedirs('data', exist_ok=True)
+        try:
+            for name, bench in BENCHMARKS.items():
+                if args.only and name not in args.only:
+                    continue
+                print(f"Замер {name}...", flush=True)
+                results.append(measure(name, server, lambda: bench(server, args), args.verbose))
+        finally:
+            os.chdir(cwd)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'params': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"✓ Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
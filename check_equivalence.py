@@ -0,0 +1,219 @@
+"""
+Проверка совпадения пакетной обработки текстов с построчными функциями ноутбука
+Генерирует случайные тексты с трудными случаями (пробельные символы Unicode,
+конечная сигма, İ, разделитель \\x1e внутри текста, URL, упоминания, пропуски
+и нестроковые значения, слова словарей в разном регистре) и сравнивает
+preprocess_series с построчной preprocess_text, а LexiconMatcher (оба способа
+поиска) - с исходными improved_sentiment_analysis, classify_intent и
+find_topics из analysis.ipynb. Маленькие части (--chunk-rows) проверяют и
+границы частей.
+
+Запуск:
+    python check_equivalence.py
+    python check_equivalence.py --texts 200000 --seed 7
+"""
+
+import argparse
+import random
+import sys
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from lexicon_matcher import LexiconMatcher, default_backend
+from lexicons import EXTENDED_POSITIVE_WORDS, EXTENDED_NEGATIVE_WORDS, INTENT_RULES, MEDICAL_TOPICS
+from text_preprocessing import SEPARATOR, preprocess_series, preprocess_text
+
+# Сколько расхождений показывать для каждой проверки
+MAX_SHOWN = 5
+
+SPACES = [' ', ' ', ' ', '\t', '\n', '\r\n', '\xa0', '\u2003', '\u3000', '\u2028', '\x1c', '\x1f', '\x85',
+          '\u200b']
+PIECES = ['?', '!', '...', ',', '-', '_', '«', '»', '😀', '123', 'ΟΔΟΣ', 'σοφός', 'İstanbul', 'ß',
+          'http://example.ru/a?b=1', 'https://vk.com/wall-1_2', 'www.site.ru', '@user', '#тег',
+          'nan']
+NON_STRINGS = [np.nan, None, 0, 0.0, 5, 2.5, True, '', ' ']
+
+
+def _vocabulary() -> List[str]:
+    words = EXTENDED_POSITIVE_WORDS + EXTENDED_NEGATIVE_WORDS
+    words += [word for _, rule_words, _ in INTENT_RULES for word in rule_words]
+    words += [word for keywords in MEDICAL_TOPICS.values() for word in keywords]
+    return sorted(set(words)) + ['обычный', 'текст', 'про', 'город', 'и', 'я']
+
+
+def random_texts(count: int, seed: int) -> pd.Series:
+    """
+    Случайные тексты для проверки
+
+    Args:
+        count: Число текстов
+        seed: Начальное значение генератора
+
+    Returns:
+        Series объектов: строки, пропуски и нестроковые значения
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary()
+    cases = [str, str.upper, str.title]
+    texts = []
+    for _ in range(count):
+        if rng.random() < 0.03:
+            texts.append(rng.choice(NON_STRINGS))
+            continue
+        parts = []
+        for _ in range(rng.randint(0, 12)):
+            if rng.random() < 0.25:
+                parts.append(rng.choice(PIECES))
+            else:
+                parts.append(rng.choice(cases)(rng.choice(vocabulary)))
+            parts.append(rng.choice(SPACES) if rng.random() < 0.9 else '')
+        if rng.random() < 0.0002:
+            # Разделитель в тексте переводит часть на построчную обработку
+            parts.insert(rng.randint(0, len(parts)), SEPARATOR)
+        texts.append(''.join(parts))
+    return pd.Series(texts, dtype=object)
+
+
+# Исходные построчные функции analysis.ipynb (словари - из lexicons.py, куда они вынесены без изменений)
+
+def improved_sentiment_analysis(text):
+    """Улучшенный сентимент-анализ с расширенным словарем и весами"""
+    if not text or len(text) < 3:
+        return 0
+    text_lower = text.lower()
+    positive_score = 0
+    negative_score = 0
+    for word in EXTENDED_POSITIVE_WORDS:
+        if word in text_lower:
+            if any(med_word in word for med_word in ['врач', 'лечение', 'помог', 'вылеч', 'диагноз']):
+                positive_score += 2
+            else:
+                positive_score += 1
+    for word in EXTENDED_NEGATIVE_WORDS:
+        if word in text_lower:
+            if any(med_word in word for med_word in ['врач', 'лечение', 'не помог', 'не леч', 'диагноз', 'отказыва']):
+                negative_score += 2
+            else:
+                negative_score += 1
+    text_length = len(text.split())
+    if text_length == 0:
+        return 0
+    sentiment_score = (positive_score - negative_score) / max(text_length, 1) * 10
+    if sentiment_score > 0.15:
+        return 1
+    elif sentiment_score < -0.15:
+        return -1
+    else:
+        return 0
+
+
+INTENT_WORDS = {intent: words for intent, words, _ in INTENT_RULES}
+
+
+def classify_intent(text):
+    """Классификация комментария по намерению (intent)"""
+    if not text or len(text) < 3:
+        return 'неопределенный'
+    text_lower = str(text).lower()
+    if any(word in text_lower for word in INTENT_WORDS['вопрос']) or '?' in text:
+        return 'вопрос'
+    if any(word in text_lower for word in INTENT_WORDS['благодарность']):
+        return 'благодарность'
+    if any(word in text_lower for word in INTENT_WORDS['жалоба']):
+        return 'жалоба'
+    if any(word in text_lower for word in INTENT_WORDS['критика']):
+        return 'критика'
+    if any(word in text_lower for word in INTENT_WORDS['личный_опыт']) and len(text.split()) > 5:
+        return 'личный_опыт'
+    if any(word in text_lower for word in INTENT_WORDS['предложение']):
+        return 'предложение'
+    if any(word in text_lower for word in INTENT_WORDS['информационный_комментарий']) and len(text.split()) > 3:
+        return 'информационный_комментарий'
+    return 'неопределенный'
+
+
+def find_topics(text):
+    """Найти упоминания тем в тексте"""
+    if not text:
+        return []
+    text_lower = str(text).lower()
+    found_topics = []
+    for topic, keywords in MEDICAL_TOPICS.items():
+        if any(keyword in text_lower for keyword in keywords):
+            found_topics.append(topic)
+    return found_topics
+
+
+def compare(name: str, expected: List, actual: List, texts: pd.Series) -> bool:
+    """
+    Сравнение результатов с эталоном
+
+    Args:
+        name: Название проверки
+        expected: Результаты построчной функции
+        actual: Результаты пакетной обработки
+        texts: Исходные тексты (для вывода расхождений)
+
+    Returns:
+        True, если результаты совпали
+    """
+    mismatches = [i for i, (left, right) in enumerate(zip(expected, actual)) if left != right]
+    if len(expected) != len(actual):
+        print(f"✗ {name}: {len(actual):,} результатов вместо {len(expected):,}")
+        return False
+    if not mismatches:
+        print(f"✓ {name}: {len(expected):,} текстов совпали")
+        return True
+    print(f"✗ {name}: {len(mismatches):,} расхождений из {len(expected):,}")
+    for i in mismatches[:MAX_SHOWN]:
+        print(f"    {texts.iloc[i]!r}: ожидалось {expected[i]!r}, получено {actual[i]!r}")
+    return False
+
+
+def check_preprocessing(texts: pd.Series, chunk_rows: int) -> bool:
+    """preprocess_series против построчной preprocess_text"""
+    expected = texts.apply(preprocess_text).tolist()
+    ok = compare('preprocess_series', expected, preprocess_series(texts, workers=1).tolist(), texts)
+    return compare(f'preprocess_series, части по {chunk_rows}', expected,
+                   preprocess_series(texts, workers=1, chunk_rows=chunk_rows).tolist(), texts) and ok
+
+
+def check_matcher(texts: pd.Series, chunk_rows: int) -> bool:
+    """LexiconMatcher с обоими способами поиска против функций ноутбука"""
+    processed = preprocess_series(texts, workers=1)
+    expected = {
+        'sentiment': processed.apply(improved_sentiment_analysis).tolist(),
+        'intent': processed.apply(classify_intent).tolist(),
+        'topics': texts.apply(find_topics).tolist(),
+    }
+    backends = ['substring'] + (['ahocorasick'] if default_backend() == 'ahocorasick' else [])
+    ok = True
+    for backend in backends:
+        result = LexiconMatcher(backend).score(processed, texts, chunk_rows=chunk_rows)
+        for column, values in expected.items():
+            ok = compare(f'LexiconMatcher ({backend}), {column}', values, result[column].tolist(), texts) and ok
+    if len(backends) == 1:
+        print("⚠ pyahocorasick не установлен, автомат Ахо-Корасик не проверен")
+    return ok
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description='Проверка совпадения пакетной обработки текстов')
+    arg_parser.add_argument('--texts', type=int, default=50_000, help='Число случайных текстов')
+    arg_parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+    arg_parser.add_argument('--chunk-rows', type=int, default=997, help='Текстов в части')
+    args = arg_parser.parse_args()
+
+    texts = random_texts(args.texts, args.seed)
+    results = [check_preprocessing(texts, args.chunk_rows), check_matcher(texts, args.chunk_rows)]
+    if all(results):
+        print("✓ Пакетная обработка совпадает с построчной")
+        return 0
+    print("✗ Найдены расхождения")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Контрольные точки сбора данных
+Хранят для каждой цели самый новый собранный пост и состояние текущего запуска,
+чтобы прерванный сбор продолжался с места остановки, а обычный запуск
+догружал только новые данные
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+
+CHECKPOINT_DIR = 'data/checkpoints'
+
+
+class CheckpointStore:
+    """Потокобезопасное хранилище контрольных точек по целям"""
+
+    def __init__(self, directory: str = CHECKPOINT_DIR):
+        """
+        Инициализация хранилища
+
+        Args:
+            directory: Папка для файла контрольных точек и промежуточных результатов
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, 'checkpoints.json')
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._data = self._load()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка при чтении контрольных точек {self.path}: {e}. Начинаю с нуля")
+            return {}
+
+    def _save(self):
+        # Пишем во временный файл и атомарно подменяем, чтобы сбой не испортил файл
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _safe_name(self, target_id: str) -> str:
+        return "".join(c if c.isalnum() or c in '-_' else '_' for c in str(target_id))
+
+    def partial_path(self, target_id: str) -> str:
+        """Путь к файлу с комментариями, собранными в текущем запуске"""
+        return os.path.join(self.directory, f"{self._safe_name(target_id)}.partial.ndjson")
+
+    def get(self, target_id: str) -> Dict:
+        """Контрольная точка цели (пустой словарь, если сбора еще не было)"""
+        with self._lock:
+            return dict(self._data.get(target_id, {}))
+
+    def active_run(self, target_id: str) -> Optional[Dict]:
+        """Состояние незавершенного запуска или None"""
+        with self._lock:
+            run = self._data.get(target_id, {}).get('run')
+            return dict(run) if run else None
+
+    def start_run(self, target_id: str, **params) -> Dict:
+        """
+        Начать новый запуск сбора для цели
+
+        Args:
+            target_id: ID цели
+            **params: Параметры запуска, нужные для его продолжения после сбоя
+
+        Returns:
+            Состояние запуска
+        """
+        with self._lock:
+            run = {'started_at': int(datetime.now().timestamp()), **params}
+            self._data.setdefault(target_id, {})['run'] = run
+            self._save()
+            partial = self.partial_path(target_id)
+            if os.path.exists(partial):
+                os.remove(partial)
+            return dict(run)
+
+    def record_post_comments(self, target_id: str, post_id: int, comments: List[Dict]):
+        """
+        Сохранить комментарии обработанного поста в промежуточный файл
+
+        После комментариев записывается отметка о завершении поста; посты без такой
+        отметки при продолжении запуска обрабатываются заново.
+        """
+        with self._lock:
+            with open(self.partial_path(target_id), 'a', encoding='utf-8') as f:
+                for comment in comments:
+                    f.write(json.dumps(comment, ensure_ascii=False) + '\n')
+                f.write(json.dumps({'_done_post_id': post_id}) + '\n')
+                f.flush()
+
+    def record_posts_done(self, target_id: str, post_ids: List[int]):
+        """
+        Отметить посты обработанными, когда их данные уже записаны в приемник
+
+        Комментарии в промежуточный файл при этом не пишутся: их хранит сам приемник.
+        """
+        if not post_ids:
+            return
+        with self._lock:
+            with open(self.partial_path(target_id), 'a', encoding='utf-8') as f:
+                for post_id in post_ids:
+                    f.write(json.dumps({'_done_post_id': post_id}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load_partial(self, target_id: str) -> Tuple[Set[int], List[Dict]]:
+        """
+        Прочитать результаты прерванного запуска
+
+        Returns:
+            Кортеж (ID полностью обработанных постов, их комментарии)
+        """
+        done_post_ids = set()
+        comments = []
+        pending = []
+        path = self.partial_path(target_id)
+        if not os.path.exists(path):
+            return done_post_ids, comments
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла не дописаться при сбое
+                    break
+                if '_done_post_id' in record:
+                    done_post_ids.add(record['_done_post_id'])
+                    comments.extend(pending)
+                    pending = []
+                else:
+                    pending.append(record)
+        return done_post_ids, comments
+
+    def finish_run(self, target_id: str, posts: List[Dict]):
+        """
+        Завершить запуск: запомнить самый новый пост и удалить промежуточные данные
+
+        Args:
+            target_id: ID цели
+            posts: Посты, собранные в запуске
+        """
+        with self._lock:
+            checkpoint = self._data.setdefault(target_id, {})
+            run = checkpoint.pop('run', None) or {}
+
+            regular_posts = [p for p in posts if not p.get('is_pinned')] or posts
+            if regular_posts:
+                newest = max(regular_posts, key=lambda p: (p.get('date', 0), p.get('id', 0)))
+                if newest.get('date', 0) >= checkpoint.get('last_post_date', 0):
+                    checkpoint['last_post_id'] = newest.get('id')
+                    checkpoint['last_post_date'] = newest.get('date', 0)
+
+            if run.get('started_at'):
+                checkpoint['last_run_started_at'] = run['started_at']
+            checkpoint['last_run_finished_at'] = int(datetime.now().timestamp())
+            self._save()
+
+            partial = self.partial_path(target_id)
+            if os.path.exists(partial):
+                os.remove(partial)
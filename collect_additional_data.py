@@ -6,31 +6,81 @@
 import os
 import sys
 import pandas as pd
-from parser import VKParser
-from datetime import datetime, timedelta
-import json
+from parser import VKParser, EXECUTE_BATCH_SIZE
+from normalizer import POST_COLUMNS, COMMENT_COLUMNS, posts_frame, comments_frame, local_datetimes
+from sinks import CSVSink, FanoutSink
+from api_cache import APICache
+from datetime import datetime
 
 # Попытка импортировать конфигурацию
 try:
     from config import VK_ACCESS_TOKEN, TARGET_IDS, MAX_COMMENTS_PER_POST
+    try:
+        from config import API_CACHE_MODE
+    except ImportError:
+        API_CACHE_MODE = None  # По умолчанию кэш ответов API выключен
+    try:
+        from config import API_CACHE_MAX_MB
+    except ImportError:
+        API_CACHE_MAX_MB = 500
+    try:
+        from config import VK_API_URL
+    except ImportError:
+        VK_API_URL = None  # По умолчанию настоящий VK API
+    try:
+        from config import USE_PARQUET
+    except ImportError:
+        USE_PARQUET = True  # По умолчанию данные дополнительно пишутся в набор Parquet
+    try:
+        from config import USE_SQL_STORE
+    except ImportError:
+        USE_SQL_STORE = False  # По умолчанию хранилище SQLite не пополняется при сборе
 except ImportError:
     print("Ошибка: Создайте файл config.py на основе config.py.example")
     sys.exit(1)
 
 
 def get_oldest_date_in_data():
-    """Получить самую старую дату из существующих данных"""
+    """
+    Получить самую старую дату из существующих данных
+    
+    Берется наименьшая дата из набора Parquet и CSV файлов: часть данных может
+    быть собрана без набора Parquet и еще не перенесена в него
+    """
     data_dir = 'data'
     if not os.path.exists(data_dir):
         print("Папка data не существует. Используем текущую дату.")
         return datetime.now()
     
-    # Ищем все файлы с постами
-    csv_files = [f for f in os.listdir(data_dir) if f.endswith('_posts.csv')]
+    dates = []
+    # Из набора Parquet читается только колонка date нужной цели
+    if USE_PARQUET:
+        from storage import date_range, POSTS
+        try:
+            bounds = date_range(POSTS, target_ids=TARGET_IDS[:1])
+            if bounds:
+                print(f"Найдена самая старая дата в наборе Parquet: {bounds[0]}")
+                dates.append(bounds[0].to_pydatetime())
+        except Exception as e:
+            print(f"Ошибка при чтении набора Parquet: {e}")
     
-    if not csv_files:
+    csv_date = get_oldest_csv_date(data_dir)
+    if csv_date is not None:
+        dates.append(pd.Timestamp(csv_date).to_pydatetime())
+    
+    if not dates:
         print("Не найдены существующие данные. Используем текущую дату.")
         return datetime.now()
+    return min(dates)
+
+
+def get_oldest_csv_date(data_dir):
+    """Самая старая дата в CSV файлах с постами (None, если файлов нет или их не удалось прочитать)"""
+    # Ищем все файлы с постами
+    csv_files = [f for f in os.listdir(data_dir) if f.endswith(('_posts.csv', '_posts.csv.gz'))]
+    
+    if not csv_files:
+        return None
     
     # Берем файл с summary или последний файл
     summary_files = [f for f in csv_files if 'summary' in f]
@@ -45,153 +95,186 @@ def get_oldest_date_in_data():
         df = pd.read_csv(filepath, encoding='utf-8-sig')
         df['date'] = pd.to_datetime(df['date'])
         oldest_date = df['date'].min()
-        print(f"Найдена самая старая дата в существующих данных: {oldest_date}")
+        if pd.isna(oldest_date):
+            return None
+        print(f"Найдена самая старая дата в CSV файлах: {oldest_date}")
         return oldest_date
     except Exception as e:
         print(f"Ошибка при чтении файла: {e}")
-        return datetime.now()
+        return None
 
 
-def collect_year_data(parser, target_id, owner_id, start_date, end_date, year_num):
-    """Собрать данные за один год"""
-    import time
+class YearPartitionWriter:
+    """
+    Запись постов и комментариев в CSV-файлы по годам во время обхода стены
     
-    print(f"\n{'='*60}")
-    print(f"СБОР ДАННЫХ ЗА ГОД {year_num}")
-    print(f"Период: {start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')}")
-    print(f"{'='*60}")
+    Файлы года открываются при первой записи и закрываются, как только обход
+    переходит к более раннему году, поэтому в памяти держатся только открытые файлы.
+    """
     
-    all_posts = []
-    offset = 0
-    batch_size = 100
-    start_timestamp = int(start_date.timestamp())
-    end_timestamp = int(end_date.timestamp())
-    
-    print("Получаю посты...")
+    def __init__(self, target_id, data_dir='data', datasets=None):
+        """
+        Args:
+            target_id: ID цели
+            data_dir: Папка для CSV файлов
+            datasets: Дополнительные приемники (набор Parquet, хранилище SQLite)
+                {'posts': ..., 'comments': ...} (None - без них)
+        """
+        self.target_id = target_id
+        self.data_dir = data_dir
+        self.datasets = datasets or {}
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._files = {}
+        self.counts = {}
+        self.saved_files = []
     
-    while True:
-        try:
-            posts = parser.get_posts(owner_id, count=batch_size, offset=offset)
-            if not posts:
-                break
-            
-            # Фильтруем посты по дате
-            filtered_posts = []
-            reached_start = False
-            
-            for post in posts:
-                post_date = post.get('date', 0)
-                
-                # Если пост старше начальной даты, прекращаем
-                if post_date < start_timestamp:
-                    reached_start = True
-                    break
-                
-                # Если пост в нужном диапазоне
-                if start_timestamp <= post_date <= end_timestamp:
-                    filtered_posts.append(post)
-            
-            all_posts.extend(filtered_posts)
-            offset += len(posts)
-            
-            print(f"  Собрано постов: {len(all_posts)} (offset: {offset})", flush=True)
-            
-            # Если достигли начальной даты или получили меньше постов - прекращаем
-            if reached_start or len(posts) < batch_size:
-                break
-            
-            # Защита от rate limiting
-            time.sleep(0.35)
-        except Exception as e:
-            print(f"Ошибка при получении постов: {e}")
-            break
+    def write(self, year, kind, rows):
+        """
+        Дописать строки в файл года
+        
+        Args:
+            year: Год публикации поста
+            kind: 'posts' или 'comments'
+            rows: DataFrame строк CSV
+        """
+        if len(rows) == 0:
+            return
+        key = (year, kind)
+        if key not in self._files:
+            filename = os.path.join(self.data_dir, f"vk_data_{self.target_id}_{year}_{self.timestamp}_{kind}.csv")
+            self._files[key] = CSVSink(filename, POST_COLUMNS if kind == 'posts' else COMMENT_COLUMNS)
+            self.saved_files.append(filename)
+        self._files[key].write(rows)
+        if kind in self.datasets:
+            self.datasets[kind].write(rows)
+        year_counts = self.counts.setdefault(year, {'posts': 0, 'comments': 0})
+        year_counts[kind] += len(rows)
     
-    print(f"\n✓ Получено {len(all_posts)} постов за период")
+    def commit(self):
+        """Сбросить открытые файлы на диск (граница страницы)"""
+        for sink in self._files.values():
+            sink.commit()
+        for dataset in self.datasets.values():
+            dataset.commit()
     
-    # Собираем комментарии
-    all_comments = []
-    if all_posts:
-        print(f"\nСобираю комментарии для {len(all_posts)} постов...")
-        
-        for i, post in enumerate(all_posts):
-            if i % 10 == 0:
-                print(f"  Обработано постов: {i}/{len(all_posts)} (комментариев: {len(all_comments)})", flush=True)
-            
-            post_id = post.get('id')
-            comments = parser.get_comments(owner_id, post_id, MAX_COMMENTS_PER_POST)
-            all_comments.extend(comments)
-            
-            time.sleep(0.35)
+    def close_newer_than(self, year):
+        """Закрыть файлы всех годов новее year: обход стены до них уже не вернется"""
+        for key in sorted(k for k in self._files if k[0] > year):
+            self._close(key)
     
-    print(f"✓ Получено {len(all_comments)} комментариев")
+    def close(self):
+        """Закрыть все открытые файлы"""
+        for key in sorted(self._files, reverse=True):
+            self._close(key)
+        for dataset in self.datasets.values():
+            dataset.close()
     
-    return {
-        'posts': all_posts,
-        'comments': all_comments,
-        'start_date': start_date.isoformat(),
-        'end_date': end_date.isoformat()
-    }
+    def _close(self, key):
+        year, kind = key
+        sink = self._files.pop(key)
+        sink.close()
+        label = 'Посты' if kind == 'posts' else 'Комментарии'
+        print(f"✓ {label} за {year} год сохранены: {sink.path} ({self.counts[year][kind]} записей)", flush=True)
 
 
-def save_year_data(data, target_id, start_date, end_date):
-    """Сохранить данные за год в CSV"""
-    import pandas as pd
+def backfill(parser, target_id, owner_id, oldest_date, target_year):
+    """
+    Собрать данные от oldest_date назад до начала target_year за один проход по стене
     
-    # Обрабатываем посты
-    posts_data = []
-    for post in data['posts']:
-        post_date = datetime.fromtimestamp(post.get('date', 0)) if post.get('date') else None
-        posts_data.append({
-            'post_id': post.get('id'),
-            'target_id': target_id,
-            'owner_id': f"-{post.get('owner_id', 'unknown')}" if post.get('owner_id', 0) > 0 else post.get('owner_id', 'unknown'),
-            'date': post_date.strftime('%Y-%m-%d %H:%M:%S') if post_date else '',
-            'date_timestamp': post.get('date', ''),
-            'text': post.get('text', ''),
-            'text_length': len(post.get('text', '')),
-            'likes': post.get('likes', {}).get('count', 0),
-            'reposts': post.get('reposts', {}).get('count', 0),
-            'comments_count': post.get('comments', {}).get('count', 0),
-            'views': post.get('views', {}).get('count', 0) if 'views' in post else 0,
-            'engagement': (post.get('likes', {}).get('count', 0) + 
-                         post.get('reposts', {}).get('count', 0) + 
-                         post.get('comments', {}).get('count', 0))
-        })
+    Начало периода находится поиском смещения, дальше стена читается страницами
+    по одному разу. Посты и их комментарии сразу раскладываются по файлам своих
+    годов, файлы года закрываются при переходе к предыдущему году.
     
-    # Обрабатываем комментарии
-    comments_data = []
-    for comment in data['comments']:
-        comment_date = datetime.fromtimestamp(comment.get('date', 0)) if comment.get('date') else None
-        comments_data.append({
-            'comment_id': comment.get('id'),
-            'post_id': comment.get('post_id'),
-            'target_id': target_id,
-            'owner_id': f"-{comment.get('owner_id', 'unknown')}" if comment.get('owner_id', 0) > 0 else comment.get('owner_id', 'unknown'),
-            'date': comment_date.strftime('%Y-%m-%d %H:%M:%S') if comment_date else '',
-            'date_timestamp': comment.get('date', ''),
-            'text': comment.get('text', ''),
-            'text_length': len(comment.get('text', '')),
-            'likes': comment.get('likes', {}).get('count', 0),
-            'author_id': comment.get('from_id', 0)
-        })
+    Args:
+        parser: Экземпляр VKParser
+        target_id: ID цели
+        owner_id: ID владельца стены
+        oldest_date: Самая старая дата в уже собранных данных
+        target_year: Год, до начала которого нужно собрать данные
+        
+    Returns:
+        Количество записей по годам
+    """
+    oldest_date = pd.Timestamp(oldest_date).to_pydatetime()
+    end_timestamp = int(oldest_date.timestamp())
+    start_timestamp = int(datetime(target_year, 1, 1).timestamp())
+    batch_size = 100
+    
+    print(f"Период: {datetime(target_year, 1, 1).strftime('%Y-%m-%d')} - {oldest_date.strftime('%Y-%m-%d')}")
+    offset = parser.find_offset_for_date(owner_id, end_timestamp)
+    print(f"Начинаю обход стены со смещения {offset}", flush=True)
+    
+    datasets = {'posts': FanoutSink(), 'comments': FanoutSink()}
+    store = None
+    if USE_PARQUET:
+        from storage import ParquetDatasetSink, POSTS, COMMENTS
+        datasets['posts'].sinks.append(ParquetDatasetSink(POSTS))
+        datasets['comments'].sinks.append(ParquetDatasetSink(COMMENTS))
+    if USE_SQL_STORE:
+        from sql_store import SQLStore, SQLStoreSink, POSTS, COMMENTS
+        store = SQLStore()
+        datasets['posts'].sinks.append(SQLStoreSink(store, POSTS))
+        datasets['comments'].sinks.append(SQLStoreSink(store, COMMENTS))
+    writer = YearPartitionWriter(target_id, datasets=datasets)
+    finished = False
+    try:
+        while not finished:
+            offsets = [offset + i * batch_size for i in range(EXECUTE_BATCH_SIZE)]
+            for page in parser.get_posts_batch(owner_id, offsets, count=batch_size):
+                if not page:
+                    finished = True
+                    break
+                offset += len(page)
+                
+                posts = []
+                for post in page:
+                    post_date = post.get('date', 0)
+                    if post.get('is_pinned') or post_date > end_timestamp:
+                        continue
+                    if post_date < start_timestamp:
+                        finished = True
+                        break
+                    posts.append(post)
+                
+                if posts:
+                    write_page(parser, writer, target_id, owner_id, posts)
+                    print(f"  Обработано постов до {datetime.fromtimestamp(posts[-1]['date']).strftime('%Y-%m-%d')} "
+                          f"(offset: {offset})", flush=True)
+                
+                if finished or len(page) < batch_size:
+                    finished = True
+                    break
+    finally:
+        writer.close()
+        if store:
+            store.close()
     
-    # Сохраняем CSV
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    year_str = f"{start_date.year}"
+    # Файлы годов созданы этим запуском, их строки уже в наборе Parquet
+    if USE_PARQUET:
+        from storage import mark_streamed
+        mark_streamed(dict.fromkeys(writer.saved_files))
     
-    if posts_data:
-        df_posts = pd.DataFrame(posts_data)
-        posts_filename = f"data/vk_data_{target_id}_{year_str}_{timestamp}_posts.csv"
-        df_posts.to_csv(posts_filename, index=False, encoding='utf-8-sig')
-        print(f"✓ Посты сохранены: {posts_filename}")
+    return writer.counts
+
+
+def write_page(parser, writer, target_id, owner_id, posts):
+    """Получить комментарии к странице постов и записать все в файлы по годам"""
+    comments = []
+    for _, post_comments in parser.iter_post_comments(owner_id, posts, MAX_COMMENTS_PER_POST):
+        comments.extend(post_comments)
     
-    if comments_data:
-        df_comments = pd.DataFrame(comments_data)
-        comments_filename = f"data/vk_data_{target_id}_{year_str}_{timestamp}_comments.csv"
-        df_comments.to_csv(comments_filename, index=False, encoding='utf-8-sig')
-        print(f"✓ Комментарии сохранены: {comments_filename}")
+    df_posts = posts_frame(posts, target_id, owner_id)
+    df_comments = comments_frame(comments, target_id, owner_id)
+    # Комментарий попадает в файл года своего поста
+    post_years = local_datetimes(df_posts['date_timestamp']).dt.year
+    comment_years = df_comments['post_id'].map(dict(zip(df_posts['post_id'], post_years)))
     
-    return posts_filename if posts_data else None, comments_filename if comments_data else None
+    for year in sorted((int(year) for year in post_years.dropna().unique()), reverse=True):
+        # Посты идут от новых к старым: годы новее текущего уже завершены
+        writer.close_newer_than(year)
+        writer.write(year, 'posts', df_posts[post_years == year])
+        writer.write(year, 'comments', df_comments[comment_years == year])
+    writer.commit()
 
 
 def main():
@@ -209,7 +292,8 @@ def main():
         return
     
     # Инициализируем парсер
-    parser = VKParser(VK_ACCESS_TOKEN)
+    cache = APICache(mode=API_CACHE_MODE, max_size_mb=API_CACHE_MAX_MB) if API_CACHE_MODE else None
+    parser = VKParser(VK_ACCESS_TOKEN, cache=cache, api_url=VK_API_URL)
     
     # Получаем информацию о группе
     target_id = TARGET_IDS[0]
@@ -223,37 +307,11 @@ def main():
     else:
         owner_id = target_id
     
-    # Парсим данные по годам, начиная с самой старой даты
-    current_end = oldest_date
-    year_num = 1
+    # Один проход по стене от самой старой даты до целевого года
+    counts = backfill(parser, target_id, owner_id, oldest_date, target_year)
     
-    while current_end.year > target_year:
-        # Определяем период для следующего года
-        current_start = datetime(current_end.year - 1, 1, 1)
-        if current_start.year < target_year:
-            current_start = datetime(target_year, 1, 1)
-        
-        print(f"\n\n{'#'*60}")
-        print(f"ГОД {year_num}: {current_start.year}")
-        print(f"{'#'*60}")
-        
-        # Собираем данные за год
-        year_data = collect_year_data(
-            parser, target_id, owner_id, 
-            current_start, current_end, year_num
-        )
-        
-        if year_data['posts']:
-            # Сохраняем данные за год
-            save_year_data(year_data, target_id, current_start, current_end)
-        
-        # Переходим к следующему году
-        current_end = current_start - timedelta(days=1)
-        year_num += 1
-        
-        # Если достигли целевого года - прекращаем
-        if current_start.year <= target_year:
-            break
+    for year in sorted(counts, reverse=True):
+        print(f"  {year}: постов {counts[year]['posts']}, комментариев {counts[year]['comments']}")
     
     print("\n" + "=" * 60)
     print("СБОР ДОПОЛНИТЕЛЬНЫХ ДАННЫХ ЗАВЕРШЕН")
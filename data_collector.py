@@ -5,8 +5,16 @@
 
 import os
 import sys
-import pandas as pd
+import queue
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from parser import VKParser
+from normalizer import POST_COLUMNS, COMMENT_COLUMNS
+from api_cache import APICache
+from checkpoint import CheckpointStore
+from sinks import CSVSink, FanoutSink
+from raw_archive import RawArchive, ArchiveSink
 from datetime import datetime
 
 # Попытка импортировать конфигурацию
@@ -16,6 +24,58 @@ try:
         from config import YEARS_BACK
     except ImportError:
         YEARS_BACK = None  # По умолчанию без ограничения по годам
+    try:
+        from config import VK_ACCESS_TOKENS
+    except ImportError:
+        VK_ACCESS_TOKENS = []  # По умолчанию используется только VK_ACCESS_TOKEN
+    try:
+        from config import WORKERS_PER_TOKEN
+    except ImportError:
+        WORKERS_PER_TOKEN = 1
+    try:
+        from config import USE_CHECKPOINTS
+    except ImportError:
+        USE_CHECKPOINTS = True  # По умолчанию догружаем только новые данные
+    try:
+        from config import COMMENT_REFRESH_DAYS
+    except ImportError:
+        COMMENT_REFRESH_DAYS = 3
+    try:
+        from config import COMPRESS_OUTPUT
+    except ImportError:
+        COMPRESS_OUTPUT = False  # По умолчанию файлы не сжимаются
+    try:
+        from config import API_CACHE_MODE
+    except ImportError:
+        API_CACHE_MODE = None  # По умолчанию кэш ответов API выключен
+    try:
+        from config import API_CACHE_MAX_MB
+    except ImportError:
+        API_CACHE_MAX_MB = 500
+    try:
+        from config import VK_API_URL
+    except ImportError:
+        VK_API_URL = None  # По умолчанию настоящий VK API
+    try:
+        from config import USE_PARQUET
+    except ImportError:
+        USE_PARQUET = True  # По умолчанию данные дополнительно пишутся в набор Parquet
+    try:
+        from config import USE_SQL_STORE
+    except ImportError:
+        USE_SQL_STORE = False  # По умолчанию хранилище SQLite не пополняется при сборе
+    try:
+        from config import USE_RAW_ARCHIVE
+    except ImportError:
+        USE_RAW_ARCHIVE = True  # По умолчанию исходные объекты пишутся в архив data/raw/
+    try:
+        from config import USE_ASYNC_PARSER
+    except ImportError:
+        USE_ASYNC_PARSER = False  # По умолчанию синхронный VKParser
+    try:
+        from config import ASYNC_MAX_IN_FLIGHT
+    except ImportError:
+        ASYNC_MAX_IN_FLIGHT = 10
 except ImportError:
     print("Ошибка: Создайте файл config.py на основе config.py.example")
     print("И заполните его своими данными VK API")
@@ -29,6 +89,172 @@ def create_data_directory():
         print("Создана директория 'data' для хранения результатов")
 
 
+def get_access_tokens() -> list:
+    """Список токенов для сбора: VK_ACCESS_TOKENS и VK_ACCESS_TOKEN без повторов и заглушек"""
+    placeholders = {"", "your_vk_access_token_here", "ваш_сервисный_ключ_здесь"}
+    tokens = []
+    for token in list(VK_ACCESS_TOKENS) + [VK_ACCESS_TOKEN]:
+        if token and token not in placeholders and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def create_parser(token, cache=None):
+    """Создать парсер для токена: VKParser или асинхронный парсер с тем же интерфейсом"""
+    if USE_ASYNC_PARSER:
+        from async_parser import AsyncBackedVKParser
+        return AsyncBackedVKParser(token, cache=cache, api_url=VK_API_URL, max_in_flight=ASYNC_MAX_IN_FLIGHT)
+    return VKParser(token, cache=cache, api_url=VK_API_URL)
+
+
+def collect_target(parser, target_id, checkpoints=None, summary_sinks=None, archive=None, streamed=None):
+    """
+    Собрать и сохранить данные одной цели
+    
+    Посты и комментарии записываются в файлы по мере сбора, в памяти
+    остаются только счетчики.
+    
+    Args:
+        parser: Экземпляр VKParser (или AsyncBackedVKParser)
+        target_id: ID цели или screen_name
+        checkpoints: Хранилище контрольных точек (None - полный сбор с нуля)
+        summary_sinks: Пара общих приемников (посты, комментарии): сводные файлы и набор Parquet
+        archive: Архив исходных объектов (None - NDJSON файл цели)
+        streamed: Словарь для storage.mark_streamed: сюда добавляются CSV файлы цели,
+            строки которых переданы в набор Parquet
+        
+    Returns:
+        Статистика сбора цели или None, если данные не получены
+    """
+    print(f"\nОбработка цели: {target_id}")
+    print("-" * 50)
+    print(f"Параметры:")
+    print(f"  - Максимум постов: {MAX_POSTS_PER_GROUP}")
+    print(f"  - Максимум комментариев на пост: {MAX_COMMENTS_PER_POST}")
+    print(f"  - Период: {YEARS_BACK} лет" if YEARS_BACK else "  - Период: без ограничения")
+    print("-" * 50)
+    
+    # Прерванный запуск дописывает свои файлы, новый запуск создает новые
+    run = checkpoints.active_run(target_id) if checkpoints else None
+    base_filename = (run or {}).get('base_filename')
+    if not base_filename:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base_filename = f"data/vk_data_{target_id}_{timestamp}"
+    shared_posts, shared_comments = summary_sinks or (None, None)
+    raw = ArchiveSink(archive) if archive else None
+    sink = parser.create_sink(base_filename, compress=COMPRESS_OUTPUT,
+                              shared_posts=shared_posts, shared_comments=shared_comments, raw=raw)
+    if streamed is not None:
+        from storage import csv_signature
+        before = {csv.path: csv_signature(csv.path) for csv in (sink.posts, sink.comments)}
+    
+    try:
+        # Парсим данные
+        print("Начинаю парсинг...")
+        try:
+            data = parser.parse_target(
+                target_id=target_id,
+                max_posts=MAX_POSTS_PER_GROUP,
+                max_comments=MAX_COMMENTS_PER_POST,
+                years_back=YEARS_BACK,
+                checkpoints=checkpoints,
+                comment_refresh_days=COMMENT_REFRESH_DAYS,
+                sink=sink
+            )
+        finally:
+            sink.close()
+        
+        if not data:
+            print("⚠ Предупреждение: Данные не получены или пусты")
+            return None
+        
+        if not data['posts_count'] and not data['comments_count']:
+            print("✓ Новых постов и комментариев с прошлого запуска нет")
+            if checkpoints:
+                checkpoints.finish_run(target_id, [])
+            return None
+        
+        saved_files = sink.saved_files()
+        print(f"\n✓ Файлы сохранены:")
+        for filename in saved_files:
+            print(f"  - {filename}")
+        
+        # Данные сохранены - фиксируем контрольную точку
+        if checkpoints:
+            checkpoints.finish_run(target_id, [data['newest_post']] if data['newest_post'] else [])
+        if streamed is not None:
+            streamed.update((csv.path, before[csv.path]) for csv in (sink.posts, sink.comments) if csv.count)
+        
+        print(f"\n✓ Успешно собраны данные для {target_id}")
+        return {
+            'target_id': target_id,
+            'owner_id': data['owner_id'],
+            'posts_count': data['posts_count'],
+            'comments_count': data['comments_count'],
+            'parsed_at': data['parsed_at'],
+            'date_range': data['date_range'],
+            'files': saved_files
+        }
+        
+    except Exception as e:
+        print(f"✗ Ошибка при сборе данных для {target_id}: {e}")
+        return None
+
+
+def collect_targets_parallel(target_ids, tokens, checkpoints=None, summary_sinks=None, cache=None, archive=None,
+                             streamed=None):
+    """
+    Собрать данные нескольких целей параллельно, распределяя их по пулу токенов
+    
+    Каждый поток работает со своим токеном и берет следующую цель из общей очереди,
+    поэтому быстрые цели не ждут медленных. Бюджет запросов каждого токена
+    соблюдается общим ограничителем частоты.
+    
+    Args:
+        target_ids: Список целей
+        tokens: Список токенов доступа
+        checkpoints: Хранилище контрольных точек (общее для всех потоков)
+        summary_sinks: Пара общих приемников (посты, комментарии): сводные файлы и набор Parquet
+        cache: Кэш ответов API (общий для всех потоков)
+        archive: Архив исходных объектов (общий для всех потоков)
+        streamed: Словарь CSV файлов, переданных в набор Parquet (см. collect_target)
+        
+    Returns:
+        Список статистики по целям в порядке target_ids
+    """
+    targets = queue.Queue()
+    for index, target_id in enumerate(target_ids):
+        targets.put((index, target_id))
+    
+    results = {}
+    results_lock = threading.Lock()
+    
+    def worker(token):
+        parser = create_parser(token, cache)
+        try:
+            while True:
+                try:
+                    index, target_id = targets.get_nowait()
+                except queue.Empty:
+                    return
+                data = collect_target(parser, target_id, checkpoints, summary_sinks, archive, streamed)
+                with results_lock:
+                    results[index] = data
+                    print(f"\n[Прогресс] Обработано целей: {len(results)}/{len(target_ids)}", flush=True)
+        finally:
+            parser.close()
+    
+    workers = [token for token in tokens for _ in range(max(1, WORKERS_PER_TOKEN))]
+    workers = workers[:len(target_ids)]
+    print(f"Параллельный сбор: {len(target_ids)} целей, токенов: {len(tokens)}, потоков: {len(workers)}")
+    
+    with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+        for future in [executor.submit(worker, token) for token in workers]:
+            future.result()
+    
+    return [results[index] for index in sorted(results) if results[index]]
+
+
 def collect_data():
     """Основная функция для сбора данных"""
     print("=" * 50)
@@ -36,7 +262,8 @@ def collect_data():
     print("=" * 50)
     
     # Проверка токена
-    if not VK_ACCESS_TOKEN or VK_ACCESS_TOKEN == "your_vk_access_token_here":
+    tokens = get_access_tokens()
+    if not tokens:
         print("Ошибка: Укажите VK_ACCESS_TOKEN в config.py")
         return
     
@@ -48,142 +275,99 @@ def collect_data():
     # Создаем директорию для данных
     create_data_directory()
     
-    # Инициализируем парсер
-    parser = VKParser(VK_ACCESS_TOKEN)
+    cache = APICache(mode=API_CACHE_MODE, max_size_mb=API_CACHE_MAX_MB) if API_CACHE_MODE else None
+    checkpoints = CheckpointStore() if USE_CHECKPOINTS else None
+    
+    # Сводные CSV файлы пополняются по мере сбора всех целей
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_posts = CSVSink(f"data/vk_data_summary_posts_{timestamp}.csv", POST_COLUMNS, COMPRESS_OUTPUT)
+    summary_comments = CSVSink(f"data/vk_data_summary_comments_{timestamp}.csv", COMMENT_COLUMNS, COMPRESS_OUTPUT)
+    summary_sinks = (summary_posts, summary_comments)
+    
+    # Набор Parquet с разбиением по целям и годам (см. storage.py)
+    dataset_posts = dataset_comments = streamed = None
+    if USE_PARQUET:
+        from storage import ParquetDatasetSink, POSTS, COMMENTS
+        dataset_posts, dataset_comments = ParquetDatasetSink(POSTS), ParquetDatasetSink(COMMENTS)
+        streamed = {}
+    # Хранилище SQLite с upsert по (owner_id, ID записи) (см. sql_store.py)
+    store = store_posts = store_comments = None
+    if USE_SQL_STORE:
+        from sql_store import SQLStore, SQLStoreSink, POSTS, COMMENTS
+        store = SQLStore()
+        store_posts, store_comments = SQLStoreSink(store, POSTS), SQLStoreSink(store, COMMENTS)
+    shared_sinks = (FanoutSink(summary_posts, dataset_posts, store_posts),
+                    FanoutSink(summary_comments, dataset_comments, store_comments))
+    # Исходные объекты API сохраняются один раз в сжатый архив с индексом (см. raw_archive.py)
+    archive = RawArchive() if USE_RAW_ARCHIVE else None
     
     # Собираем данные для каждого целевого объекта
-    all_data = []
-    
-    for target_id in TARGET_IDS:
-        print(f"\nОбработка цели: {target_id}")
-        print("-" * 50)
-        print(f"Параметры:")
-        print(f"  - Максимум постов: {MAX_POSTS_PER_GROUP}")
-        print(f"  - Максимум комментариев на пост: {MAX_COMMENTS_PER_POST}")
-        print(f"  - Период: {YEARS_BACK} лет" if YEARS_BACK else "  - Период: без ограничения")
-        print("-" * 50)
-        
-        try:
-            # Парсим данные
-            print("Начинаю парсинг...")
-            data = parser.parse_target(
-                target_id=target_id,
-                max_posts=MAX_POSTS_PER_GROUP,
-                max_comments=MAX_COMMENTS_PER_POST,
-                years_back=YEARS_BACK
-            )
-            
-            if not data or not data.get('posts'):
-                print("⚠ Предупреждение: Данные не получены или пусты")
-                continue
-            
-            # Сохраняем в CSV файлы
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            base_filename = f"data/vk_data_{target_id}_{timestamp}"
-            
-            print(f"\nСохраняю данные в CSV файлы...", flush=True)
-            posts_file, comments_file = parser.save_to_csv(data, base_filename)
-            
-            # Также сохраняем JSON для резервной копии
-            json_filename = f"{base_filename}.json"
-            parser.save_to_json(data, json_filename)
-            
-            print(f"\n✓ Файлы сохранены:")
-            if posts_file:
-                print(f"  - {posts_file}")
-            if comments_file:
-                print(f"  - {comments_file}")
-            print(f"  - {json_filename}")
-            
-            all_data.append(data)
-            
-            print(f"\n✓ Успешно собраны данные для {target_id}")
-            
-        except Exception as e:
-            print(f"✗ Ошибка при сборе данных для {target_id}: {e}")
-            continue
-    
-    # Сохраняем сводные CSV файлы со всеми данными
-    if all_data:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Объединяем все посты и комментарии
-        all_posts_data = []
-        all_comments_data = []
-        
-        for item in all_data:
-            target_id = item.get('target_id', 'unknown')
-            owner_id = item.get('owner_id', 'unknown')
-            
-            # Обрабатываем посты
-            for post in item.get('posts', []):
-                post_date = datetime.fromtimestamp(post.get('date', 0)) if post.get('date') else None
-                all_posts_data.append({
-                    'post_id': post.get('id'),
-                    'target_id': target_id,
-                    'owner_id': owner_id,
-                    'date': post_date.strftime('%Y-%m-%d %H:%M:%S') if post_date else '',
-                    'date_timestamp': post.get('date', ''),
-                    'text': post.get('text', ''),
-                    'text_length': len(post.get('text', '')),
-                    'likes': post.get('likes', {}).get('count', 0),
-                    'reposts': post.get('reposts', {}).get('count', 0),
-                    'comments_count': post.get('comments', {}).get('count', 0),
-                    'views': post.get('views', {}).get('count', 0) if 'views' in post else 0,
-                    'engagement': (post.get('likes', {}).get('count', 0) + 
-                                 post.get('reposts', {}).get('count', 0) + 
-                                 post.get('comments', {}).get('count', 0))
-                })
-            
-            # Обрабатываем комментарии
-            for comment in item.get('comments', []):
-                comment_date = datetime.fromtimestamp(comment.get('date', 0)) if comment.get('date') else None
-                all_comments_data.append({
-                    'comment_id': comment.get('id'),
-                    'post_id': comment.get('post_id'),
-                    'target_id': target_id,
-                    'owner_id': owner_id,
-                    'date': comment_date.strftime('%Y-%m-%d %H:%M:%S') if comment_date else '',
-                    'date_timestamp': comment.get('date', ''),
-                    'text': comment.get('text', ''),
-                    'text_length': len(comment.get('text', '')),
-                    'likes': comment.get('likes', {}).get('count', 0),
-                    'author_id': comment.get('from_id', 0)
-                })
-        
-        # Сохраняем сводные CSV файлы
-        import pandas as pd
-        
-        if all_posts_data:
-            df_all_posts = pd.DataFrame(all_posts_data)
-            summary_posts_filename = f"data/vk_data_summary_posts_{timestamp}.csv"
-            df_all_posts.to_csv(summary_posts_filename, index=False, encoding='utf-8-sig')
-            print(f"\n✓ Сводный файл постов сохранен: {summary_posts_filename} ({len(all_posts_data)} записей)")
-        
-        if all_comments_data:
-            df_all_comments = pd.DataFrame(all_comments_data)
-            summary_comments_filename = f"data/vk_data_summary_comments_{timestamp}.csv"
-            df_all_comments.to_csv(summary_comments_filename, index=False, encoding='utf-8-sig')
-            print(f"✓ Сводный файл комментариев сохранен: {summary_comments_filename} ({len(all_comments_data)} записей)")
+    try:
+        if len(tokens) > 1 or WORKERS_PER_TOKEN > 1:
+            all_stats = collect_targets_parallel(TARGET_IDS, tokens, checkpoints, shared_sinks, cache, archive,
+                                                 streamed)
+        else:
+            all_stats = []
+            parser = create_parser(tokens[0], cache)
+            try:
+                for target_id in TARGET_IDS:
+                    stats = collect_target(parser, target_id, checkpoints, shared_sinks, archive, streamed)
+                    if stats:
+                        all_stats.append(stats)
+            finally:
+                parser.close()
+    finally:
+        for sink in shared_sinks:
+            sink.close()
+        if store:
+            store.close()
+        if archive:
+            archive.close()
+    
+    # Набор Parquet закрыт и содержит строки файлов целей - storage.py convert их не перечитывает
+    if streamed:
+        from storage import mark_streamed
+        mark_streamed(streamed)
+    
+    if all_stats:
+        if summary_posts.count:
+            print(f"\n✓ Сводный файл постов сохранен: {summary_posts.path} ({summary_posts.count} записей)")
+        if summary_comments.count:
+            print(f"✓ Сводный файл комментариев сохранен: {summary_comments.path} ({summary_comments.count} записей)")
+        if dataset_posts:
+            print(f"✓ Набор Parquet дополнен: {dataset_posts.root} "
+                  f"(постов {dataset_posts.count}, комментариев {dataset_comments.count})")
+        if store_posts:
+            print(f"✓ Хранилище SQLite дополнено: {store_posts.path} "
+                  f"(постов {store_posts.count}, комментариев {store_comments.count})")
         
-        # Также сохраняем JSON для резервной копии
+        # Сводный JSON содержит статистику и список файлов, сами данные уже лежат в них
+        total_posts = sum(s['posts_count'] for s in all_stats)
+        total_comments = sum(s['comments_count'] for s in all_stats)
         summary_json_filename = f"data/vk_data_summary_{timestamp}.json"
         summary = {
             'collected_at': datetime.now().isoformat(),
-            'targets_count': len(all_data),
-            'data': all_data
+            'targets_count': len(all_stats),
+            'posts_count': total_posts,
+            'comments_count': total_comments,
+            'summary_files': [sink.path for sink in summary_sinks if sink.count],
+            'targets': all_stats
         }
-        parser.save_to_json(summary, summary_json_filename)
+        with open(summary_json_filename, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"✓ Статистика сбора сохранена в {summary_json_filename}")
         
         # Выводим статистику
         print("\n" + "=" * 50)
         print("СТАТИСТИКА СБОРА ДАННЫХ")
         print("=" * 50)
-        total_posts = sum(len(d['posts']) for d in all_data)
-        total_comments = sum(len(d['comments']) for d in all_data)
-        print(f"Всего обработано целей: {len(all_data)}")
+        print(f"Всего обработано целей: {len(all_stats)}")
         print(f"Всего собрано постов: {total_posts}")
         print(f"Всего собрано комментариев: {total_comments}")
+        if cache:
+            cache_stats = cache.stats()
+            print(f"Кэш API: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}, "
+                  f"размер {cache_stats['size_mb']} МБ")
         print("=" * 50)
 
 
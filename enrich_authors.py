@@ -0,0 +1,187 @@
+"""
+Скрипт для обогащения комментариев сведениями об авторах
+Собирает уникальные author_id из CSV файлов с комментариями, запрашивает
+пользователей через users.get (до 1000 ID за вызов), а сообщества через
+groups.getById и сохраняет таблицу авторов для объединения по author_id.
+Сведения кэшируются на диске, поэтому повторный запуск запрашивает только
+новых авторов
+"""
+
+import os
+import sys
+import pandas as pd
+from parser import VKParser
+from author_cache import AuthorCache
+from datetime import datetime
+
+# Попытка импортировать конфигурацию
+try:
+    from config import VK_ACCESS_TOKEN
+    try:
+        from config import VK_API_URL
+    except ImportError:
+        VK_API_URL = None  # По умолчанию настоящий VK API
+    try:
+        from config import AUTHOR_CACHE_TTL_DAYS
+    except ImportError:
+        AUTHOR_CACHE_TTL_DAYS = 30
+except ImportError:
+    print("Ошибка: Создайте файл config.py на основе config.py.example")
+    sys.exit(1)
+
+
+AUTHORS_FILE = 'data/authors.csv'
+AUTHOR_COLUMNS = ['author_id', 'author_type', 'name', 'sex', 'bdate', 'city', 'country',
+                  'is_closed', 'deactivated', 'members_count']
+
+
+def load_author_ids(data_dir='data'):
+    """
+    Собрать уникальные ID авторов из всех CSV файлов с комментариями
+
+    Returns:
+        Список ID авторов без повторов и нулевых значений
+    """
+    comments_files = [f for f in os.listdir(data_dir) if f.endswith(('_comments.csv', '_comments.csv.gz'))]
+    print(f"Найдено файлов с комментариями: {len(comments_files)}")
+
+    author_ids = set()
+    for filename in comments_files:
+        filepath = os.path.join(data_dir, filename)
+        try:
+            # Читаем только колонку автора, тексты комментариев не нужны
+            df = pd.read_csv(filepath, encoding='utf-8-sig', usecols=['author_id'])
+            author_ids.update(pd.to_numeric(df['author_id'], errors='coerce').dropna().astype('int64'))
+        except Exception as e:
+            print(f"  Ошибка при загрузке {filename}: {e}")
+    author_ids.discard(0)
+    return sorted(author_ids)
+
+
+def fetch_authors(parser, author_ids):
+    """
+    Запросить сведения об авторах у API
+
+    Args:
+        parser: Экземпляр VKParser
+        author_ids: ID авторов: пользователи положительные, сообщества отрицательные
+
+    Returns:
+        Словарь ID -> сведения; авторы, которых API не вернул в успешном ответе,
+        отмечены 'missing': True. Авторов из частей, запрос которых не удался,
+        в словаре нет - они будут запрошены снова при следующем запуске
+    """
+    user_ids = [author_id for author_id in author_ids if author_id > 0]
+    group_ids = [author_id for author_id in author_ids if author_id < 0]
+
+    records = {}
+    failed_users, failed_groups = [], []
+    if user_ids:
+        for user in parser.get_users_info(user_ids, failed=failed_users):
+            records[user['id']] = user
+    if group_ids:
+        for group in parser.get_groups_info(group_ids, failed=failed_groups):
+            # Сообщества - авторы комментариев хранятся с отрицательным ID
+            records[-group['id']] = group
+
+    failed = set(failed_users) | {-group_id for group_id in failed_groups}
+    for author_id in author_ids:
+        if author_id not in records and author_id not in failed:
+            records[author_id] = {'missing': True}
+    if failed:
+        print(f"⚠ Не удалось запросить сведения о {len(failed)} авторах, они не сохранены в кэш")
+    return records
+
+
+def enrich_authors(parser, author_ids, cache=None):
+    """
+    Получить сведения об авторах, запрашивая у API только отсутствующих в кэше
+
+    Args:
+        parser: Экземпляр VKParser
+        author_ids: ID авторов
+        cache: Кэш авторов (None - все авторы запрашиваются заново)
+
+    Returns:
+        Словарь ID -> сведения об авторе
+    """
+    authors = cache.get_many(author_ids) if cache else {}
+    missing = [author_id for author_id in author_ids if author_id not in authors]
+    print(f"Авторов в кэше: {len(authors)}, запрашиваем у API: {len(missing)}")
+
+    if missing:
+        fetched = fetch_authors(parser, missing)
+        if cache:
+            cache.put_many(fetched)
+        authors.update(fetched)
+    return authors
+
+
+def author_to_row(author_id, author):
+    """Строка таблицы авторов"""
+    if author.get('missing'):
+        return {'author_id': author_id, 'author_type': 'unknown'}
+    if author_id < 0:
+        return {
+            'author_id': author_id,
+            'author_type': 'group',
+            'name': author.get('name', ''),
+            'is_closed': author.get('is_closed', ''),
+            'deactivated': author.get('deactivated', ''),
+            'members_count': author.get('members_count', '')
+        }
+    return {
+        'author_id': author_id,
+        'author_type': 'user',
+        'name': f"{author.get('first_name', '')} {author.get('last_name', '')}".strip(),
+        'sex': author.get('sex', ''),
+        'bdate': author.get('bdate', ''),
+        'city': author.get('city', {}).get('title', ''),
+        'country': author.get('country', {}).get('title', ''),
+        'is_closed': author.get('is_closed', ''),
+        'deactivated': author.get('deactivated', '')
+    }
+
+
+def main():
+    """Основная функция"""
+    print("=" * 60)
+    print("ОБОГАЩЕНИЕ КОММЕНТАРИЕВ СВЕДЕНИЯМИ ОБ АВТОРАХ")
+    print("=" * 60)
+
+    if not os.path.exists('data'):
+        print("Папка data не существует. Сначала соберите данные.")
+        return
+
+    author_ids = load_author_ids()
+    if not author_ids:
+        print("Не найдены авторы комментариев.")
+        return
+    print(f"Уникальных авторов: {len(author_ids)}")
+
+    cache = AuthorCache(ttl_days=AUTHOR_CACHE_TTL_DAYS)
+    parser = VKParser(VK_ACCESS_TOKEN, api_url=VK_API_URL)
+    try:
+        authors = enrich_authors(parser, author_ids, cache)
+    finally:
+        parser.close()
+        cache.close()
+
+    df = pd.DataFrame([author_to_row(author_id, authors.get(author_id, {'missing': True}))
+                       for author_id in author_ids],
+                      columns=AUTHOR_COLUMNS)
+    df['members_count'] = pd.to_numeric(df['members_count'], errors='coerce').astype('Int64')
+    df.to_csv(AUTHORS_FILE, index=False, encoding='utf-8-sig')
+
+    print(f"\n✓ Сведения об авторах сохранены в {AUTHORS_FILE} ({len(df)} записей)")
+    print(f"  Пользователей: {(df['author_type'] == 'user').sum()}, "
+          f"сообществ: {(df['author_type'] == 'group').sum()}")
+    unknown = (df['author_type'] == 'unknown').sum()
+    if unknown:
+        print(f"⚠ Не удалось получить сведения: {unknown}")
+    print(f"  Обновлено: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Кэш меток комментариев между запусками анализа
+Тональность, намерение и темы комментария зависят только от его
+предобработанного и исходного текста и от словарей, поэтому хранятся в SQLite
+с 64-битным ключом по хэшу обоих текстов. Метка хранится одним целым числом
+(тональность, номер намерения и битовая маска тем), поиск идет одним
+соединением с временной таблицей ключей, а чтение ничего не записывает в базу.
+При повторном анализе после очередного объединения данных заново оцениваются
+только новые и измененные комментарии.
+
+Записи помечены версией оценки (хэш кода lexicons.py и lexicon_matcher.py):
+после правки словарей или правил кэш очищается автоматически. Размер
+ограничен числом записей, при превышении удаляются самые старые
+"""
+
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import lexicon_matcher
+import lexicons
+from lexicon_matcher import get_matcher, topics_from_masks
+from lexicons import INTENT_RULES, DEFAULT_INTENT
+from scoring_executor import Scorer, run_scorers
+from text_preprocessing import as_strings
+
+try:
+    from config import USE_LABEL_CACHE
+except ImportError:
+    USE_LABEL_CACHE = False  # По умолчанию метки пересчитываются: LexiconMatcher быстрее кэша (см. README)
+
+try:
+    from config import LABEL_CACHE_MAX_ENTRIES
+except ImportError:
+    LABEL_CACHE_MAX_ENTRIES = 2_000_000
+
+
+LABEL_CACHE_PATH = 'data/cache/labels.sqlite'
+
+# Увеличить, если меняется формат записей
+LABEL_CACHE_FORMAT = 2
+
+# Намерения по номерам в метке
+INTENTS = [intent for intent, _, _ in INTENT_RULES] + [DEFAULT_INTENT]
+
+# Метка: тональность + 1 в битах 0-1, номер намерения в битах 2-7, маска тем с бита 8
+_INTENT_SHIFT = 2
+_TOPIC_SHIFT = 8
+
+
+def pack_labels(sentiment, intents: List[str], topic_masks) -> np.ndarray:
+    """Метки одним числом из тональности (-1, 0, 1), намерений и масок тем"""
+    intent_codes = pd.Categorical(intents, categories=INTENTS).codes.astype(np.int64)
+    return ((np.asarray(sentiment, dtype=np.int64) + 1) | intent_codes << _INTENT_SHIFT
+            | np.asarray(topic_masks, dtype=np.int64) << _TOPIC_SHIFT)
+
+
+def unpack_labels(labels: np.ndarray, index: pd.Index) -> pd.DataFrame:
+    """DataFrame с колонками sentiment, intent и topics из меток pack_labels"""
+    labels = np.asarray(labels, dtype=np.int64)
+    intents = np.array(INTENTS, dtype=object)[labels >> _INTENT_SHIFT & (1 << _TOPIC_SHIFT - _INTENT_SHIFT) - 1]
+    return pd.DataFrame({
+        'sentiment': ((labels & 3) - 1).astype(np.int8),
+        'intent': pd.Categorical(intents),
+        'topics': pd.Series(topics_from_masks(labels >> _TOPIC_SHIFT), index=index, dtype=object),
+    }, index=index)
+
+
+def score_labels(processed: List[str], raw: List[str]) -> Dict[str, np.ndarray]:
+    """Функция оценки для scoring_executor: колонка label (см. pack_labels)"""
+    scores = get_matcher().score_batch(processed, raw)
+    return {'label': pack_labels(scores['sentiment'], scores['intent'], scores['topic_mask'])}
+
+
+# Колонки комментариев, рассчитываемые по текстам
+LABEL_SCORERS = [Scorer(score_labels, ['text_processed', 'text'], {'label': np.int64})]
+
+
+def scorer_version() -> str:
+    """Версия оценки: хэш кода словарей и поиска по ним"""
+    digest = hashlib.sha1(str(LABEL_CACHE_FORMAT).encode('utf-8'))
+    for module in (lexicons, lexicon_matcher):
+        digest.update(inspect.getsource(module).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _hash_texts(texts: List[str]) -> np.ndarray:
+    """64-битные хэши строк (векторно, без хэширования каждой строки в Python)"""
+    try:
+        return pd.util.hash_array(np.array(texts, dtype=object), categorize=False)
+    except UnicodeEncodeError:
+        # Одиночные суррогаты не кодируются в UTF-8: такие строки хэшируются по байтам surrogatepass
+        return pd.util.hash_array(np.array([_encodable(text) for text in texts], dtype=object), categorize=False)
+
+
+def _encodable(text: str) -> str:
+    try:
+        text.encode('utf-8')
+        return text
+    except UnicodeEncodeError:
+        return text.encode('utf-8', 'surrogatepass').decode('latin-1')
+
+
+def text_keys(processed: List[str], raw: List[str]) -> np.ndarray:
+    """
+    Ключи кэша для пар текстов
+
+    Хэши двух текстов считаются отдельно и объединяются, поэтому граница между
+    текстами однозначна.
+    """
+    with np.errstate(over='ignore'):
+        keys = _hash_texts(processed) * np.uint64(0x9E3779B97F4A7C15) ^ _hash_texts(raw)
+    return keys.view(np.int64)
+
+
+class LabelCache:
+    """Потокобезопасный кэш меток с версией оценки и вытеснением самых старых записей"""
+
+    def __init__(self, path: str = LABEL_CACHE_PATH, max_entries: int = LABEL_CACHE_MAX_ENTRIES,
+                 version: Optional[str] = None):
+        """
+        Инициализация кэша
+
+        Args:
+            path: Путь к файлу SQLite
+            max_entries: Максимальное число записей
+            version: Версия оценки (None - scorer_version()); записи другой версии удаляются
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version or scorer_version()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != self.version:
+            if row is not None:
+                print("⚠ Словари изменились, кэш меток очищен")
+            # Таблица пересоздается: формат записей мог измениться
+            self._conn.execute("DROP TABLE IF EXISTS labels")
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (self.version,))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            " key INTEGER PRIMARY KEY,"
+            " label INTEGER NOT NULL,"
+            " added_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TEMP TABLE lookup (key INTEGER PRIMARY KEY)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def get_many(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Сохраненные метки
+
+        Ключи по возрастанию записываются во временную таблицу, и метки
+        читаются одним соединением с ней; сама таблица меток при чтении не меняется.
+
+        Args:
+            keys: Ключи text_keys
+
+        Returns:
+            Метки (pack_labels) в порядке keys; -1 для ключей, которых нет в кэше
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        unique = np.unique(keys)
+        with self._lock:
+            self._conn.execute("DELETE FROM lookup")
+            self._conn.executemany("INSERT INTO lookup (key) VALUES (?)", ((key,) for key in unique.tolist()))
+            # Строки идут в порядке ключей временной таблицы, то есть unique
+            rows = self._conn.execute(
+                "SELECT COALESCE(labels.label, -1) FROM lookup LEFT JOIN labels ON labels.key = lookup.key"
+            ).fetchall()
+            self._conn.execute("DELETE FROM lookup")
+            self._conn.commit()
+        found = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        hits = int((found >= 0).sum())
+        self.hits += hits
+        self.misses += len(unique) - hits
+        return found[np.searchsorted(unique, keys)]
+
+    def put_many(self, keys: np.ndarray, labels: np.ndarray):
+        """Сохранить метки (ключи text_keys и метки pack_labels)"""
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO labels (key, label, added_at) VALUES (?, ?, ?)",
+                zip(np.asarray(keys, dtype=np.int64).tolist(), np.asarray(labels, dtype=np.int64).tolist(),
+                    [now] * len(keys))
+            )
+            self._entries += self._conn.total_changes - before
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Удалить самые старые записи до 90% лимита"""
+        excess = self._entries - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM labels WHERE key IN (SELECT key FROM labels ORDER BY added_at LIMIT ?)", (excess,)
+        )
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Попадания, промахи и число записей"""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': self._entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def label_texts(processed: pd.Series, raw: pd.Series, cache: Optional[LabelCache] = None,
+                workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Тональность, намерение и темы комментариев с оценкой только промахов кэша
+
+    Args:
+        processed: Предобработанные тексты
+        raw: Исходные тексты с тем же индексом
+        cache: Кэш меток (None - оценить все тексты)
+        workers: Число процессов для оценки (см. scoring_executor.run_scorers)
+
+    Returns:
+        DataFrame с колонками sentiment, intent и topics и индексом processed
+    """
+    frame = pd.DataFrame({'text_processed': processed, 'text': raw})
+    if cache is None:
+        return unpack_labels(run_scorers(frame, LABEL_SCORERS, workers=workers)['label'], processed.index)
+
+    keys = text_keys(as_strings(processed), as_strings(raw))
+    labels = cache.get_many(keys)
+    missing = labels < 0
+    if missing.any():
+        # Одинаковые новые тексты оцениваются один раз
+        new_keys, first = np.unique(keys[missing], return_index=True)
+        scored = run_scorers(frame.iloc[np.flatnonzero(missing)[first]], LABEL_SCORERS, workers=workers)
+        new_labels = scored['label'].to_numpy()
+        cache.put_many(new_keys, new_labels)
+        labels[missing] = new_labels[np.searchsorted(new_keys, keys[missing])]
+    return unpack_labels(labels, processed.index)
@@ -0,0 +1,241 @@
+"""
+Поиск слов словарей одним проходом по тексту
+Все слова lexicons.py (тональность, намерения, темы) собираются в один автомат
+Ахо-Корасик с заранее посчитанными признаками каждого слова: вес в
+положительной и отрицательной оценке, правила намерений и темы. Тексты части
+склеиваются через разделитель и просматриваются автоматом один раз, найденные
+слова сводятся к тональности, намерению и темам векторными операциями.
+
+Результат совпадает с построчными проверками `word in text` из analysis.ipynb:
+тональность и намерение считаются по предобработанному тексту, темы - по
+исходному. Автомат строится модулем pyahocorasick, без него каждое слово
+ищется во всей склеенной части поиском подстроки
+"""
+
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lexicons import (EXTENDED_POSITIVE_WORDS, EXTENDED_NEGATIVE_WORDS, POSITIVE_MEDICAL_MARKERS,
+                      NEGATIVE_MEDICAL_MARKERS, SENTIMENT_THRESHOLD, SENTIMENT_LABELS, INTENT_RULES,
+                      DEFAULT_INTENT, MEDICAL_TOPICS)
+from text_preprocessing import SEPARATOR, as_strings
+
+# Текстов в одной части
+CHUNK_ROWS = 100_000
+
+
+def _weight(word: str, markers: Sequence[str]) -> int:
+    """Вес слова тональности: слово с медицинским маркером весит 2, остальные - 1"""
+    return 2 if any(marker in word for marker in markers) else 1
+
+
+class _KeywordSearch:
+    """Все вхождения набора слов в строку: автомат Ахо-Корасик или поиск подстрок"""
+
+    def __init__(self, keywords: List[str], backend: str):
+        self.keywords = keywords
+        self.backend = backend
+        self.lengths = np.array([len(keyword) for keyword in keywords], dtype=np.int64)
+        if backend == 'ahocorasick':
+            import ahocorasick
+            self.automaton = ahocorasick.Automaton()
+            for keyword_id, keyword in enumerate(keywords):
+                self.automaton.add_word(keyword, keyword_id)
+            self.automaton.make_automaton()
+
+    def find(self, haystack: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Вхождения слов
+
+        Returns:
+            (позиции начала, номера слов); для поиска подстрок - хотя бы одно
+            вхождение каждого слова в каждый содержащий его текст
+        """
+        if self.backend == 'ahocorasick':
+            found = np.fromiter(chain.from_iterable(self.automaton.iter(haystack)), dtype=np.int64).reshape(-1, 2)
+            return found[:, 0] - self.lengths[found[:, 1]] + 1, found[:, 1]
+        starts, ids = [], []
+        for keyword_id, keyword in enumerate(self.keywords):
+            position = haystack.find(keyword)
+            while position != -1:
+                starts.append(position)
+                ids.append(keyword_id)
+                position = haystack.find(keyword, position + len(keyword))
+        return np.array(starts, dtype=np.int64), np.array(ids, dtype=np.int64)
+
+
+def default_backend() -> str:
+    """'ahocorasick', если установлен pyahocorasick, иначе 'substring'"""
+    try:
+        import ahocorasick  # noqa: F401
+        return 'ahocorasick'
+    except ImportError:
+        return 'substring'
+
+
+class LexiconMatcher:
+    """
+    Тональность, намерение и темы текстов по словарям lexicons.py
+
+    Слова тональности и намерений ищутся одним автоматом в предобработанных
+    текстах, слова тем - вторым автоматом в исходных текстах в нижнем регистре
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        """
+        Args:
+            backend: 'ahocorasick', 'substring' или None (ahocorasick, если установлен)
+        """
+        self.backend = backend or default_backend()
+
+        # Признаки слов тональности и намерений. Повторы в словарях учитываются,
+        # как в исходном цикле по спискам: повторенное слово добавляет вес дважды
+        text_keywords: Dict[str, int] = {}
+        positive, negative, intent_bits = [], [], []
+
+        def keyword_id(word):
+            if word not in text_keywords:
+                text_keywords[word] = len(text_keywords)
+                positive.append(0)
+                negative.append(0)
+                intent_bits.append(0)
+            return text_keywords[word]
+
+        for word in EXTENDED_POSITIVE_WORDS:
+            positive[keyword_id(word)] += _weight(word, POSITIVE_MEDICAL_MARKERS)
+        for word in EXTENDED_NEGATIVE_WORDS:
+            negative[keyword_id(word)] += _weight(word, NEGATIVE_MEDICAL_MARKERS)
+        for rule, (_, words, _) in enumerate(INTENT_RULES):
+            for word in words:
+                intent_bits[keyword_id(word)] |= 1 << rule
+        self.positive = np.array(positive, dtype=np.float64)
+        self.negative = np.array(negative, dtype=np.float64)
+        self.intent_bits = np.array(intent_bits, dtype=np.int64)
+        self.text_search = _KeywordSearch(list(text_keywords), self.backend)
+
+        topic_keywords: Dict[str, int] = {}
+        for topic, (_, words) in enumerate(MEDICAL_TOPICS.items()):
+            for word in words:
+                topic_keywords[word] = topic_keywords.get(word, 0) | 1 << topic
+        self.topic_bits = np.array(list(topic_keywords.values()), dtype=np.int64)
+        self.topic_search = _KeywordSearch(list(topic_keywords), self.backend)
+
+    @staticmethod
+    def _matches(search: _KeywordSearch, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Пары (номер текста, номер слова) без повторов для слов, найденных в текстах в нижнем регистре"""
+        joined = SEPARATOR.join(texts)
+        lowered = joined.lower()
+        if len(lowered) != len(joined):
+            # Редкие символы (например, İ) в нижнем регистре длиннее - границы текстов считаются заново
+            texts = [text.lower() for text in texts]
+            lowered = SEPARATOR.join(texts)
+        lengths = np.array(list(map(len, texts)), dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(lengths + len(SEPARATOR))[:-1]))
+        positions, keyword_ids = search.find(lowered)
+        hits = np.zeros((len(texts), len(search.keywords)), dtype=bool)
+        hits[np.searchsorted(starts, positions, side='right') - 1, keyword_ids] = True
+        return np.nonzero(hits)
+
+    def score_batch(self, processed: List[str], raw: Optional[List[str]] = None) -> Dict[str, object]:
+        """
+        Тональность, намерение и темы списка текстов
+
+        Args:
+            processed: Предобработанные тексты (строки)
+            raw: Исходные тексты для поиска тем (строки; None - без тем)
+
+        Returns:
+            Словарь: 'sentiment' (массив -1/0/1), 'intent' (список), 'topics' (список списков или None)
+            и 'topic_mask' (массив битовых масок тем по порядку MEDICAL_TOPICS или None)
+        """
+        size = len(processed)
+        words = np.fromiter((len(text.split()) for text in processed), dtype=np.int64, count=size)
+        short = np.fromiter((len(text) < 3 for text in processed), dtype=bool, count=size)
+
+        text_ids, keyword_ids = self._matches(self.text_search, processed)
+        positive = np.bincount(text_ids, weights=self.positive[keyword_ids], minlength=size)
+        negative = np.bincount(text_ids, weights=self.negative[keyword_ids], minlength=size)
+        score = (positive - negative) / np.maximum(words, 1) * 10
+        sentiment = np.where(score > SENTIMENT_THRESHOLD, 1, np.where(score < -SENTIMENT_THRESHOLD, -1, 0))
+        sentiment[short | (words == 0)] = 0
+
+        bits = np.zeros(size, dtype=np.int64)
+        np.bitwise_or.at(bits, text_ids, self.intent_bits[keyword_ids])
+        conditions = [(bits >> rule & 1).astype(bool) & (words > min_words if min_words else True)
+                      for rule, (_, _, min_words) in enumerate(INTENT_RULES)]
+        intents = np.select(conditions, [intent for intent, _, _ in INTENT_RULES], default=DEFAULT_INTENT)
+        intents[short] = DEFAULT_INTENT
+
+        topics = topic_masks = None
+        if raw is not None:
+            text_ids, keyword_ids = self._matches(self.topic_search, raw)
+            topic_masks = np.zeros(len(raw), dtype=np.int64)
+            np.bitwise_or.at(topic_masks, text_ids, self.topic_bits[keyword_ids])
+            topics = topics_from_masks(topic_masks)
+        return {'sentiment': sentiment.astype(np.int64), 'intent': intents.tolist(), 'topics': topics,
+                'topic_mask': topic_masks}
+
+    def score(self, processed: pd.Series, raw: Optional[pd.Series] = None,
+              chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+        """
+        Тональность, намерение и темы колонки текстов
+
+        Args:
+            processed: Предобработанные тексты
+            raw: Исходные тексты с тем же индексом (None - без колонки topics)
+            chunk_rows: Текстов в одной части
+
+        Returns:
+            DataFrame с колонками sentiment, intent, topics и sentiment_label
+        """
+        processed_values = as_strings(processed)
+        raw_values = as_strings(raw) if raw is not None else None
+        sentiment, intents, topics = [], [], []
+        for start in range(0, len(processed_values), chunk_rows):
+            part = self.score_batch(processed_values[start:start + chunk_rows],
+                                    raw_values[start:start + chunk_rows] if raw_values is not None else None)
+            sentiment.append(part['sentiment'])
+            intents.extend(part['intent'])
+            if part['topics'] is not None:
+                topics.extend(part['topics'])
+        result = pd.DataFrame({
+            'sentiment': np.concatenate(sentiment) if sentiment else np.array([], dtype=np.int64),
+            'intent': pd.Series(intents, dtype=object),
+        })
+        if raw is not None:
+            result['topics'] = pd.Series(topics, dtype=object)
+        result.index = processed.index
+        result['sentiment_label'] = result['sentiment'].map(SENTIMENT_LABELS)
+        return result
+
+
+_topic_lists = None
+
+
+def topics_from_masks(masks) -> List[List[str]]:
+    """Списки тем по битовым маскам (бит i - i-я тема MEDICAL_TOPICS)"""
+    global _topic_lists
+    if _topic_lists is None:
+        names = list(MEDICAL_TOPICS)
+        _topic_lists = [tuple(name for bit, name in enumerate(names) if mask >> bit & 1)
+                        for mask in range(1 << len(names))]
+    return [list(_topic_lists[mask]) for mask in np.asarray(masks).tolist()]
+
+
+_default_matcher = None
+
+
+def get_matcher() -> LexiconMatcher:
+    """Общий экземпляр LexiconMatcher (автоматы строятся один раз)"""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = LexiconMatcher()
+    return _default_matcher
+
+
+def score_texts(processed: List[str], raw: List[str]) -> Dict[str, object]:
+    """Функция оценки для scoring_executor: колонки sentiment, intent и topics"""
+    return get_matcher().score_batch(processed, raw)
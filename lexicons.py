@@ -0,0 +1,89 @@
+"""
+Словари для анализа комментариев
+Списки слов сентимент-анализа, классификации по намерению и ключевых тем
+перенесены из analysis.ipynb без изменений. Порядок и повторы сохранены:
+от них зависят веса и результат классификации
+"""
+
+# Сентимент-анализ: каждое найденное слово дает +1 (или +2 для медицинских терминов)
+EXTENDED_POSITIVE_WORDS = [
+    # Базовые положительные
+    'хорошо', 'отлично', 'замечательно', 'прекрасно', 'спасибо', 'благодарю',
+    'лучше', 'улучшилось', 'улучшение', 'прогресс', 'развитие', 'работает',
+    'качественно', 'профессионально', 'помогли', 'вылечили', 'вылечила', 'вылечил',
+    'доволен', 'довольна', 'довольны', 'рад', 'рада', 'рады', 'нравится',
+    'замечательные', 'отличные', 'хорошие', 'профессионалы', 'врачи', 'медики',
+    'молодцы', 'благодарность', 'благодарен', 'благодарна',
+    # Медицинские положительные
+    'вылечили', 'помогли', 'спасли', 'спасибо врачам', 'спасибо медикам',
+    'качественное лечение', 'профессиональная помощь', 'внимательные врачи',
+    'опытные специалисты', 'современное оборудование', 'эффективное лечение',
+    'быстро помогли', 'вовремя диагностировали', 'правильный диагноз',
+    'успешная операция', 'реабилитация', 'выздоровление'
+]
+
+EXTENDED_NEGATIVE_WORDS = [
+    # Базовые отрицательные
+    'плохо', 'ужасно', 'кошмар', 'ужас', 'проблема', 'проблемы', 'не работает',
+    'не помогли', 'не помогло', 'не вылечили', 'недоволен', 'недовольна', 'недовольны',
+    'ухудшилось', 'ухудшение', 'деградация', 'развал', 'катастрофа', 'беда',
+    'некачественно', 'непрофессионально', 'некомпетентно', 'некомпетентные',
+    'негативно', 'отрицательно', 'негатив', 'жалоба', 'жалобы', 'негативный',
+    'ужасные', 'плохие', 'некачественные', 'не могут', 'гоняют', 'отказывают',
+    # Медицинские отрицательные
+    'не могут поставить диагноз', 'не могут помочь', 'не лечат', 'не лечили',
+    'отказывают в лечении', 'отказывают в помощи', 'долго ждать', 'очереди',
+    'не хватает врачей', 'не хватает лекарств', 'дорого', 'недоступно',
+    'неправильный диагноз', 'неправильное лечение', 'ухудшилось состояние',
+    'не помогло лечение', 'неэффективное лечение', 'плохое обслуживание',
+    'грубые врачи', 'невнимательные', 'некомпетентные врачи', 'халатность'
+]
+
+# Слово словаря, содержащее одну из этих подстрок, считается медицинским и весит 2
+POSITIVE_MEDICAL_MARKERS = ['врач', 'лечение', 'помог', 'вылеч', 'диагноз']
+NEGATIVE_MEDICAL_MARKERS = ['врач', 'лечение', 'не помог', 'не леч', 'диагноз', 'отказыва']
+
+# Порог нормированной оценки (pos - neg) / слов * 10 для положительной и отрицательной тональности
+SENTIMENT_THRESHOLD = 0.15
+
+SENTIMENT_LABELS = {1: 'Положительный', 0: 'Нейтральный', -1: 'Отрицательный'}
+
+# Классификация по намерению: правила проверяются по порядку, первое совпадение
+# определяет намерение. Третий элемент - минимальное число слов в тексте (больше него)
+INTENT_RULES = [
+    ('вопрос', ['как', 'где', 'когда', 'почему', 'что', 'кто', 'какой', 'какая', 'какие',
+                'можно ли', 'можно', 'как получить', 'как записаться', 'как попасть',
+                'где найти', 'где получить', 'когда будет', 'сколько стоит', '?'], 0),
+    ('благодарность', ['спасибо', 'благодарю', 'благодарность', 'благодарен', 'благодарна',
+                       'спасибо врачам', 'спасибо медикам', 'спасибо за', 'большое спасибо'], 0),
+    ('жалоба', ['жалоба', 'жалуюсь', 'недоволен', 'недовольна', 'недовольны',
+                'плохо', 'ужасно', 'кошмар', 'проблема', 'не работает',
+                'не помогли', 'не вылечили', 'отказывают', 'не могут помочь'], 0),
+    ('критика', ['некачественно', 'непрофессионально', 'некомпетентно', 'халатность',
+                 'неправильно', 'неправильный', 'неэффективно', 'плохое обслуживание',
+                 'грубые', 'невнимательные', 'не хватает'], 0),
+    ('личный_опыт', ['был', 'была', 'были', 'ходил', 'ходила', 'ходили', 'лечился', 'лечилась',
+                     'операция', 'лечение', 'диагноз', 'врач сказал', 'врач назначил',
+                     'мне помогли', 'мне вылечили', 'у меня', 'я был', 'я лечился'], 5),
+    ('предложение', ['предлагаю', 'нужно', 'надо', 'следует', 'рекомендую', 'лучше бы',
+                     'хорошо бы', 'было бы', 'стоит', 'можно было бы'], 0),
+    ('информационный_комментарий', ['это', 'такой', 'такая', 'такие', 'означает', 'значит', 'то есть',
+                                    'в том числе', 'также', 'кроме того', 'например', 'в частности'], 3),
+]
+
+DEFAULT_INTENT = 'неопределенный'
+
+# Ключевые темы: тема найдена, если в тексте есть одно из ее слов
+MEDICAL_TOPICS = {
+    'диагностика': ['диагноз', 'диагностика', 'обследование', 'анализ', 'результат анализов'],
+    'лечение': ['лечение', 'терапия', 'лекарство', 'препарат', 'медикамент', 'операция'],
+    'врачи': ['врач', 'доктор', 'специалист', 'медик', 'хирург', 'терапевт'],
+    'больницы': ['больница', 'поликлиника', 'клиника', 'госпиталь', 'медцентр'],
+    'очереди': ['очередь', 'ждать', 'запись', 'талон', 'прием'],
+    'деньги': ['деньги', 'стоимость', 'цена', 'платно', 'бесплатно', 'оплата'],
+    'качество': ['качество', 'качественно', 'некачественно', 'плохо', 'хорошо'],
+    'доступность': ['доступно', 'недоступно', 'можно', 'нельзя', 'отказали']
+}
+
+# Стоп-слова при подготовке текстов к тематическому моделированию (LDA)
+LDA_STOPWORDS = ['это', 'как', 'что', 'для', 'или', 'быть']
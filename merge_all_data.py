@@ -1,75 +1,494 @@
 """
 Скрипт для объединения всех собранных данных в один файл
+Объединение инкрементальное: в манифесте запоминаются уже обработанные файлы
+(размер, время изменения, хэш), а в индексе - ключи уже объединенных записей.
+Повторный запуск читает только новые или изменившиеся файлы и добавляет в
+объединенный файл только новые записи, сохраняя сортировку по дате.
+
+Память ограничена параметром MERGE_MEMORY_MB: новые записи читаются частями,
+каждая часть сортируется и записывается во временный файл, после чего части
+сливаются с объединенным файлом внешней сортировкой по date_timestamp.
+Объединенный файл загружается для анализа функцией load_merged с компактными
+типами колонок
 """
 
+import hashlib
+import json
 import os
+import shutil
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from pandas.api.types import union_categoricals
+from normalizer import POST_COLUMNS, COMMENT_COLUMNS, DATE_FORMAT
 
-def merge_all_data():
-    """Объединить все CSV файлы с постами и комментариями"""
-    data_dir = 'data'
-    
-    # Находим все файлы с постами
-    posts_files = [f for f in os.listdir(data_dir) if f.endswith('_posts.csv')]
-    comments_files = [f for f in os.listdir(data_dir) if f.endswith('_comments.csv')]
-    
-    print(f"Найдено файлов с постами: {len(posts_files)}")
-    print(f"Найдено файлов с комментариями: {len(comments_files)}")
-    
-    # Объединяем посты
-    all_posts = []
-    for filename in posts_files:
-        filepath = os.path.join(data_dir, filename)
+try:
+    from config import MERGE_MEMORY_MB
+except ImportError:
+    MERGE_MEMORY_MB = 512  # По умолчанию до ~512 МБ на данные в памяти
+
+
+MERGE_DIR = 'data/merge'
+
+# Для каждого типа: колонки, ID записи, окончания файлов сбора, объединенный файл
+KINDS = {
+    'posts': {
+        'columns': POST_COLUMNS,
+        'id': 'post_id',
+        'suffixes': ('_posts.csv', '_posts.csv.gz'),
+        'output': 'data/vk_data_ALL_POSTS_merged.csv',
+        'label': 'постов',
+        'files_label': 'постами',
+        'title': 'Объединенные посты',
+    },
+    'comments': {
+        'columns': COMMENT_COLUMNS,
+        'id': 'comment_id',
+        'suffixes': ('_comments.csv', '_comments.csv.gz'),
+        'output': 'data/vk_data_ALL_COMMENTS_merged.csv',
+        'label': 'комментариев',
+        'files_label': 'комментариями',
+        'title': 'Объединенные комментарии',
+    },
+}
+
+# Повторяющиеся значения хранятся как категории
+CATEGORY_COLUMNS = ['target_id', 'owner_id']
+
+# Целочисленные колонки, которые при загрузке сжимаются до наименьшего подходящего типа
+INTEGER_COLUMNS = ['post_id', 'comment_id', 'date_timestamp', 'text_length', 'likes', 'reposts',
+                   'comments_count', 'views', 'engagement', 'author_id']
+
+# Во сколько раз часть в памяти больше своего объема в CSV-строках с учетом копий
+# при фильтрации и сортировке
+_WORKING_COPIES = 4
+
+# Меньше строк в части читать не имеет смысла даже при малом бюджете
+_MIN_CHUNK_ROWS = 1000
+
+
+def file_sha1(path):
+    """SHA-1 содержимого файла"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _merge_dtypes(columns):
+    """
+    Типы при чтении для объединения: значения остаются строками и попадают в
+    объединенный файл без изменений, повторяющиеся ID - категориями
+    """
+    return {column: 'category' if column in CATEGORY_COLUMNS else str for column in columns}
+
+
+def _read_chunks(path, columns, chunk_rows, usecols=None):
+    return pd.read_csv(path, encoding='utf-8-sig', dtype=_merge_dtypes(columns), keep_default_na=False,
+                       usecols=usecols, chunksize=chunk_rows)
+
+
+def _numeric(column):
+    """Числовые значения колонки (в том числе категориальной), некорректные - NaN"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = pd.to_numeric(pd.Series(column.cat.categories.astype(str)), errors='coerce')
+        # Код -1 (пропуск) указывает на добавленный в конец NaN
+        values = np.append(categories.to_numpy(dtype=np.float64), np.nan)[column.cat.codes.to_numpy()]
+        return pd.Series(values, index=column.index)
+    return pd.to_numeric(column, errors='coerce')
+
+
+def _key_array(frame, id_column):
+    """
+    Ключи (owner_id, id) записей, упакованные в int64
+
+    ID записей VK меньше 2^32, а owner_id по модулю меньше 2^31, поэтому
+    owner_id * 2^32 + id однозначно задает запись и помещается в int64.
+
+    Returns:
+        Массив ключей и маска строк с корректными ключами
+    """
+    owner = _numeric(frame['owner_id'])
+    ids = _numeric(frame[id_column])
+    valid = (owner.notna() & ids.notna()).to_numpy()
+    keys = (owner.fillna(0).astype(np.int64).to_numpy() << 32) + ids.fillna(0).astype(np.int64).to_numpy()
+    return keys, valid
+
+
+def _timestamps(frame):
+    """date_timestamp как int64 (пустые значения - 0)"""
+    return _numeric(frame['date_timestamp']).fillna(0).astype(np.int64).to_numpy()
+
+
+def _contains(sorted_keys, keys):
+    """Какие из keys есть в отсортированном массиве sorted_keys"""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return sorted_keys[positions] == keys
+
+
+def _insert_keys(sorted_keys, keys):
+    """Добавить ключи в отсортированный массив с сохранением порядка"""
+    keys = np.sort(keys)
+    return np.insert(sorted_keys, np.searchsorted(sorted_keys, keys), keys)
+
+
+def chunk_rows_for(path, columns, memory_mb=MERGE_MEMORY_MB):
+    """
+    Количество строк в части, при котором обработка укладывается в бюджет памяти
+
+    Объем строки оценивается по первым строкам файла.
+    """
+    sample = pd.read_csv(path, encoding='utf-8-sig', dtype=_merge_dtypes(columns), keep_default_na=False,
+                         nrows=_MIN_CHUNK_ROWS)
+    row_bytes = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+    return max(int(memory_mb * 1024 * 1024 / (row_bytes * _WORKING_COPIES)), _MIN_CHUNK_ROWS)
+
+
+class MergeState:
+    """
+    Состояние объединения одного типа записей
+
+    Манифест (JSON) хранит подписи обработанных файлов, размер объединенного
+    файла и границы дат, индекс (npy) - отсортированные ключи уже объединенных записей.
+    """
+
+    def __init__(self, kind, directory=MERGE_DIR, memory_mb=MERGE_MEMORY_MB):
+        self.kind = kind
+        self.output = KINDS[kind]['output']
+        self.directory = directory
+        self.memory_mb = memory_mb
+        self.manifest_path = os.path.join(directory, f"{kind}_manifest.json")
+        self.index_path = os.path.join(directory, f"{kind}_index.npy")
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = {'files': {}, 'output_size': 0, 'rows': 0, 'min_date': None, 'max_date': None,
+                         'max_timestamp': None}
+        self.keys = np.empty(0, dtype=np.int64)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.output):
+            # Объединенного файла нет - объединяем заново
+            return
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest.update(json.load(f))
+        output_size = os.path.getsize(self.output)
+        if os.path.exists(self.index_path) and self.manifest['output_size'] == output_size:
+            keys = np.load(self.index_path)
+            if keys.ndim == 2:
+                # Индекс прежнего формата: пары (owner_id, id)
+                keys = np.sort((keys[:, 0] << 32) + keys[:, 1])
+            self.keys = keys
+            return
+        # Прошлый запуск прервался между записью файла и состояния: индекс
+        # восстанавливается по самому объединенному файлу
+        print(f"  Восстанавливаю индекс по {self.output}...")
+        id_column = KINDS[self.kind]['id']
+        columns = ['owner_id', id_column, 'date', 'date_timestamp']
+        chunk_rows = chunk_rows_for(self.output, columns, self.memory_mb)
+        parts, min_date, max_date, max_timestamp = [], None, None, None
+        for chunk in _read_chunks(self.output, columns, chunk_rows * 4, usecols=columns):
+            keys, valid = _key_array(chunk, id_column)
+            parts.append(keys[valid])
+            dates = chunk['date'][chunk['date'] != '']
+            if len(dates):
+                min_date = min(filter(None, [min_date, dates.min()]))
+                max_date = max(filter(None, [max_date, dates.max()]))
+            max_timestamp = max(max_timestamp or 0, int(_timestamps(chunk).max(initial=0)))
+        self.keys = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        self.manifest.update(output_size=output_size, rows=len(self.keys), min_date=min_date,
+                             max_date=max_date, max_timestamp=max_timestamp)
+
+    def is_merged(self, filename, path):
+        """Файл уже объединен и с тех пор не менялся"""
+        stat = os.stat(path)
+        known = self.manifest['files'].get(filename)
+        if not known:
+            return False
+        if known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            return True
+        # Время изменения могло обновиться без изменения содержимого
+        if known['size'] == stat.st_size and known['sha1'] == file_sha1(path):
+            known['mtime'] = stat.st_mtime
+            return True
+        return False
+
+    def mark_merged(self, filename, path):
+        stat = os.stat(path)
+        self.manifest['files'][filename] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': file_sha1(path)}
+
+    def save(self):
+        """Сохранить индекс и манифест (после записи объединенного файла)"""
+        self.manifest['output_size'] = os.path.getsize(self.output) if os.path.exists(self.output) else 0
+        self.manifest['rows'] = len(self.keys)
+        with open(f"{self.index_path}.tmp", 'wb') as f:
+            np.save(f, self.keys)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+        with open(f"{self.manifest_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+
+def write_sorted_runs(state, paths, run_dir, chunk_rows):
+    """
+    Прочитать файлы частями и записать новые записи отсортированными частями
+
+    Из каждой части отбрасываются записи с некорректным ключом, уже объединенные
+    и встреченные раньше в этом запуске. Остаток сортируется по date_timestamp
+    и записывается во временный CSV файл.
+
+    Returns:
+        (части: путь, количество строк, границы date_timestamp и date;
+        файлы, прочитанные полностью). Файл с ошибкой чтения в список не
+        попадает: его уже прочитанные записи объединяются, а сам файл будет
+        прочитан снова при следующем запуске
+    """
+    settings = KINDS[state.kind]
+    columns = settings['columns']
+    new_keys = np.empty(0, dtype=np.int64)
+    runs = []
+    loaded_files = []
+    for filename, path in paths:
+        loaded = 0
         try:
-            df = pd.read_csv(filepath, encoding='utf-8-sig')
-            all_posts.append(df)
-            print(f"  Загружено постов из {filename}: {len(df)}")
+            for chunk in _read_chunks(path, columns, chunk_rows):
+                loaded += len(chunk)
+                chunk = chunk.reindex(columns=columns, fill_value='')
+                keys, valid = _key_array(chunk, settings['id'])
+                fresh = (valid & ~_contains(state.keys, keys) & ~_contains(new_keys, keys)
+                         & ~pd.Series(keys).duplicated().to_numpy())
+                if not fresh.any():
+                    continue
+                chunk, keys = chunk[fresh], keys[fresh]
+                timestamps = _timestamps(chunk)
+                order = np.argsort(timestamps, kind='stable')
+                run_path = os.path.join(run_dir, f"run_{len(runs):05d}.csv")
+                chunk.iloc[order].to_csv(run_path, index=False, encoding='utf-8')
+                dates = chunk['date'][chunk['date'] != '']
+                runs.append({'path': run_path, 'rows': len(chunk),
+                             'min_timestamp': int(timestamps[order[0]]), 'max_timestamp': int(timestamps[order[-1]]),
+                             'min_date': dates.min() if len(dates) else None,
+                             'max_date': dates.max() if len(dates) else None})
+                new_keys = _insert_keys(new_keys, keys)
+            print(f"  Загружено {settings['label']} из {filename}: {loaded}")
+            loaded_files.append((filename, path))
         except Exception as e:
-            print(f"  Ошибка при загрузке {filename}: {e}")
-    
-    if all_posts:
-        merged_posts = pd.concat(all_posts, ignore_index=True)
-        # Удаляем дубликаты по post_id
-        merged_posts = merged_posts.drop_duplicates(subset=['post_id'], keep='first')
-        merged_posts = merged_posts.sort_values('date')
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"data/vk_data_ALL_POSTS_{timestamp}.csv"
-        merged_posts.to_csv(output_file, index=False, encoding='utf-8-sig')
-        print(f"\n✓ Объединенные посты сохранены: {output_file}")
-        print(f"  Всего уникальных постов: {len(merged_posts)}")
-        print(f"  Период: {merged_posts['date'].min()} - {merged_posts['date'].max()}")
-    
-    # Объединяем комментарии
-    all_comments = []
-    for filename in comments_files:
-        filepath = os.path.join(data_dir, filename)
+            print(f"  Ошибка при загрузке {filename}: {e} (файл будет прочитан снова при следующем запуске)")
+    state.keys = _insert_keys(state.keys, new_keys)
+    return runs, loaded_files
+
+
+def merge_sorted(sources, columns, chunk_rows):
+    """
+    Слияние CSV файлов, отсортированных по date_timestamp
+
+    Из каждого источника в памяти держится одна часть. На каждом шаге выдаются
+    все строки не позже наименьшей из последних дат загруженных частей; при
+    равных датах строки более ранних источников идут первыми.
+
+    Args:
+        sources: Пути к файлам
+        columns: Колонки файлов
+        chunk_rows: Строк в части одного источника
+
+    Yields:
+        DataFrame очередных строк в порядке date_timestamp
+    """
+    buffers = []
+    for path in sources:
+        reader = iter(_read_chunks(path, columns, chunk_rows))
+        buffers.append([reader, None, None])
+
+    def refill(buffer):
+        for chunk in buffer[0]:
+            if len(chunk):
+                buffer[1], buffer[2] = chunk.reindex(columns=columns, fill_value=''), _timestamps(chunk)
+                return True
+        return False
+
+    buffers = [buffer for buffer in buffers if refill(buffer)]
+    while buffers:
+        bound = min(buffer[2][-1] for buffer in buffers)
+        parts, timestamps = [], []
+        for buffer in buffers:
+            end = int(np.searchsorted(buffer[2], bound, side='right'))
+            parts.append(buffer[1].iloc[:end])
+            timestamps.append(buffer[2][:end])
+            buffer[1], buffer[2] = buffer[1].iloc[end:], buffer[2][end:]
+        buffers = [buffer for buffer in buffers if len(buffer[2]) or refill(buffer)]
+        order = np.argsort(np.concatenate(timestamps), kind='stable')
+        yield pd.concat(parts, ignore_index=True).iloc[order]
+
+
+def _copy_run(run_path, output, append):
+    """Дописать часть в конец объединенного файла (без заголовка) или сделать ее новым файлом"""
+    with open(run_path, 'r', encoding='utf-8', newline='') as src:
+        header = src.readline()
+        if append:
+            with open(output, 'a', encoding='utf-8', newline='') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            return
+        tmp_path = f"{output}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as dst:
+            dst.write(header)
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp_path, output)
+
+
+def insert_sorted(state, runs):
+    """
+    Добавить отсортированные части в объединенный файл
+
+    Если все новые записи не старше уже объединенных, слияние частей дописывается
+    в конец файла. Иначе объединенный файл сливается с частями в новый файл,
+    который затем заменяет прежний.
+    """
+    output = state.output
+    columns = KINDS[state.kind]['columns']
+    max_timestamp = state.manifest.get('max_timestamp')
+    appendable = (os.path.exists(output) and os.path.getsize(output) > 0 and max_timestamp is not None
+                  and min(run['min_timestamp'] for run in runs) >= max_timestamp)
+    sources = [run['path'] for run in runs]
+    if os.path.exists(output) and os.path.getsize(output) > 0 and not appendable:
+        sources.insert(0, output)
+    chunk_rows = max(chunk_rows_for(runs[0]['path'], columns, state.memory_mb) // (len(sources) + 1),
+                     _MIN_CHUNK_ROWS)
+
+    if len(sources) == 1:
+        # Единственная часть уже отсортирована: копируется без разбора строк
+        _copy_run(sources[0], output, append=appendable)
+    elif appendable:
+        with open(output, 'a', encoding='utf-8', newline='') as f:
+            for part in merge_sorted(sources, columns, chunk_rows):
+                part.to_csv(f, header=False, index=False)
+    else:
+        tmp_path = f"{output}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            header = True
+            for part in merge_sorted(sources, columns, chunk_rows):
+                part.to_csv(f, header=header, index=False)
+                header = False
+        os.replace(tmp_path, output)
+
+    manifest = state.manifest
+    manifest['min_date'] = min(filter(None, [manifest['min_date']] + [run['min_date'] for run in runs]), default=None)
+    manifest['max_date'] = max(filter(None, [manifest['max_date']] + [run['max_date'] for run in runs]), default=None)
+    manifest['max_timestamp'] = max([max_timestamp or 0] + [run['max_timestamp'] for run in runs])
+
+
+def merge_kind(kind, data_dir='data', memory_mb=MERGE_MEMORY_MB):
+    """
+    Объединить новые файлы одного типа
+
+    Returns:
+        Количество добавленных записей
+    """
+    settings = KINDS[kind]
+    state = MergeState(kind, memory_mb=memory_mb)
+    files = sorted(f for f in os.listdir(data_dir) if f.endswith(settings['suffixes']))
+    pending = [(f, os.path.join(data_dir, f)) for f in files]
+    pending = [(f, path) for f, path in pending if not state.is_merged(f, path)]
+    print(f"Найдено файлов с {settings['files_label']}: {len(files)}, новых или измененных: {len(pending)}")
+
+    added = 0
+    if pending:
+        run_dir = os.path.join(state.directory, f"{kind}_runs")
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.makedirs(run_dir)
         try:
-            df = pd.read_csv(filepath, encoding='utf-8-sig')
-            all_comments.append(df)
-            print(f"  Загружено комментариев из {filename}: {len(df)}")
-        except Exception as e:
-            print(f"  Ошибка при загрузке {filename}: {e}")
-    
-    if all_comments:
-        merged_comments = pd.concat(all_comments, ignore_index=True)
-        # Удаляем дубликаты по comment_id
-        merged_comments = merged_comments.drop_duplicates(subset=['comment_id'], keep='first')
-        merged_comments = merged_comments.sort_values('date')
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"data/vk_data_ALL_COMMENTS_{timestamp}.csv"
-        merged_comments.to_csv(output_file, index=False, encoding='utf-8-sig')
-        print(f"\n✓ Объединенные комментарии сохранены: {output_file}")
-        print(f"  Всего уникальных комментариев: {len(merged_comments)}")
-        print(f"  Период: {merged_comments['date'].min()} - {merged_comments['date'].max()}")
-    
-    print("\n" + "=" * 60)
+            chunk_rows = chunk_rows_for(pending[0][1], settings['columns'], memory_mb)
+            runs, loaded_files = write_sorted_runs(state, pending, run_dir, chunk_rows)
+            added = sum(run['rows'] for run in runs)
+            if runs:
+                insert_sorted(state, runs)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        for filename, path in loaded_files:
+            state.mark_merged(filename, path)
+    state.save()
+
+    if added:
+        print(f"\n✓ {settings['title']} сохранены: {settings['output']}")
+    if state.manifest['rows']:
+        print(f"  Добавлено новых {settings['label']}: {added}")
+        print(f"  Всего уникальных {settings['label']}: {state.manifest['rows']}")
+        print(f"  Период: {state.manifest['min_date']} - {state.manifest['max_date']}")
+    return added
+
+
+def _compact(chunk):
+    """Компактные типы колонок части: категории для ID, наименьшие целые для счетчиков"""
+    for column in chunk.columns:
+        if column == 'owner_id':
+            chunk[column] = pd.to_numeric(chunk[column], errors='coerce').astype('Int64').astype('category')
+        elif column in CATEGORY_COLUMNS:
+            chunk[column] = chunk[column].astype('category')
+        elif column in INTEGER_COLUMNS:
+            values = pd.to_numeric(chunk[column], errors='coerce')
+            if values.isna().any():
+                chunk[column] = values.astype('Int64')
+            else:
+                # Не уже int32, чтобы сложение счетчиков в анализе не переполнялось
+                values = pd.to_numeric(values, downcast='integer')
+                chunk[column] = values.astype(np.promote_types(values.dtype, np.int32))
+        elif column == 'date':
+            chunk[column] = pd.to_datetime(chunk[column], format=DATE_FORMAT, errors='coerce')
+    return chunk
+
+
+def load_merged(kind, path=None, columns=None, memory_mb=MERGE_MEMORY_MB):
+    """
+    Загрузить объединенный файл с компактными типами колонок
+
+    Файл читается частями, каждая часть сразу переводится в компактные типы:
+    target_id и owner_id - категории, целые колонки - наименьший подходящий
+    тип (не уже int32), date - datetime. Части склеиваются по одной колонке,
+    поэтому пиковый объем памяти близок к объему результата.
+
+    Args:
+        kind: 'posts' или 'comments'
+        path: Путь к файлу (None - объединенный файл этого типа)
+        columns: Загружаемые колонки (None - все)
+        memory_mb: Бюджет памяти на одну часть
+
+    Returns:
+        DataFrame записей
+    """
+    path = path or KINDS[kind]['output']
+    sample = pd.read_csv(path, encoding='utf-8-sig', usecols=columns, nrows=_MIN_CHUNK_ROWS)
+    row_bytes = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+    chunk_rows = max(int(memory_mb * 1024 * 1024 / (row_bytes * _WORKING_COPIES)), _MIN_CHUNK_ROWS)
+
+    chunks = [_compact(chunk) for chunk in pd.read_csv(path, encoding='utf-8-sig', usecols=columns,
+                                                       dtype={column: str for column in CATEGORY_COLUMNS},
+                                                       chunksize=chunk_rows)]
+    if not chunks:
+        return _compact(sample)
+    result = {}
+    for column in chunks[0].columns:
+        parts = [chunk.pop(column) for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            result[column] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            result[column] = pd.concat(parts, ignore_index=True)
+        del parts
+    return pd.DataFrame(result)
+
+
+def merge_all_data():
+    """Объединить все CSV файлы с постами и комментариями"""
+    data_dir = 'data'
+
+    for kind in KINDS:
+        merge_kind(kind, data_dir)
+        print()
+
+    print("=" * 60)
     print("ОБЪЕДИНЕНИЕ ЗАВЕРШЕНО")
     print("=" * 60)
 
 
 if __name__ == "__main__":
     merge_all_data()
-
@@ -0,0 +1,151 @@
+"""
+Преобразование постов и комментариев из ответов VK API в таблицы
+Страница объектов API превращается в DataFrame с типизированными колонками
+за один проход, даты переводятся в местное время векторно. Используется
+всеми скриптами сбора, поэтому формат CSV файлов везде одинаковый
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+
+# Колонки CSV файлов с постами и комментариями
+POST_COLUMNS = ['post_id', 'target_id', 'owner_id', 'date', 'date_timestamp', 'text', 'text_length',
+                'likes', 'reposts', 'comments_count', 'views', 'engagement']
+COMMENT_COLUMNS = ['comment_id', 'post_id', 'target_id', 'owner_id', 'date', 'date_timestamp',
+                   'text', 'text_length', 'likes', 'author_id']
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Шаг, с которым определяется смещение местного времени от UTC (секунды).
+# Переходы на летнее время и смены часового пояса происходят на границах четверти часа
+_OFFSET_STEP = 900
+
+
+def _int_column(items: List[Dict], field: str) -> pd.Series:
+    """Целочисленное поле объектов (отсутствующие значения - NA)"""
+    return pd.Series([item.get(field) for item in items], dtype='object').astype('Int64')
+
+
+def _count_column(items: List[Dict], field: str) -> np.ndarray:
+    """Счетчик вида {'field': {'count': N}} (отсутствующий счетчик - 0)"""
+    return np.fromiter(((item.get(field) or {}).get('count', 0) for item in items),
+                       dtype=np.int64, count=len(items))
+
+
+def _owner_column(items: List[Dict], owner_id) -> pd.Series:
+    """
+    ID владельца стены
+
+    Если owner_id известен (стена цели), он используется для всех строк,
+    иначе берется owner_id самого объекта. Знак не меняется: сообщества
+    отрицательные, пользователи положительные, как в VK API.
+    """
+    if owner_id is None:
+        return _int_column(items, 'owner_id')
+    return pd.Series([int(owner_id)] * len(items), dtype='Int64')
+
+
+def local_datetimes(timestamps) -> pd.Series:
+    """
+    Перевести Unix-время в местное время без часового пояса
+
+    Результат совпадает с datetime.fromtimestamp: смещение от UTC берется
+    из time.localtime один раз на каждую четверть часа, встречающуюся в данных.
+
+    Args:
+        timestamps: Unix-время в секундах (0 и NA - нет даты)
+
+    Returns:
+        Series datetime64 (NaT для строк без даты)
+    """
+    seconds = pd.to_numeric(pd.Series(timestamps), errors='coerce').astype('Float64')
+    valid = (seconds > 0).fillna(False).to_numpy(dtype=bool)
+    values = seconds.to_numpy(dtype=np.float64, na_value=0).astype(np.int64)
+    local = np.zeros(len(values), dtype=np.int64)
+    if valid.any():
+        buckets, inverse = np.unique(values[valid] // _OFFSET_STEP, return_inverse=True)
+        offsets = np.array([time.localtime(int(bucket) * _OFFSET_STEP).tm_gmtoff for bucket in buckets],
+                           dtype=np.int64)
+        local[valid] = values[valid] + offsets[inverse.ravel()]
+    result = pd.Series(pd.to_datetime(local, unit='s'), index=seconds.index)
+    return result.where(valid)
+
+
+def _date_columns(items: List[Dict]):
+    """Колонки date (строка местного времени) и date_timestamp"""
+    timestamps = _int_column(items, 'date')
+    dates = local_datetimes(timestamps).dt.strftime(DATE_FORMAT).fillna('')
+    return dates, timestamps.where(timestamps > 0)
+
+
+def _text_columns(items: List[Dict]):
+    texts = pd.Series([item.get('text') or '' for item in items], dtype='object')
+    return texts, texts.str.len().astype('int64')
+
+
+def posts_frame(posts: List[Dict], target_id: str, owner_id=None) -> pd.DataFrame:
+    """
+    Таблица постов с колонками POST_COLUMNS
+
+    Args:
+        posts: Посты из ответа wall.get или wall.getById
+        target_id: ID цели (как указан в конфигурации)
+        owner_id: ID владельца стены (None - взять из постов)
+
+    Returns:
+        DataFrame постов
+    """
+    if not posts:
+        return pd.DataFrame(columns=POST_COLUMNS)
+    dates, timestamps = _date_columns(posts)
+    texts, text_lengths = _text_columns(posts)
+    likes = _count_column(posts, 'likes')
+    reposts = _count_column(posts, 'reposts')
+    comments = _count_column(posts, 'comments')
+    return pd.DataFrame({
+        'post_id': _int_column(posts, 'id'),
+        'target_id': target_id,
+        'owner_id': _owner_column(posts, owner_id),
+        'date': dates,
+        'date_timestamp': timestamps,
+        'text': texts,
+        'text_length': text_lengths,
+        'likes': likes,
+        'reposts': reposts,
+        'comments_count': comments,
+        'views': _count_column(posts, 'views'),
+        'engagement': likes + reposts + comments
+    }, columns=POST_COLUMNS)
+
+
+def comments_frame(comments: List[Dict], target_id: str, owner_id=None) -> pd.DataFrame:
+    """
+    Таблица комментариев с колонками COMMENT_COLUMNS
+
+    Args:
+        comments: Комментарии из ответа wall.getComments
+        target_id: ID цели (как указан в конфигурации)
+        owner_id: ID владельца стены (None - взять из комментариев)
+
+    Returns:
+        DataFrame комментариев
+    """
+    if not comments:
+        return pd.DataFrame(columns=COMMENT_COLUMNS)
+    dates, timestamps = _date_columns(comments)
+    texts, text_lengths = _text_columns(comments)
+    return pd.DataFrame({
+        'comment_id': _int_column(comments, 'id'),
+        'post_id': _int_column(comments, 'post_id'),
+        'target_id': target_id,
+        'owner_id': _owner_column(comments, owner_id),
+        'date': dates,
+        'date_timestamp': timestamps,
+        'text': texts,
+        'text_length': text_lengths,
+        'likes': _count_column(comments, 'likes'),
+        'author_id': _int_column(comments, 'from_id').fillna(0)
+    }, columns=COMMENT_COLUMNS)
@@ -4,26 +4,176 @@
 """
 
 import vk_api
-import time
 import json
-import pandas as pd
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+import re
+import requests
+from itertools import groupby
+from typing import List, Dict, Iterator, Optional, Tuple
+from datetime import datetime
+from vk_api.exceptions import ApiError
+from vk_api.vk_api import TOO_MANY_RPS_CODE
+
+from api_cache import APICache, CacheMiss
+from checkpoint import CheckpointStore
+from normalizer import POST_COLUMNS, COMMENT_COLUMNS, posts_frame, comments_frame
+from parser_common import (EXECUTE_BATCH_SIZE, POSTS_PAGE_SIZE, OffsetSearch, PostPager, TargetRun,
+                           comments_closed, empty_comments_page, is_screen_name)
+from rate_limiter import RateLimiter, RateLimitError, default_rate_limiter
+from sinks import CSVSink, TargetSink
+
+
+# Максимальное количество постов в одном вызове wall.getById
+POSTS_BY_ID_BATCH_SIZE = 100
+
+# Максимальное количество ID в одном вызове users.get и groups.getById
+USERS_BATCH_SIZE = 1000
+GROUPS_BATCH_SIZE = 500
+
+# Поля пользователей, запрашиваемые для авторов комментариев
+USER_FIELDS = 'city,country,sex,bdate'
+
+
+class _ApiUrlSession(requests.Session):
+    """HTTP-сессия, отправляющая запросы vk_api на другой адрес API"""
+    
+    def __init__(self, api_url: str):
+        super().__init__()
+        self.api_url = api_url.rstrip('/')
+    
+    def request(self, method, url, *args, **kwargs):
+        url = re.sub(r'^https://api\.vk\.(?:com|ru)/method', self.api_url, url)
+        return super().request(method, url, *args, **kwargs)
 
 
 class VKParser:
     """Класс для парсинга данных из ВКонтакте"""
     
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[APICache] = None, api_url: Optional[str] = None):
         """
         Инициализация парсера
         
         Args:
             access_token: Токен доступа VK API
+            rate_limiter: Ограничитель частоты запросов (по умолчанию общий для всех парсеров)
+            cache: Кэш ответов API (None - без кэша)
+            api_url: Адрес API вместо https://api.vk.ru/method, например локальной
+                заглушки из vk_stub_server.py
         """
-        self.vk_session = vk_api.VkApi(token=access_token)
+        session = _ApiUrlSession(api_url) if api_url else None
+        self.vk_session = vk_api.VkApi(token=access_token, session=session)
+        # Частотой запросов и повторами управляет rate_limiter: встроенная задержка vk_api
+        # и его собственный повтор при ошибке 6 (в обход ограничителя) не нужны
+        self.vk_session.RPS_DELAY = 0
+        self.vk_session.error_handlers.pop(TOO_MANY_RPS_CODE, None)
         self.vk = self.vk_session.get_api()
+        self.access_token = access_token
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.cache = cache
+
+    def close(self):
+        """Закрыть HTTP-соединения"""
+        self.vk_session.http.close()
+
+    def _call(self, method: str, **params):
+        """
+        Вызвать метод API с учетом бюджета токена и повторами при ошибках 6/9/10
+        
+        Если задан кэш, ответ сначала ищется в нем.
+        
+        Args:
+            method: Название метода API, например 'wall.get'
+            **params: Параметры метода
+            
+        Returns:
+            Поле response ответа API
+            
+        Raises:
+            CacheMiss: если кэш работает в режиме replay и ответа в нем нет
+        """
+        def fetch():
+            return self.rate_limiter.call(self.access_token, self.vk_session.method, method, params)
+        
+        if self.cache:
+            return self.cache.call(method, params, fetch)
+        return fetch()
+
+    @staticmethod
+    def build_execute_code(calls: List[Tuple[str, Dict]]) -> str:
+        """
+        Собрать код VKScript, выполняющий несколько методов API за один запрос
+
+        Args:
+            calls: Список пар (метод, параметры), например ('wall.get', {'owner_id': '-1'})
+
+        Returns:
+            Код VKScript, возвращающий массив ответов в порядке вызовов
+        """
+        api_calls = [
+            f"API.{method}({json.dumps(params, ensure_ascii=False)})"
+            for method, params in calls
+        ]
+        return f"return [{', '.join(api_calls)}];"
+
+    def execute_calls(self, calls: List[Tuple[str, Dict]]) -> List:
+        """
+        Выполнить до EXECUTE_BATCH_SIZE методов API одним запросом execute
+
+        Args:
+            calls: Список пар (метод, параметры)
+
+        Returns:
+            Список ответов в порядке вызовов; для неудавшихся вызовов - False
+        """
+        if len(calls) > EXECUTE_BATCH_SIZE:
+            raise ValueError(f"execute поддерживает не более {EXECUTE_BATCH_SIZE} вызовов")
+
+        code = self.build_execute_code(calls)
+        results = self._call('execute', code=code)
+
+        # VK может вернуть null вместо массива, если все вызовы завершились ошибкой
+        if not isinstance(results, list):
+            return [False] * len(calls)
+        return results
+
+    def execute_many(self, calls: List[Tuple[str, Dict]]) -> List:
+        """
+        Выполнить произвольное количество методов API, упаковывая их в execute
         
+        Args:
+            calls: Список пар (метод, параметры)
+            
+        Returns:
+            Список ответов в порядке вызовов; для неудавшихся вызовов - False
+        """
+        responses = []
+        for i in range(0, len(calls), EXECUTE_BATCH_SIZE):
+            chunk = calls[i:i + EXECUTE_BATCH_SIZE]
+            try:
+                if len(chunk) == 1:
+                    # Одиночный вызов дешевле выполнить напрямую
+                    responses.append(self._call(chunk[0][0], **chunk[0][1]))
+                else:
+                    responses.extend(self.execute_calls(chunk))
+                continue
+            except (RateLimitError, CacheMiss):
+                raise
+            except Exception as e:
+                if len(chunk) == 1:
+                    print(f"Ошибка при вызове {chunk[0][0]}: {e}")
+                    responses.append(False)
+                    continue
+                print(f"Ошибка execute: {e}. Перехожу к вызовам по одному")
+            for method, params in chunk:
+                try:
+                    responses.append(self._call(method, **params))
+                except (RateLimitError, CacheMiss):
+                    raise
+                except Exception as e:
+                    print(f"Ошибка при вызове {method}: {e}")
+                    responses.append(False)
+        return responses
+
     def get_group_by_screen_name(self, screen_name: str) -> Dict:
         """
         Получить информацию о группе по короткому имени (screen_name)
@@ -37,12 +187,14 @@ class VKParser:
         try:
             # Убираем @ и / если есть
             screen_name = screen_name.lstrip('@/')
-            groups = self.vk.groups.getById(group_id=screen_name)
+            groups = self._call('groups.getById', group_id=screen_name)
             if groups:
                 group_info = groups[0]
                 # Возвращаем ID с минусом для дальнейшей работы
                 group_info['owner_id'] = f"-{group_info['id']}"
                 return group_info
+        except (RateLimitError, CacheMiss):
+            raise
         except Exception as e:
             print(f"Ошибка при получении информации о группе {screen_name}: {e}")
         return {}
@@ -60,9 +212,11 @@ class VKParser:
         try:
             # Убираем минус для запроса
             clean_id = group_id.lstrip('-')
-            groups = self.vk.groups.getById(group_id=clean_id)
+            groups = self._call('groups.getById', group_id=clean_id)
             if groups:
                 return groups[0]
+        except (RateLimitError, CacheMiss):
+            raise
         except Exception as e:
             print(f"Ошибка при получении информации о группе {group_id}: {e}")
         return {}
@@ -78,12 +232,70 @@ class VKParser:
             Словарь с информацией о пользователе
         """
         try:
-            users = self.vk.users.get(user_ids=user_id, fields='city,country,sex,bdate')
+            users = self._call('users.get', user_ids=user_id, fields='city,country,sex,bdate')
             if users:
                 return users[0]
+        except (RateLimitError, CacheMiss):
+            raise
         except Exception as e:
             print(f"Ошибка при получении информации о пользователе {user_id}: {e}")
         return {}
+
+    def _get_by_ids(self, method: str, id_param: str, ids: List[int], batch_size: int,
+                    failed: Optional[List[int]] = None, **params) -> List[Dict]:
+        """
+        Вызвать метод API для списка ID частями по batch_size
+
+        ID частей, вызов для которых завершился ошибкой, добавляются в failed (если передан)
+        """
+        items = []
+        for i in range(0, len(ids), batch_size):
+            chunk = ids[i:i + batch_size]
+            try:
+                response = self._call(method, **{id_param: ','.join(map(str, chunk))}, **params)
+            except (RateLimitError, CacheMiss):
+                raise
+            except Exception as e:
+                print(f"Ошибка при вызове {method} для {len(chunk)} ID: {e}")
+                if failed is not None:
+                    failed.extend(chunk)
+                continue
+            # В новых версиях API groups.getById возвращает объект с полем groups
+            if isinstance(response, dict):
+                response = response.get('groups') or response.get('items') or []
+            items.extend(response or [])
+        return items
+
+    def get_users_info(self, user_ids: List[int], fields: str = USER_FIELDS,
+                       failed: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Получить информацию о многих пользователях (по USERS_BATCH_SIZE ID за вызов)
+        
+        Args:
+            user_ids: ID пользователей
+            fields: Дополнительные поля профиля
+            failed: Список, в который добавляются ID из частей, запрос которых не удался
+            
+        Returns:
+            Список профилей; удаленные и заблокированные страницы содержат поле deactivated
+        """
+        return self._get_by_ids('users.get', 'user_ids', list(user_ids), USERS_BATCH_SIZE,
+                                failed=failed, fields=fields)
+
+    def get_groups_info(self, group_ids: List[int], failed: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Получить информацию о многих сообществах (по GROUPS_BATCH_SIZE ID за вызов)
+        
+        Args:
+            group_ids: ID сообществ (с минусом или без)
+            failed: Список, в который добавляются ID (положительные) из частей, запрос которых не удался
+            
+        Returns:
+            Список сообществ с положительными ID
+        """
+        ids = [abs(int(group_id)) for group_id in group_ids]
+        return self._get_by_ids('groups.getById', 'group_ids', ids, GROUPS_BATCH_SIZE,
+                                failed=failed, fields='members_count')
     
     def get_posts(self, owner_id: str, count: int = 100, offset: int = 0) -> List[Dict]:
         """
@@ -98,20 +310,152 @@ class VKParser:
             Список постов
         """
         try:
-            posts = self.vk.wall.get(
+            posts = self._call(
+                'wall.get',
                 owner_id=owner_id,
                 count=min(count, 100),  # VK API ограничивает до 100 за раз
                 offset=offset,
                 extended=0
             )
             return posts.get('items', [])
+        except (RateLimitError, CacheMiss):
+            raise
         except Exception as e:
             print(f"Ошибка при получении постов для {owner_id}: {e}")
             return []
-    
+
+    def get_posts_batch(self, owner_id: str, offsets: List[int], count: int = 100) -> List[List[Dict]]:
+        """
+        Получить несколько страниц постов одним запросом execute
+
+        Args:
+            owner_id: ID владельца (группа с минусом или пользователь)
+            offsets: Смещения страниц (не более EXECUTE_BATCH_SIZE)
+            count: Количество постов на странице
+
+        Returns:
+            Список страниц постов в порядке смещений
+        """
+        calls = [
+            ('wall.get', {'owner_id': owner_id, 'count': min(count, 100),
+                          'offset': offset, 'extended': 0})
+            for offset in offsets
+        ]
+
+        try:
+            responses = self.execute_calls(calls)
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка execute при получении постов для {owner_id}: {e}. Перехожу к постраничным запросам")
+            return [self.get_posts(owner_id, count=count, offset=offset) for offset in offsets]
+
+        pages = []
+        for offset, response in zip(offsets, responses):
+            if response:
+                pages.append(response.get('items', []))
+            else:
+                # Отдельный вызов внутри execute завершился ошибкой - повторяем его напрямую
+                pages.append(self.get_posts(owner_id, count=count, offset=offset))
+        return pages
+
+    def get_posts_by_ids(self, post_refs: List[Tuple[str, int]]) -> List[Dict]:
+        """
+        Получить актуальные версии постов по их идентификаторам
+
+        Идентификаторы упаковываются по POSTS_BY_ID_BATCH_SIZE в вызовы wall.getById,
+        а вызовы - по EXECUTE_BATCH_SIZE в execute, поэтому один запрос обновляет
+        до 2500 постов.
+
+        Args:
+            post_refs: Список пар (owner_id, post_id)
+
+        Returns:
+            Найденные посты; удаленные и недоступные посты в ответ не попадают
+        """
+        calls = []
+        for i in range(0, len(post_refs), POSTS_BY_ID_BATCH_SIZE):
+            chunk = post_refs[i:i + POSTS_BY_ID_BATCH_SIZE]
+            posts = ','.join(f"{owner_id}_{post_id}" for owner_id, post_id in chunk)
+            calls.append(('wall.getById', {'posts': posts, 'extended': 0}))
+
+        found = []
+        for response in self.execute_many(calls):
+            # В новых версиях API ответ обернут в объект с полем items
+            if isinstance(response, dict):
+                response = response.get('items', [])
+            if response:
+                found.extend(response)
+        return found
+
+    def find_offset_for_date(self, owner_id: str, timestamp: int) -> int:
+        """
+        Найти смещение первого поста стены, опубликованного не позже timestamp
+        
+        Посты на стене упорядочены по дате, поэтому смещение ищется k-ичным поиском:
+        за один запрос execute проверяется до EXECUTE_BATCH_SIZE смещений
+        пробными запросами wall.get с count=1. Для стены из 100 000 постов
+        достаточно 4-5 запросов.
+        
+        Args:
+            owner_id: ID владельца стены
+            timestamp: Граница периода (unix time)
+            
+        Returns:
+            Смещение, с которого нужно начинать постраничную загрузку
+        """
+        try:
+            head = self._call('wall.get', owner_id=owner_id, count=2, offset=0, extended=0)
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка при поиске смещения для {owner_id}: {e}. Начинаю с начала стены")
+            return 0
+        
+        search = OffsetSearch(head, timestamp)
+        while not search.done:
+            probes = search.probes()
+            responses = self.execute_many(OffsetSearch.probe_calls(owner_id, probes))
+            if not search.update(probes, responses):
+                break
+        return search.lo
+
+    def iter_post_pages(self, owner_id: str, max_posts: int = 100,
+                        start_date: Optional[datetime] = None,
+                        end_date: Optional[datetime] = None,
+                        use_execute: bool = True, seek: bool = True) -> Iterator[List[Dict]]:
+        """
+        Постранично получить посты с учетом ограничений API и фильтрации по дате
+        
+        Args:
+            owner_id: ID владельца
+            max_posts: Максимальное количество постов
+            start_date: Начальная дата для фильтрации (если None - без ограничения)
+            end_date: Конечная дата для фильтрации (если None - без ограничения)
+            use_execute: Запрашивать до EXECUTE_BATCH_SIZE страниц одним вызовом execute
+            seek: Если указана end_date, найти начало периода поиском смещения
+                вместо постраничного просмотра всех более новых постов
+            
+        Yields:
+            Непустые страницы постов, отфильтрованных по дате, от новых к старым
+        """
+        pager = PostPager(max_posts, start_date, end_date)
+        if seek and pager.end_timestamp:
+            pager.offset = self.find_offset_for_date(owner_id, pager.end_timestamp)
+            if pager.offset:
+                print(f"Начало периода найдено на смещении {pager.offset}", flush=True)
+
+        while not pager.done:
+            if use_execute:
+                pages = self.get_posts_batch(owner_id, pager.plan(), count=POSTS_PAGE_SIZE)
+            else:
+                pages = [self.get_posts(owner_id, count=POSTS_PAGE_SIZE, offset=pager.offset)]
+            yield from pager.consume(pages)
+
     def get_all_posts(self, owner_id: str, max_posts: int = 100, 
                      start_date: Optional[datetime] = None, 
-                     end_date: Optional[datetime] = None) -> List[Dict]:
+                     end_date: Optional[datetime] = None,
+                     use_execute: bool = True, seek: bool = True) -> List[Dict]:
         """
         Получить все посты с учетом ограничений API и фильтрации по дате
         
@@ -120,62 +464,18 @@ class VKParser:
             max_posts: Максимальное количество постов
             start_date: Начальная дата для фильтрации (если None - без ограничения)
             end_date: Конечная дата для фильтрации (если None - без ограничения)
+            use_execute: Запрашивать до EXECUTE_BATCH_SIZE страниц одним вызовом execute
+            seek: Если указана end_date, найти начало периода поиском смещения
             
         Returns:
             Список всех постов, отфильтрованных по дате
         """
         all_posts = []
-        offset = 0
-        batch_size = 100
-        
-        # Конвертируем даты в timestamp если указаны
-        start_timestamp = int(start_date.timestamp()) if start_date else None
-        end_timestamp = int(end_date.timestamp()) if end_date else None
-        
-        while len(all_posts) < max_posts:
-            posts = self.get_posts(owner_id, count=batch_size, offset=offset)
-            if not posts:
-                break
-            
-            # Фильтруем посты по дате
-            filtered_posts = []
-            for post in posts:
-                post_date = post.get('date', 0)
-                
-                # Если пост старше начальной даты, прекращаем (посты идут от новых к старым)
-                if start_timestamp and post_date < start_timestamp:
-                    # Если мы уже прошли нужный период, прекращаем сбор
-                    return all_posts[:max_posts]
-                
-                # Проверяем, попадает ли пост в нужный диапазон
-                if start_timestamp and post_date < start_timestamp:
-                    continue
-                if end_timestamp and post_date > end_timestamp:
-                    continue
-                
-                filtered_posts.append(post)
-            
-            all_posts.extend(filtered_posts)
-            offset += len(posts)
-            
-            # Защита от rate limiting
-            time.sleep(0.35)  # VK API позволяет 3 запроса в секунду
-            
-            # Если получили меньше постов чем запрашивали, значит достигли конца
-            if len(posts) < batch_size:
-                break
-            
-            # Если после фильтрации не осталось постов, но мы еще не достигли нужного периода
-            # продолжаем искать дальше
-            if not filtered_posts and start_timestamp:
-                # Проверяем, не ушли ли мы слишком далеко назад
-                oldest_post_date = min(p.get('date', 0) for p in posts) if posts else 0
-                if oldest_post_date < start_timestamp:
-                    break
-        
-        return all_posts[:max_posts]
+        for page in self.iter_post_pages(owner_id, max_posts, start_date, end_date, use_execute, seek):
+            all_posts.extend(page)
+        return all_posts
     
-    def get_comments(self, owner_id: str, post_id: int, max_comments: int = 50) -> List[Dict]:
+    def get_comments(self, owner_id: str, post_id: int, max_comments: Optional[int] = 50) -> List[Dict]:
         """
         Получить комментарии к посту
         
@@ -183,12 +483,17 @@ class VKParser:
             owner_id: ID владельца поста
             post_id: ID поста
             max_comments: Максимальное количество комментариев
+                (None - все комментарии вместе с ветками ответов)
             
         Returns:
             Список комментариев
         """
+        if max_comments is None:
+            return list(self.iter_all_comments(owner_id, post_id))
+        
         try:
-            comments = self.vk.wall.getComments(
+            comments = self._call(
+                'wall.getComments',
                 owner_id=owner_id,
                 post_id=post_id,
                 count=min(max_comments, 100),
@@ -196,9 +501,206 @@ class VKParser:
                 need_likes=1
             )
             return comments.get('items', [])
+        except (RateLimitError, CacheMiss):
+            raise
         except Exception as e:
             print(f"Ошибка при получении комментариев для поста {post_id}: {e}")
             return []
+
+    def get_comments_batch(self, owner_id: str, post_ids: List[int],
+                           max_comments: int = 50) -> Dict[int, List[Dict]]:
+        """
+        Получить комментарии к нескольким постам одним запросом execute
+        
+        Args:
+            owner_id: ID владельца постов
+            post_ids: ID постов (не более EXECUTE_BATCH_SIZE)
+            max_comments: Максимальное количество комментариев на пост
+            
+        Returns:
+            Словарь {post_id: список комментариев}
+        """
+        calls = [
+            ('wall.getComments', {'owner_id': owner_id, 'post_id': post_id,
+                                  'count': min(max_comments, 100),
+                                  'extended': 0, 'need_likes': 1})
+            for post_id in post_ids
+        ]
+
+        try:
+            responses = self.execute_calls(calls)
+        except (RateLimitError, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Ошибка execute при получении комментариев для {owner_id}: {e}. Перехожу к запросам по одному посту")
+            return {post_id: self.get_comments(owner_id, post_id, max_comments) for post_id in post_ids}
+
+        # Вызов отдельного поста внутри execute мог завершиться ошибкой - повторяем его напрямую
+        responses = self._retry_comment_calls(calls, responses)
+        return {post_id: (response or {}).get('items', []) for post_id, response in zip(post_ids, responses)}
+
+    def _retry_comment_calls(self, calls: List[Tuple[str, Dict]], responses: List) -> List:
+        """
+        Повторить по одному вызовы wall.getComments, завершившиеся внутри execute ошибкой (False)
+
+        Пустой страницей считается только ошибка закрытых комментариев
+        (parser_common.CLOSED_COMMENTS_ERROR_CODES). Другие ошибки повторного вызова
+        пробрасываются: комментарии поста не пропускаются молча, а прерванный
+        запуск продолжается с контрольной точки
+
+        Args:
+            calls: Вызовы (метод, параметры)
+            responses: Ответы execute в порядке вызовов
+
+        Returns:
+            Ответы без False
+        """
+        responses = list(responses)
+        for i, ((method, params), response) in enumerate(zip(calls, responses)):
+            if response is not False:
+                continue
+            try:
+                responses[i] = self._call(method, **params)
+            except ApiError as e:
+                if not comments_closed(e):
+                    raise
+                responses[i] = empty_comments_page()
+        return responses
+
+    def _get_comment_pages(self, calls: List[Tuple[str, Dict]]) -> List:
+        """Выполнить вызовы wall.getComments пакетами execute, повторив неудавшиеся по одному"""
+        return self._retry_comment_calls(calls, self.execute_many(calls))
+
+    @staticmethod
+    def _comments_page_params(owner_id: str, post_id: int, offset: int,
+                              thread_items_count: int = 10,
+                              comment_id: Optional[int] = None) -> Dict:
+        """Параметры wall.getComments для одной страницы комментариев или ветки ответов"""
+        params = {'owner_id': owner_id, 'post_id': post_id, 'offset': offset,
+                  'count': 100, 'sort': 'asc', 'extended': 0, 'need_likes': 1}
+        if comment_id is None:
+            params['thread_items_count'] = thread_items_count
+        else:
+            params['comment_id'] = comment_id
+        return params
+
+    def _complete_threads(self, owner_id: str, post_id: int, items: List[Dict]) -> Iterator[Dict]:
+        """
+        Выдать комментарии страницы вместе с полными ветками ответов
+        
+        Ответы, не поместившиеся в thread_items_count, догружаются одним пакетом
+        для всей страницы. Каждый комментарий выдается сразу за родителем.
+        """
+        calls = []
+        call_owners = []
+        for comment in items:
+            thread = comment.get('thread') or {}
+            loaded = len(thread.get('items', []))
+            for offset in range(loaded, thread.get('count', 0), 100):
+                calls.append(('wall.getComments',
+                              self._comments_page_params(owner_id, post_id, offset,
+                                                         comment_id=comment['id'])))
+                call_owners.append(comment['id'])
+
+        extra_replies = {}
+        for comment_id, response in zip(call_owners, self._get_comment_pages(calls)):
+            if response:
+                extra_replies.setdefault(comment_id, []).extend(response.get('items', []))
+
+        for comment in items:
+            thread = comment.get('thread') or {}
+            replies = thread.pop('items', [])
+            yield comment
+            yield from replies
+            yield from extra_replies.get(comment['id'], [])
+
+    def iter_all_comments(self, owner_id: str, post_id: int,
+                          comments_count: Optional[int] = None,
+                          thread_items_count: int = 10,
+                          first_page: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Постранично получить все комментарии к посту вместе с ветками ответов
+        
+        Комментарии выдаются потоком в хронологическом порядке, ответы - сразу
+        за родительским комментарием, поэтому вызывающий код может остановиться
+        в любой момент или записывать результат по мере получения.
+        
+        Args:
+            owner_id: ID владельца поста
+            post_id: ID поста
+            comments_count: comments.count поста, если известен: позволяет пропустить
+                посты без комментариев и запросить нужное число страниц сразу
+            thread_items_count: Сколько ответов получать вместе с комментарием (не более 10)
+            first_page: Уже полученная первая страница (см. harvest_comments)
+            
+        Yields:
+            Комментарии и ответы на них
+        """
+        if comments_count == 0:
+            return
+
+        page_size = 100
+        if first_page is None:
+            # comments.count включает ответы, поэтому это верхняя граница числа страниц
+            planned_pages = -(-comments_count // page_size) if comments_count else 1
+            offsets = [i * page_size for i in range(min(planned_pages, EXECUTE_BATCH_SIZE))]
+            pages = self._get_comment_pages([
+                ('wall.getComments', self._comments_page_params(owner_id, post_id, offset, thread_items_count))
+                for offset in offsets
+            ])
+        else:
+            offsets = [0]
+            pages = [first_page]
+
+        first = pages[0] or {}
+        total = first.get('current_level_count', first.get('count', 0))
+
+        while True:
+            for page in pages:
+                items = page.get('items', []) if page else []
+                if items:
+                    yield from self._complete_threads(owner_id, post_id, items)
+
+            next_offset = offsets[-1] + page_size
+            if next_offset >= total:
+                break
+            offsets = list(range(next_offset, min(total, next_offset + EXECUTE_BATCH_SIZE * page_size), page_size))
+            pages = self._get_comment_pages([
+                ('wall.getComments', self._comments_page_params(owner_id, post_id, offset, thread_items_count))
+                for offset in offsets
+            ])
+
+    def harvest_comments(self, owner_id: str, posts: List[Dict],
+                         thread_items_count: int = 10) -> Iterator[Dict]:
+        """
+        Получить все комментарии и ответы для списка постов потоком
+        
+        Первые страницы комментариев запрашиваются пакетами по EXECUTE_BATCH_SIZE постов,
+        посты без комментариев пропускаются, а дополнительные страницы запрашиваются
+        только для постов, где комментариев больше одной страницы.
+        
+        Args:
+            owner_id: ID владельца постов
+            posts: Посты (используются поля id и comments.count)
+            thread_items_count: Сколько ответов получать вместе с комментарием
+            
+        Yields:
+            Комментарии в порядке постов
+        """
+        pending = [post for post in posts if (post.get('comments') or {}).get('count', 1) > 0]
+        for i in range(0, len(pending), EXECUTE_BATCH_SIZE):
+            chunk = pending[i:i + EXECUTE_BATCH_SIZE]
+            first_pages = self._get_comment_pages([
+                ('wall.getComments', self._comments_page_params(owner_id, post['id'], 0, thread_items_count))
+                for post in chunk
+            ])
+            for post, first_page in zip(chunk, first_pages):
+                yield from self.iter_all_comments(
+                    owner_id, post['id'],
+                    comments_count=(post.get('comments') or {}).get('count'),
+                    thread_items_count=thread_items_count,
+                    first_page=first_page or {}
+                )
     
     def get_post_likes(self, owner_id: str, post_id: int) -> Dict:
         """
@@ -212,19 +714,56 @@ class VKParser:
             Словарь с информацией о лайках
         """
         try:
-            likes = self.vk.likes.getList(
+            likes = self._call(
+                'likes.getList',
                 type='post',
                 owner_id=owner_id,
                 item_id=post_id,
                 count=1000
             )
             return likes
+        except (RateLimitError, CacheMiss):
+            raise
         except Exception as e:
             print(f"Ошибка при получении лайков для поста {post_id}: {e}")
             return {}
     
-    def parse_target(self, target_id: str, max_posts: int = 100, max_comments: int = 50,
-                    years_back: int = None) -> Dict:
+    def iter_post_comments(self, owner_id: str, posts: List[Dict], max_comments: Optional[int] = 50,
+                           batch_comments: bool = True) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        Получить комментарии к постам, выдавая их по мере обработки каждого поста
+        
+        Args:
+            owner_id: ID владельца постов
+            posts: Посты
+            max_comments: Максимальное количество комментариев на пост
+                (None - все комментарии вместе с ветками ответов)
+            batch_comments: Получать комментарии пакетами через execute
+            
+        Yields:
+            Пары (ID поста, комментарии к нему) в порядке постов
+        """
+        if max_comments is None:
+            # Полный сбор: поток комментариев упорядочен по постам
+            for post_id, comments in groupby(self.harvest_comments(owner_id, posts),
+                                             key=lambda c: c.get('post_id')):
+                yield post_id, list(comments)
+            return
+        
+        step = EXECUTE_BATCH_SIZE if batch_comments else 1
+        for i in range(0, len(posts), step):
+            post_ids = [post.get('id') for post in posts[i:i + step]]
+            if batch_comments:
+                comments_by_post = self.get_comments_batch(owner_id, post_ids, max_comments)
+                for post_id in post_ids:
+                    yield post_id, comments_by_post.get(post_id, [])
+            else:
+                yield post_ids[0], self.get_comments(owner_id, post_ids[0], max_comments)
+
+    def parse_target(self, target_id: str, max_posts: int = 100, max_comments: Optional[int] = 50,
+                    years_back: int = None, batch_comments: bool = True,
+                    checkpoints: Optional[CheckpointStore] = None,
+                    comment_refresh_days: int = 3, sink: Optional[TargetSink] = None) -> Dict:
         """
         Полный парсинг целевого объекта (группы или пользователя)
         
@@ -232,18 +771,27 @@ class VKParser:
             target_id: ID цели (группа с минусом, пользователь или screen_name группы)
             max_posts: Максимальное количество постов
             max_comments: Максимальное количество комментариев на пост
+                (None - все комментарии вместе с ветками ответов)
             years_back: Количество лет назад для фильтрации (если None - без ограничения)
+            batch_comments: Получать комментарии пакетами через execute
+            checkpoints: Хранилище контрольных точек. Если указано, прерванный запуск
+                продолжается с места остановки, а обычный запуск собирает только посты
+                новее контрольной точки и новые комментарии к недавним постам
+            comment_refresh_days: За сколько последних дней обновлять комментарии
+                к уже собранным постам
+            sink: Приемник данных. Если указан, посты и комментарии записываются
+                в него постранично и не накапливаются в памяти (списки posts и
+                comments в результате будут пустыми)
             
         Returns:
             Словарь с собранными данными
         """
         print(f"Начинаю парсинг {target_id}...", flush=True)
         
-        # Проверяем, является ли target_id screen_name (не начинается с минуса и не число)
         owner_id = target_id
         info = {}
         
-        if not target_id.startswith('-') and not target_id.lstrip('-').isdigit():
+        if is_screen_name(target_id):
             # Это screen_name, получаем информацию о группе
             print(f"Определен screen_name: {target_id}", flush=True)
             info = self.get_group_by_screen_name(target_id)
@@ -253,55 +801,29 @@ class VKParser:
             else:
                 print(f"Ошибка: не удалось найти группу {target_id}", flush=True)
                 return {}
+        elif target_id.startswith('-'):
+            info = self.get_group_info(target_id)
         else:
-            # Это ID, получаем информацию обычным способом
-            is_group = target_id.startswith('-')
-            clean_id = target_id.lstrip('-')
-            
-            if is_group:
-                info = self.get_group_info(target_id)
-            else:
-                info = self.get_user_info(clean_id)
-        
-        # Определяем диапазон дат для фильтрации
-        end_date = datetime.now()
-        start_date = None
-        if years_back:
-            start_date = end_date - timedelta(days=years_back * 365)
-            print(f"Фильтрация постов за период: {start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')}")
-        
-        # Получаем посты
-        print(f"Получаю посты...", flush=True)
-        posts = self.get_all_posts(owner_id, max_posts, start_date=start_date, end_date=end_date)
-        print(f"Получено {len(posts)} постов", flush=True)
-        
-        # Получаем комментарии для каждого поста
-        all_comments = []
-        print(f"Начинаю сбор комментариев для {len(posts)} постов...", flush=True)
-        for i, post in enumerate(posts):
-            if i % 10 == 0 or i == 0:
-                print(f"Обработано постов: {i}/{len(posts)} (комментариев собрано: {len(all_comments)})", flush=True)
-            
-            post_id = post.get('id')
-            comments = self.get_comments(owner_id, post_id, max_comments)
-            all_comments.extend(comments)
-            
-            time.sleep(0.35)  # Защита от rate limiting
-        
-        print(f"Получено {len(all_comments)} комментариев", flush=True)
-        
-        return {
-            'target_id': target_id,
-            'owner_id': owner_id,
-            'target_info': info,
-            'posts': posts,
-            'comments': all_comments,
-            'parsed_at': datetime.now().isoformat(),
-            'date_range': {
-                'start': start_date.isoformat() if start_date else None,
-                'end': end_date.isoformat()
-            }
-        }
+            info = self.get_user_info(target_id.lstrip('-'))
+        
+        if sink:
+            sink.open_target(target_id, owner_id, info)
+        
+        # Период, контрольные точки и учет собранного общие с AsyncVKParser
+        run = TargetRun(target_id, years_back, checkpoints, comment_refresh_days, sink)
+        
+        # Посты и комментарии к ним обрабатываются постранично
+        print(f"Получаю посты и комментарии...", flush=True)
+        # Период заканчивается текущим моментом, поэтому искать его начало не нужно
+        for page in self.iter_post_pages(owner_id, max_posts, start_date=run.start_date, end_date=run.end_date,
+                                         use_execute=batch_comments, seek=False):
+            posts_to_process = run.add_posts(page)
+            for post_id, comments in self.iter_post_comments(owner_id, posts_to_process,
+                                                             max_comments, batch_comments):
+                run.add_comments(post_id, comments)
+            run.commit_page(posts_to_process)
+        
+        return run.result(owner_id, info)
     
     def save_to_json(self, data: Dict, filename: str):
         """
@@ -315,6 +837,23 @@ class VKParser:
             json.dump(data, f, ensure_ascii=False, indent=2)
         print(f"Данные сохранены в {filename}")
     
+    def create_sink(self, base_filename: str, compress: bool = False,
+                    shared_posts: Optional[CSVSink] = None,
+                    shared_comments: Optional[CSVSink] = None, raw=None) -> TargetSink:
+        """
+        Создать приемник данных цели с форматом CSV, как у save_to_csv
+        
+        Args:
+            base_filename: Базовое имя файлов (без расширения)
+            compress: Сжимать файлы gzip
+            shared_posts: Общий приемник строк постов
+            shared_comments: Общий приемник строк комментариев
+            raw: Приемник исходных объектов (None - NDJSON файл цели)
+        """
+        return TargetSink(base_filename, POST_COLUMNS, COMMENT_COLUMNS,
+                          posts_frame, comments_frame, compress=compress,
+                          shared_posts=shared_posts, shared_comments=shared_comments, raw=raw)
+    
     def save_to_csv(self, data: Dict, base_filename: str):
         """
         Сохранить данные в CSV файлы (отдельно посты и комментарии)
@@ -323,63 +862,21 @@ class VKParser:
             data: Данные для сохранения
             base_filename: Базовое имя файла (без расширения)
         """
-        posts_data = []
-        comments_data = []
-        
         target_id = data.get('target_id', 'unknown')
-        owner_id = data.get('owner_id', 'unknown')
-        posts = data.get('posts', [])
-        comments = data.get('comments', [])
-        
-        # Обрабатываем посты
-        for post in posts:
-            post_date = datetime.fromtimestamp(post.get('date', 0)) if post.get('date') else None
-            posts_data.append({
-                'post_id': post.get('id'),
-                'target_id': target_id,
-                'owner_id': owner_id,
-                'date': post_date.strftime('%Y-%m-%d %H:%M:%S') if post_date else '',
-                'date_timestamp': post.get('date', ''),
-                'text': post.get('text', ''),
-                'text_length': len(post.get('text', '')),
-                'likes': post.get('likes', {}).get('count', 0),
-                'reposts': post.get('reposts', {}).get('count', 0),
-                'comments_count': post.get('comments', {}).get('count', 0),
-                'views': post.get('views', {}).get('count', 0) if 'views' in post else 0,
-                'engagement': (post.get('likes', {}).get('count', 0) + 
-                             post.get('reposts', {}).get('count', 0) + 
-                             post.get('comments', {}).get('count', 0))
-            })
-        
-        # Обрабатываем комментарии
-        for comment in comments:
-            comment_date = datetime.fromtimestamp(comment.get('date', 0)) if comment.get('date') else None
-            comments_data.append({
-                'comment_id': comment.get('id'),
-                'post_id': comment.get('post_id'),
-                'target_id': target_id,
-                'owner_id': owner_id,
-                'date': comment_date.strftime('%Y-%m-%d %H:%M:%S') if comment_date else '',
-                'date_timestamp': comment.get('date', ''),
-                'text': comment.get('text', ''),
-                'text_length': len(comment.get('text', '')),
-                'likes': comment.get('likes', {}).get('count', 0),
-                'author_id': comment.get('from_id', 0)
-            })
+        owner_id = data.get('owner_id')
+        df_posts = posts_frame(data.get('posts', []), target_id, owner_id)
+        df_comments = comments_frame(data.get('comments', []), target_id, owner_id)
         
         # Сохраняем посты в CSV
-        if posts_data:
-            df_posts = pd.DataFrame(posts_data)
+        if len(df_posts):
             posts_filename = f"{base_filename}_posts.csv"
             df_posts.to_csv(posts_filename, index=False, encoding='utf-8-sig')
-            print(f"✓ Посты сохранены в {posts_filename} ({len(posts_data)} записей)")
+            print(f"✓ Посты сохранены в {posts_filename} ({len(df_posts)} записей)")
         
         # Сохраняем комментарии в CSV
-        if comments_data:
-            df_comments = pd.DataFrame(comments_data)
+        if len(df_comments):
             comments_filename = f"{base_filename}_comments.csv"
             df_comments.to_csv(comments_filename, index=False, encoding='utf-8-sig')
-            print(f"✓ Комментарии сохранены в {comments_filename} ({len(comments_data)} записей)")
+            print(f"✓ Комментарии сохранены в {comments_filename} ({len(df_comments)} записей)")
         
-        return posts_filename if posts_data else None, comments_filename if comments_data else None
-
+        return posts_filename if len(df_posts) else None, comments_filename if len(df_comments) else None
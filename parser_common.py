@@ -0,0 +1,335 @@
+"""
+Общая логика синхронного и асинхронного парсеров
+VKParser и AsyncVKParser различаются только способом выполнения запросов.
+Все, что не зависит от ввода-вывода, находится здесь: фильтрация страниц
+постов по дате, поиск смещения начала периода по пробным запросам, учет
+контрольных точек и счетчиков запуска parse_target, разбор ошибок закрытых
+комментариев. Парсеры только выполняют запросы и передают ответы этим классам
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from checkpoint import CheckpointStore
+from sinks import TargetSink
+
+
+# Максимальное количество обращений к API внутри одного вызова execute
+EXECUTE_BATCH_SIZE = 25
+
+# Постов на странице wall.get
+POSTS_PAGE_SIZE = 100
+
+# Ошибки wall.getComments, означающие, что комментарии поста закрыты (повторять бессмысленно):
+# 15 - доступ запрещен, 212 - нет доступа к комментариям записи
+CLOSED_COMMENTS_ERROR_CODES = {15, 212}
+
+
+def comments_closed(error) -> bool:
+    """Ошибка API означает закрытые комментарии поста"""
+    return getattr(error, 'code', None) in CLOSED_COMMENTS_ERROR_CODES
+
+
+def empty_comments_page() -> Dict:
+    """Ответ wall.getComments для поста с закрытыми комментариями"""
+    return {'count': 0, 'current_level_count': 0, 'items': []}
+
+
+def is_screen_name(target_id: str) -> bool:
+    """ID цели - короткое имя группы, а не числовой ID"""
+    return not target_id.startswith('-') and not target_id.lstrip('-').isdigit()
+
+
+class PostPager:
+    """
+    Состояние постраничного обхода стены от новых постов к старым
+
+    Планирует смещения следующего пакета страниц и фильтрует полученные
+    страницы по периоду. Обход закончен (done), когда собрано max_posts
+    постов, стена закончилась или встретился пост старше начала периода.
+    """
+
+    def __init__(self, max_posts: int, start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None, offset: int = 0):
+        """
+        Args:
+            max_posts: Максимальное количество постов
+            start_date: Начало периода (None - без ограничения)
+            end_date: Конец периода (None - без ограничения)
+            offset: Смещение первой страницы
+        """
+        self.max_posts = max_posts
+        self.start_timestamp = int(start_date.timestamp()) if start_date else None
+        self.end_timestamp = int(end_date.timestamp()) if end_date else None
+        self.offset = offset
+        self.collected = 0
+        self.finished = False
+
+    @property
+    def done(self) -> bool:
+        return self.finished or self.collected >= self.max_posts
+
+    def plan(self, offset: Optional[int] = None, max_pages: int = EXECUTE_BATCH_SIZE) -> List[int]:
+        """Смещения страниц следующего пакета: сколько нужно до max_posts, но не больше max_pages"""
+        offset = self.offset if offset is None else offset
+        pages_needed = -(-(self.max_posts - self.collected) // POSTS_PAGE_SIZE)
+        return [offset + i * POSTS_PAGE_SIZE for i in range(min(pages_needed, max_pages))]
+
+    def prefetch_offset(self, pages: List[List[Dict]]) -> Optional[int]:
+        """
+        Смещение пакета, следующего за pages, если его можно запросить заранее
+
+        Returns:
+            Смещение, если все страницы полные и постов может не хватить, иначе None
+        """
+        if (self.collected + len(pages) * POSTS_PAGE_SIZE < self.max_posts
+                and all(len(posts) == POSTS_PAGE_SIZE for posts in pages)):
+            return self.offset + len(pages) * POSTS_PAGE_SIZE
+        return None
+
+    def consume(self, pages: List[List[Dict]]) -> List[List[Dict]]:
+        """
+        Учесть пакет полученных страниц
+
+        Returns:
+            Непустые страницы постов, отфильтрованных по периоду
+        """
+        result = []
+        for posts in pages:
+            if not posts:
+                self.finished = True
+                break
+
+            filtered_posts = []
+            reached_start = False
+            for post in posts:
+                post_date = post.get('date', 0)
+                # Посты идут от новых к старым: пост старше начала периода завершает обход.
+                # Закрепленный пост стоит первым независимо от даты, поэтому его пропускаем
+                if self.start_timestamp and post_date < self.start_timestamp and not post.get('is_pinned'):
+                    reached_start = True
+                    break
+                if self.start_timestamp and post_date < self.start_timestamp:
+                    continue
+                if self.end_timestamp and post_date > self.end_timestamp:
+                    continue
+                filtered_posts.append(post)
+
+            filtered_posts = filtered_posts[:self.max_posts - self.collected]
+            if filtered_posts:
+                self.collected += len(filtered_posts)
+                result.append(filtered_posts)
+            self.offset += len(posts)
+
+            # Страница короче запрошенной - конец стены
+            if reached_start or len(posts) < POSTS_PAGE_SIZE or self.collected >= self.max_posts:
+                self.finished = True
+                break
+        return result
+
+
+class OffsetSearch:
+    """
+    K-ичный поиск смещения первого поста, опубликованного не позже timestamp
+
+    Посты на стене упорядочены по дате, поэтому за один запрос execute
+    проверяется до EXECUTE_BATCH_SIZE смещений пробными запросами wall.get с
+    count=1. Инвариант: посты до lo новее timestamp, пост на смещении hi (или
+    конец стены) - нет. Поиск закончен, когда lo == hi или пробы не дали информации.
+    """
+
+    def __init__(self, head: Dict, timestamp: int):
+        """
+        Args:
+            head: Ответ wall.get с count=2 и offset=0
+            timestamp: Граница периода (unix time)
+        """
+        self.timestamp = timestamp
+        items = head.get('items', [])
+        # Закрепленный пост всегда первый, в упорядоченную по дате часть он не входит
+        self.lo = 1 if items and items[0].get('is_pinned') else 0
+        self.hi = head.get('count', 0)
+        for index, post in enumerate(items):
+            if index >= self.lo and post.get('date', 0) <= timestamp:
+                self.lo = self.hi = index
+                return
+        self.lo = max(self.lo, len(items))
+
+    @property
+    def done(self) -> bool:
+        return self.lo >= self.hi
+
+    def probes(self) -> List[int]:
+        """Смещения следующих пробных запросов"""
+        if self.hi - self.lo <= EXECUTE_BATCH_SIZE:
+            return list(range(self.lo, self.hi))
+        return sorted({self.lo + (self.hi - self.lo) * i // EXECUTE_BATCH_SIZE for i in range(EXECUTE_BATCH_SIZE)})
+
+    @staticmethod
+    def probe_calls(owner_id: str, probes: List[int]) -> List[Tuple[str, Dict]]:
+        """Вызовы wall.get для пробных смещений"""
+        return [('wall.get', {'owner_id': owner_id, 'count': 1, 'offset': offset, 'extended': 0})
+                for offset in probes]
+
+    def update(self, probes: List[int], responses: List) -> bool:
+        """
+        Сузить границы по ответам пробных запросов
+
+        Returns:
+            False, если пробы не дали информации: безопаснее начать с найденной нижней границы
+        """
+        new_lo, new_hi = self.lo, self.hi
+        for offset, response in zip(probes, responses):
+            probe_items = response.get('items', []) if response else []
+            if not probe_items:
+                if response:
+                    # Стена стала короче во время поиска
+                    new_hi = min(new_hi, offset)
+                    break
+                continue
+            if probe_items[0].get('date', 0) <= self.timestamp:
+                new_hi = offset
+                break
+            new_lo = offset + 1
+
+        if (new_lo, new_hi) == (self.lo, self.hi):
+            return False
+        self.lo, self.hi = new_lo, new_hi
+        return True
+
+
+class TargetRun:
+    """
+    Учет одного запуска parse_target
+
+    Определяет период сбора, продолжает прерванный запуск или начинает новый по
+    контрольным точкам, отбирает новые посты и комментарии, считает их и
+    записывает в приемник или накапливает в памяти.
+    """
+
+    def __init__(self, target_id: str, years_back: Optional[int] = None,
+                 checkpoints: Optional[CheckpointStore] = None, comment_refresh_days: int = 3,
+                 sink: Optional[TargetSink] = None):
+        """
+        Args:
+            target_id: ID цели
+            years_back: Количество лет назад для фильтрации (None - без ограничения)
+            checkpoints: Хранилище контрольных точек (None - без них)
+            comment_refresh_days: За сколько последних дней обновлять комментарии
+                к уже собранным постам
+            sink: Приемник данных (None - данные накапливаются в памяти)
+        """
+        self.target_id = target_id
+        self.checkpoints = checkpoints
+        self.sink = sink
+
+        # Определяем диапазон дат для фильтрации
+        self.end_date = datetime.now()
+        self.start_date = None
+        if years_back:
+            self.start_date = self.end_date - timedelta(days=years_back * 365)
+            print(f"Фильтрация постов за период: {self.start_date.strftime('%Y-%m-%d')} - "
+                  f"{self.end_date.strftime('%Y-%m-%d')}")
+
+        # Контрольные точки: продолжаем прерванный запуск или догружаем только новое
+        self.comments = []
+        self.done_post_ids = set()
+        run = {}
+        if checkpoints:
+            run = checkpoints.active_run(target_id)
+            if run:
+                self.done_post_ids, self.comments = checkpoints.load_partial(target_id)
+                print(f"Продолжаю прерванный запуск: обработано постов {len(self.done_post_ids)}, "
+                      f"комментариев {len(self.comments)}", flush=True)
+            else:
+                checkpoint = checkpoints.get(target_id)
+                run = checkpoints.start_run(
+                    target_id,
+                    since_post_id=checkpoint.get('last_post_id'),
+                    since_timestamp=checkpoint.get('last_post_date'),
+                    comments_since=checkpoint.get('last_run_started_at'),
+                    # Продолжение запуска дописывает те же файлы
+                    base_filename=sink.base_filename if sink else None
+                )
+
+        self.since_post_id = run.get('since_post_id')
+        self.comments_since = run.get('comments_since')
+        if self.since_post_id is not None:
+            # Посты старше контрольной точки нужны только для обновления комментариев
+            refresh_from = min(datetime.fromtimestamp(run['since_timestamp']),
+                               self.end_date - timedelta(days=comment_refresh_days))
+            self.start_date = max(self.start_date, refresh_from) if self.start_date else refresh_from
+            print(f"Инкрементальный сбор: посты новее ID {self.since_post_id}, "
+                  f"комментарии с {refresh_from.strftime('%Y-%m-%d')}", flush=True)
+
+        self.posts = []
+        self.posts_count = 0
+        self.comments_count = len(self.comments)
+        self.newest_post = None
+        self._new_post_ids = set()
+
+    def add_posts(self, page: List[Dict]) -> List[Dict]:
+        """
+        Учесть страницу постов
+
+        Returns:
+            Посты страницы, комментарии к которым нужно собрать
+        """
+        if self.since_post_id is not None:
+            new_posts = [post for post in page if post.get('id', 0) > self.since_post_id]
+        else:
+            new_posts = page
+        for post in new_posts:
+            if not post.get('is_pinned') and (self.newest_post is None
+                                              or post.get('date', 0) > self.newest_post.get('date', 0)):
+                self.newest_post = post
+        self.posts_count += len(new_posts)
+
+        self._new_post_ids = {post.get('id') for post in new_posts}
+        posts_to_process = [post for post in page if post.get('id') not in self.done_post_ids]
+        if self.sink:
+            # Пост пишется до своих комментариев: после сбоя он может повториться, но не потеряется
+            self.sink.write_posts([post for post in posts_to_process if post.get('id') in self._new_post_ids])
+        else:
+            self.posts.extend(new_posts)
+        return posts_to_process
+
+    def add_comments(self, post_id: int, comments: List[Dict]):
+        """Учесть комментарии к посту последней страницы"""
+        if post_id not in self._new_post_ids and self.comments_since:
+            # У ранее собранного поста берем только комментарии, появившиеся с прошлого запуска
+            comments = [c for c in comments if c.get('date', 0) >= self.comments_since]
+        self.comments_count += len(comments)
+        if self.sink:
+            self.sink.write_comments(comments)
+        else:
+            self.comments.extend(comments)
+            if self.checkpoints:
+                self.checkpoints.record_post_comments(self.target_id, post_id, comments)
+
+    def commit_page(self, posts_to_process: List[Dict]):
+        """Завершить страницу: данные на диске, только после этого посты отмечаются обработанными"""
+        if self.sink:
+            self.sink.commit()
+            if self.checkpoints:
+                self.checkpoints.record_posts_done(self.target_id, [post.get('id') for post in posts_to_process])
+        print(f"Обработано постов: {self.posts_count} (комментариев собрано: {self.comments_count})", flush=True)
+
+    def result(self, owner_id: str, info: Dict) -> Dict:
+        """Итог запуска в формате parse_target"""
+        print(f"Получено {self.posts_count} постов и {self.comments_count} комментариев", flush=True)
+        return {
+            'target_id': self.target_id,
+            'owner_id': owner_id,
+            'target_info': info,
+            'posts': self.posts,
+            'comments': self.comments,
+            'posts_count': self.posts_count,
+            'comments_count': self.comments_count,
+            'newest_post': self.newest_post,
+            'parsed_at': datetime.now().isoformat(),
+            'date_range': {
+                'start': self.start_date.isoformat() if self.start_date else None,
+                'end': self.end_date.isoformat()
+            }
+        }
@@ -0,0 +1,205 @@
+"""
+Ограничитель частоты запросов к VK API
+Token bucket с отдельным бюджетом для каждого токена, повторами с экспоненциальной
+задержкой и адаптивной подстройкой скорости по ошибкам API
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from vk_api.exceptions import ApiError
+
+
+# Коды ошибок VK API, после которых запрос имеет смысл повторить:
+# 6 - слишком много запросов в секунду, 9 - flood control, 10 - внутренняя ошибка сервера
+RETRYABLE_ERROR_CODES = {6, 9, 10}
+
+# Ошибки, означающие превышение лимита частоты (по ним снижаем скорость)
+RATE_ERROR_CODES = {6, 9}
+
+
+class RateLimitError(Exception):
+    """Запрос не удалось выполнить после всех повторов из-за ограничений API"""
+
+
+class _TokenBucket:
+    """Состояние бюджета запросов для одного токена"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.success_streak = 0
+        self.requests = 0
+        self.rate_errors = 0
+
+
+class RateLimiter:
+    """Потокобезопасный адаптивный ограничитель частоты запросов"""
+
+    def __init__(self, rate: float = 3.0, max_rate: Optional[float] = None,
+                 min_rate: float = 0.5, burst: float = 1.0, max_retries: int = 8,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 increase_after: int = 50, increase_step: float = 0.25):
+        """
+        Инициализация ограничителя
+
+        Args:
+            rate: Начальная скорость (запросов в секунду на токен)
+            max_rate: Максимальная скорость, до которой можно разогнаться (по умолчанию rate)
+            min_rate: Минимальная скорость после снижений
+            burst: Сколько запросов можно выполнить подряд без ожидания
+            max_retries: Количество повторов при ошибках 6/9/10
+            backoff_base: Базовая задержка перед повтором (секунды)
+            backoff_max: Максимальная задержка перед повтором (секунды)
+            increase_after: Число успешных запросов подряд, после которого скорость повышается
+            increase_step: Шаг повышения скорости
+        """
+        self.initial_rate = rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.increase_after = increase_after
+        self.increase_step = increase_step
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _TokenBucket] = {}
+
+    def _bucket(self, key: str) -> _TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _TokenBucket(self.initial_rate, self.burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    def reserve(self, key: str) -> float:
+        """
+        Зарезервировать один запрос из бюджета токена
+
+        Args:
+            key: Ключ бюджета (токен доступа)
+
+        Returns:
+            Сколько секунд нужно подождать перед отправкой запроса
+        """
+        with self._lock:
+            bucket = self._bucket(key)
+            now = time.monotonic()
+            bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated_at) * bucket.rate)
+            bucket.updated_at = now
+            bucket.tokens -= 1
+            bucket.requests += 1
+            if bucket.tokens >= 0:
+                return 0.0
+            # Бюджет уходит в минус: запрос встает в очередь за уже зарезервированными
+            return -bucket.tokens / bucket.rate
+
+    def acquire(self, key: str):
+        """Дождаться возможности отправить запрос"""
+        delay = self.reserve(key)
+        if delay > 0:
+            time.sleep(delay)
+
+    def report_success(self, key: str):
+        """Учесть успешный запрос: после серии успехов скорость постепенно растет"""
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.success_streak += 1
+            if bucket.success_streak >= self.increase_after and bucket.rate < self.max_rate:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase_step)
+                bucket.success_streak = 0
+
+    def report_rate_error(self, key: str):
+        """Учесть ошибку превышения лимита: скорость снижается вдвое, бюджет обнуляется"""
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.updated_at = time.monotonic()
+            bucket.success_streak = 0
+            bucket.rate_errors += 1
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Задержка перед повтором с номером attempt (экспонента со случайным разбросом)"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (1 + random.random() * 0.25)
+
+    def _retry_delay(self, key: str, error: ApiError, attempt: int) -> float:
+        """
+        Задержка перед повтором после ошибки API
+
+        Raises:
+            ApiError: если ошибку повторять бессмысленно
+            RateLimitError: если повторы исчерпаны
+        """
+        if error.code not in RETRYABLE_ERROR_CODES:
+            raise error
+        if error.code in RATE_ERROR_CODES:
+            self.report_rate_error(key)
+        if attempt == self.max_retries:
+            raise RateLimitError(f"Запрос не выполнен после {self.max_retries} повторов: {error}") from error
+        return self.backoff_delay(attempt)
+
+    def call(self, key: str, func: Callable, *args, **kwargs):
+        """
+        Выполнить запрос с учетом бюджета токена и повторами при ошибках 6/9/10
+
+        Args:
+            key: Ключ бюджета (токен доступа)
+            func: Функция, выполняющая запрос
+
+        Returns:
+            Результат func
+
+        Raises:
+            RateLimitError: если запрос не удался после всех повторов
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(key)
+            try:
+                result = func(*args, **kwargs)
+            except ApiError as e:
+                time.sleep(self._retry_delay(key, e, attempt))
+                continue
+            self.report_success(key)
+            return result
+
+    async def call_async(self, key: str, func: Callable, *args, **kwargs):
+        """
+        Асинхронный вариант call: func - корутинная функция, ожидание не блокирует цикл событий
+
+        Бюджет резервируется до отправки, поэтому одновременные запросы одного токена
+        выстраиваются в очередь с интервалом 1/rate, а не уходят пачкой.
+        """
+        for attempt in range(self.max_retries + 1):
+            delay = self.reserve(key)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                result = await func(*args, **kwargs)
+            except ApiError as e:
+                await asyncio.sleep(self._retry_delay(key, e, attempt))
+                continue
+            self.report_success(key)
+            return result
+
+    def stats(self, key: str) -> Dict:
+        """Текущая скорость и счетчики для токена"""
+        with self._lock:
+            bucket = self._bucket(key)
+            return {
+                'rate': bucket.rate,
+                'requests': bucket.requests,
+                'rate_errors': bucket.rate_errors,
+            }
+
+
+# Общий ограничитель для всех экземпляров VKParser (бюджеты разделены по токенам)
+default_rate_limiter = RateLimiter()
@@ -0,0 +1,472 @@
+"""
+Архив исходных объектов VK API
+Посты и комментарии хранятся в сжатом NDJSON: для каждой цели и типа объектов
+один файл из независимых gzip-блоков (по блоку на пакет записи). Индекс SQLite
+хранит смещение, размер и диапазон дат каждого блока, поэтому срез по цели и
+периоду читается без распаковки всего архива. Каждый объект хранится один раз:
+повторно собранный объект записывается, только если он изменился (например,
+выросли счетчики), и при чтении возвращается его последняя версия
+
+Перенос прежних JSON и NDJSON файлов сбора, выгрузка таблиц и статистика:
+    python raw_archive.py import
+    python raw_archive.py export --kind comments --target minzdravru --start 2024-01-01 --end 2024-04-01
+    python raw_archive.py info
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from normalizer import posts_frame, comments_frame
+
+
+ARCHIVE_DIR = 'data/raw'
+
+POSTS = 'posts'
+COMMENTS = 'comments'
+
+# Тип записи NDJSON файлов сбора -> тип объектов архива
+RECORD_KINDS = {'post': POSTS, 'comment': COMMENTS}
+
+# Максимальное число параметров в одном SQL запросе
+_SQL_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS targets (
+    target_id TEXT PRIMARY KEY,
+    owner_id INTEGER,
+    info TEXT,
+    parsed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    file TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    objects INTEGER NOT NULL,
+    min_date INTEGER,
+    max_date INTEGER,
+    written_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_target_dates ON chunks (kind, target_id, min_date, max_date);
+CREATE TABLE IF NOT EXISTS objects (
+    kind TEXT NOT NULL,
+    owner_id INTEGER NOT NULL,
+    object_id INTEGER NOT NULL,
+    digest INTEGER NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, owner_id, object_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS objects_chunk ON objects (chunk_id);
+CREATE TABLE IF NOT EXISTS imported_files (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+
+def _safe_name(target_id: str) -> str:
+    return "".join(c if c.isalnum() or c in '-_' else '_' for c in str(target_id))
+
+
+def _digest(line: str) -> int:
+    """64-битный хэш сериализованного объекта (для обнаружения изменений)"""
+    return int.from_bytes(hashlib.blake2b(line.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def _timestamp(value) -> Optional[int]:
+    """Граница периода (дата, строка или Unix-время) в Unix-время по местному времени"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(pd.Timestamp(value).to_pydatetime().timestamp())
+
+
+class RawArchive:
+    """Потокобезопасный архив исходных объектов с индексом блоков"""
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        """
+        Инициализация архива
+
+        Args:
+            root: Папка архива (NDJSON файлы и index.sqlite)
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def set_target(self, target_id: str, owner_id, info: Optional[Dict] = None, parsed_at: Optional[str] = None):
+        """Сохранить описание цели (владелец стены и ответ API о группе или пользователе)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO targets (target_id, owner_id, info, parsed_at) VALUES (?, ?, ?, ?)",
+                (str(target_id), int(owner_id), json.dumps(info or {}, ensure_ascii=False),
+                 parsed_at or datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def targets(self) -> Dict[str, Dict]:
+        """Цели архива: target_id -> owner_id, info, parsed_at"""
+        with self._lock:
+            rows = self._conn.execute("SELECT target_id, owner_id, info, parsed_at FROM targets").fetchall()
+        return {target_id: {'owner_id': owner_id, 'info': json.loads(info), 'parsed_at': parsed_at}
+                for target_id, owner_id, info, parsed_at in rows}
+
+    def _known_digests(self, kind: str, owner_id: int, object_ids: List[int]) -> Dict[int, int]:
+        known = {}
+        for i in range(0, len(object_ids), _SQL_BATCH):
+            batch = object_ids[i:i + _SQL_BATCH]
+            known.update(self._conn.execute(
+                f"SELECT object_id, digest FROM objects WHERE kind = ? AND owner_id = ? "
+                f"AND object_id IN ({','.join('?' * len(batch))})",
+                [kind, owner_id, *batch]
+            ).fetchall())
+        return known
+
+    def append(self, target_id: str, owner_id, kind: str, items: List[Dict]) -> int:
+        """
+        Записать объекты блоком, пропуская уже сохраненные без изменений
+
+        Блок дописывается в файл цели и фиксируется на диске до записи в индекс,
+        поэтому после сбоя в файле может остаться лишний блок, но не битый индекс.
+
+        Args:
+            target_id: ID цели
+            owner_id: ID владельца стены
+            kind: 'posts' или 'comments'
+            items: Объекты из ответов API
+
+        Returns:
+            Количество записанных объектов
+        """
+        owner_id = int(owner_id)
+        lines = {}
+        for item in items:
+            if item.get('id') is not None:
+                # Повтор внутри пакета: остается последняя версия
+                lines[int(item['id'])] = (json.dumps(item, ensure_ascii=False), item.get('date') or 0)
+        if not lines:
+            return 0
+        filename = f"{_safe_name(target_id)}_{kind}.ndjson.gz"
+        path = os.path.join(self.root, filename)
+        with self._lock:
+            known = self._known_digests(kind, owner_id, list(lines))
+            fresh = [(object_id, line, date, _digest(line)) for object_id, (line, date) in lines.items()]
+            fresh = [entry for entry in fresh if known.get(entry[0]) != entry[3]]
+            if not fresh:
+                return 0
+            block = gzip.compress(''.join(line + '\n' for _, line, _, _ in fresh).encode('utf-8'))
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+            dates = [date for _, _, date, _ in fresh if date]
+            cursor = self._conn.execute(
+                "INSERT INTO chunks (target_id, kind, file, offset, length, objects, min_date, max_date, written_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(target_id), kind, filename, offset, len(block), len(fresh),
+                 min(dates, default=None), max(dates, default=None), datetime.now().isoformat())
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO objects (kind, owner_id, object_id, digest, chunk_id) VALUES (?, ?, ?, ?, ?)",
+                [(kind, owner_id, object_id, digest, cursor.lastrowid) for object_id, _, _, digest in fresh]
+            )
+            self._conn.commit()
+            return len(fresh)
+
+    def chunks(self, kind: str, target_ids: Optional[List[str]] = None,
+               start=None, end=None) -> List[Tuple]:
+        """
+        Блоки, которые могут содержать объекты среза
+
+        Returns:
+            Список (chunk_id, target_id, file, offset, length) в порядке записи
+        """
+        where, params = ["kind = ?"], [kind]
+        if target_ids is not None:
+            target_ids = [str(target_id) for target_id in target_ids]
+            where.append(f"target_id IN ({','.join('?' * len(target_ids))})")
+            params.extend(target_ids)
+        if start is not None:
+            where.append("max_date >= ?")
+            params.append(_timestamp(start))
+        if end is not None:
+            where.append("min_date < ?")
+            params.append(_timestamp(end))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT chunk_id, target_id, file, offset, length FROM chunks "
+                f"WHERE {' AND '.join(where)} ORDER BY chunk_id", params
+            ).fetchall()
+
+    def iter_objects(self, kind: str, target_ids: Optional[List[str]] = None,
+                     start=None, end=None) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Объекты среза по блокам
+
+        Распаковываются только блоки, пересекающиеся с периодом. Из каждого блока
+        возвращаются объекты, для которых он хранит последнюю версию.
+
+        Args:
+            kind: 'posts' или 'comments'
+            target_ids: Цели (None - все)
+            start: Начало периода включительно (дата, строка 'YYYY-MM-DD' или Unix-время)
+            end: Конец периода не включительно
+
+        Yields:
+            (target_id, объекты блока)
+        """
+        start_ts, end_ts = _timestamp(start), _timestamp(end)
+        for chunk_id, target_id, filename, offset, length in self.chunks(kind, target_ids, start, end):
+            with self._lock:
+                current = {object_id for (object_id,) in self._conn.execute(
+                    "SELECT object_id FROM objects WHERE chunk_id = ?", (chunk_id,)
+                )}
+            with open(os.path.join(self.root, filename), 'rb') as f:
+                f.seek(offset)
+                block = gzip.decompress(f.read(length))
+            items = []
+            for line in block.decode('utf-8').splitlines():
+                item = json.loads(line)
+                date = item.get('date') or 0
+                if item['id'] not in current:
+                    continue
+                if (start_ts is not None and date < start_ts) or (end_ts is not None and date >= end_ts):
+                    continue
+                items.append(item)
+            if items:
+                yield target_id, items
+
+    def iter_frames(self, kind: str, **kwargs) -> Iterator[pd.DataFrame]:
+        """Срез архива таблицами в формате CSV сбора (по блоку на таблицу), аргументы как у iter_objects"""
+        to_frame = posts_frame if kind == POSTS else comments_frame
+        owners = {target_id: target['owner_id'] for target_id, target in self.targets().items()}
+        for target_id, items in self.iter_objects(kind, **kwargs):
+            yield to_frame(items, target_id, owners.get(target_id))
+
+    def read_frame(self, kind: str, **kwargs) -> pd.DataFrame:
+        """Срез архива одной таблицей, аргументы как у iter_objects"""
+        frames = list(self.iter_frames(kind, **kwargs))
+        if not frames:
+            return (posts_frame if kind == POSTS else comments_frame)([], '')
+        return pd.concat(frames, ignore_index=True)
+
+    def is_imported(self, filename: str, path: str) -> bool:
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime FROM imported_files WHERE filename = ?", (filename,)
+            ).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def mark_imported(self, filename: str, path: str):
+        stat = os.stat(path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO imported_files (filename, size, mtime) VALUES (?, ?, ?)",
+                               (filename, stat.st_size, stat.st_mtime))
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Количество объектов, блоков и размер архива по типам"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, COUNT(*), SUM(objects), SUM(length), MIN(min_date), MAX(max_date) "
+                "FROM chunks GROUP BY kind"
+            ).fetchall()
+            unique = dict(self._conn.execute("SELECT kind, COUNT(*) FROM objects GROUP BY kind").fetchall())
+        return {kind: {'chunks': chunks, 'stored': stored, 'objects': unique.get(kind, 0),
+                       'size_mb': round(size / (1024 * 1024), 2),
+                       'min_date': datetime.fromtimestamp(first) if first else None,
+                       'max_date': datetime.fromtimestamp(last) if last else None}
+                for kind, chunks, stored, size, first, last in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ArchiveSink:
+    """
+    Приемник исходных объектов одной цели (тот же интерфейс, что у sinks.NDJSONSink)
+
+    Принимает записи TargetSink: описание цели ('type': 'target') и объекты
+    ('type': 'post' / 'comment'). Объекты копятся до границы пакета и
+    записываются в архив одним блоком на тип.
+    """
+
+    def __init__(self, archive: RawArchive):
+        self.archive = archive
+        self.path = archive.root
+        self.count = 0
+        self.target_id = None
+        self.owner_id = None
+        self._pending = {POSTS: [], COMMENTS: []}
+        self._lock = threading.Lock()
+
+    def write(self, records: List[Dict]):
+        with self._lock:
+            for record in records:
+                if record['type'] == 'target':
+                    self.target_id, self.owner_id = record['target_id'], record['owner_id']
+                    self.archive.set_target(self.target_id, self.owner_id, record.get('target_info'),
+                                            record.get('parsed_at'))
+                else:
+                    self._pending[RECORD_KINDS[record['type']]].append(record['item'])
+
+    def commit(self):
+        """Граница пакета: записать накопленные объекты блоками"""
+        with self._lock:
+            for kind, items in self._pending.items():
+                if items:
+                    self.count += self.archive.append(self.target_id, self.owner_id, kind, items)
+                    self._pending[kind] = []
+
+    def close(self):
+        self.commit()
+
+
+def _read_collected_file(path: str) -> Iterator[Dict]:
+    """
+    Записи файла сбора в формате NDJSON файлов TargetSink
+
+    Поддерживаются NDJSON файлы (в том числе .gz) и прежние JSON файлы с полями
+    target_id, owner_id, target_info, posts и comments.
+    """
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if 'posts' not in data and 'comments' not in data:
+            return
+        yield {'type': 'target', 'target_id': data.get('target_id'), 'owner_id': data.get('owner_id'),
+               'target_info': data.get('target_info'), 'parsed_at': data.get('parsed_at')}
+        for post in data.get('posts', []):
+            yield {'type': 'post', 'item': post}
+        for comment in data.get('comments', []):
+            yield {'type': 'comment', 'item': comment}
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def import_collected(archive: RawArchive, data_dir: str = 'data', batch_size: int = 5000) -> int:
+    """
+    Перенести в архив JSON и NDJSON файлы сбора из data_dir
+
+    Уже перенесенные и не изменившиеся файлы пропускаются, объекты, которые
+    уже есть в архиве без изменений, не дублируются.
+
+    Returns:
+        Количество записанных объектов
+    """
+    total = 0
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(('.ndjson', '.ndjson.gz', '.json')) or 'summary' in filename:
+            continue
+        path = os.path.join(data_dir, filename)
+        if archive.is_imported(filename, path):
+            continue
+        sink = ArchiveSink(archive)
+        pending = 0
+        try:
+            for record in _read_collected_file(path):
+                sink.write([record])
+                pending += record['type'] != 'target'
+                if pending >= batch_size:
+                    sink.commit()
+                    pending = 0
+            sink.close()
+        except Exception as e:
+            print(f"  Ошибка при переносе {filename}: {e}")
+            continue
+        archive.mark_imported(filename, path)
+        total += sink.count
+        print(f"  {filename}: {sink.count} новых объектов")
+    return total
+
+
+def export(archive: RawArchive, kind: str, output_format: str, output: Optional[str] = None, **kwargs) -> int:
+    """
+    Восстановить таблицу среза архива в CSV или в набор Parquet
+
+    Args:
+        archive: Архив
+        kind: 'posts' или 'comments'
+        output_format: 'csv' или 'parquet'
+        output: Путь к CSV файлу или корень набора Parquet (None - по умолчанию)
+        **kwargs: Срез (target_ids, start, end), как у RawArchive.iter_objects
+
+    Returns:
+        Количество выгруженных строк
+    """
+    if output_format == 'parquet':
+        from storage import ParquetDatasetSink, DATASET_DIR
+        sink = ParquetDatasetSink(kind, output or DATASET_DIR)
+    else:
+        from sinks import CSVSink
+        from normalizer import POST_COLUMNS, COMMENT_COLUMNS
+        path = output or f"data/vk_data_raw_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{kind}.csv"
+        sink = CSVSink(path, POST_COLUMNS if kind == POSTS else COMMENT_COLUMNS)
+    try:
+        for frame in archive.iter_frames(kind, **kwargs):
+            sink.write(frame)
+    finally:
+        sink.close()
+    print(f"✓ Выгружено строк: {sink.count} -> {sink.path}")
+    return sink.count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Архив исходных объектов VK API')
+    arg_parser.add_argument('command', choices=['import', 'export', 'info'],
+                            help='import - перенести файлы сбора из data/, export - выгрузить таблицу, '
+                                 'info - статистика архива')
+    arg_parser.add_argument('--data-dir', default='data', help='Папка с файлами сбора (import)')
+    arg_parser.add_argument('--root', default=ARCHIVE_DIR, help='Папка архива')
+    arg_parser.add_argument('--kind', choices=[POSTS, COMMENTS], default=COMMENTS, help='Тип объектов (export)')
+    arg_parser.add_argument('--target', action='append', help='Цель (можно указать несколько раз)')
+    arg_parser.add_argument('--start', help='Начало периода, например 2024-01-01')
+    arg_parser.add_argument('--end', help='Конец периода (не включительно)')
+    arg_parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='Формат выгрузки')
+    arg_parser.add_argument('--output', help='CSV файл или корень набора Parquet')
+    args = arg_parser.parse_args()
+
+    archive = RawArchive(args.root)
+    try:
+        if args.command == 'import':
+            print("Перенос файлов сбора в архив...")
+            total = import_collected(archive, args.data_dir)
+            print(f"✓ Записано объектов: {total}")
+        elif args.command == 'export':
+            export(archive, args.kind, args.format, args.output,
+                   target_ids=args.target, start=args.start, end=args.end)
+            return
+        for kind, info in archive.stats().items():
+            print(f"{kind}: {info['objects']} объектов ({info['stored']} версий) в {info['chunks']} блоках, "
+                  f"{info['size_mb']} МБ, период: {info['min_date']} - {info['max_date']}")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Скрипт для обновления счетчиков уже собранных постов
+Берет идентификаторы постов из собранных CSV файлов, запрашивает актуальные
+лайки, репосты, комментарии и просмотры через wall.getById и дописывает их
+снимком в историю счетчиков. Полный повторный обход стены не нужен: один
+запрос execute обновляет до 2500 постов
+"""
+
+import os
+import sys
+import pandas as pd
+from parser import VKParser, EXECUTE_BATCH_SIZE, POSTS_BY_ID_BATCH_SIZE
+from sinks import CSVSink
+from datetime import datetime, timedelta
+
+# Попытка импортировать конфигурацию
+try:
+    from config import VK_ACCESS_TOKEN
+    try:
+        from config import VK_API_URL
+    except ImportError:
+        VK_API_URL = None  # По умолчанию настоящий VK API
+    try:
+        from config import COUNTER_REFRESH_MAX_AGE_DAYS
+    except ImportError:
+        COUNTER_REFRESH_MAX_AGE_DAYS = None  # По умолчанию обновляются все собранные посты
+except ImportError:
+    print("Ошибка: Создайте файл config.py на основе config.py.example")
+    sys.exit(1)
+
+
+# Файл истории счетчиков: одна строка на пост в каждом снимке
+HISTORY_FILE = 'data/engagement_history.csv'
+HISTORY_COLUMNS = ['snapshot_at', 'snapshot_timestamp', 'owner_id', 'post_id',
+                   'likes', 'reposts', 'comments_count', 'views', 'engagement']
+
+# Постов на один запрос execute
+POSTS_PER_REQUEST = EXECUTE_BATCH_SIZE * POSTS_BY_ID_BATCH_SIZE
+
+
+def load_post_refs(data_dir='data', max_age_days=None):
+    """
+    Собрать идентификаторы постов из всех CSV файлов с постами
+
+    Args:
+        data_dir: Папка с данными
+        max_age_days: Брать только посты не старше этого числа дней (None - все)
+
+    Returns:
+        Список пар (owner_id, post_id) без повторов, от новых постов к старым
+    """
+    posts_files = [f for f in os.listdir(data_dir) if f.endswith(('_posts.csv', '_posts.csv.gz'))]
+    print(f"Найдено файлов с постами: {len(posts_files)}")
+
+    frames = []
+    for filename in posts_files:
+        filepath = os.path.join(data_dir, filename)
+        try:
+            # Текст постов не нужен - читаем только идентификаторы и дату
+            frames.append(pd.read_csv(filepath, encoding='utf-8-sig',
+                                      usecols=['owner_id', 'post_id', 'date_timestamp']))
+        except Exception as e:
+            print(f"  Ошибка при загрузке {filename}: {e}")
+    if not frames:
+        return []
+
+    refs = pd.concat(frames, ignore_index=True)
+    refs['owner_id'] = pd.to_numeric(refs['owner_id'], errors='coerce')
+    refs['post_id'] = pd.to_numeric(refs['post_id'], errors='coerce')
+    refs['date_timestamp'] = pd.to_numeric(refs['date_timestamp'], errors='coerce')
+    refs = refs.dropna(subset=['owner_id', 'post_id'])
+    if max_age_days is not None:
+        since = (datetime.now() - timedelta(days=max_age_days)).timestamp()
+        refs = refs[refs['date_timestamp'] >= since]
+    refs = refs.drop_duplicates(subset=['owner_id', 'post_id']).sort_values('date_timestamp', ascending=False)
+    return list(zip(refs['owner_id'].astype('int64').astype(str), refs['post_id'].astype('int64')))
+
+
+def counters_to_row(post, snapshot_at):
+    """Строка истории счетчиков для поста из ответа wall.getById"""
+    likes = post.get('likes', {}).get('count', 0)
+    reposts = post.get('reposts', {}).get('count', 0)
+    comments = post.get('comments', {}).get('count', 0)
+    return {
+        'snapshot_at': snapshot_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'snapshot_timestamp': int(snapshot_at.timestamp()),
+        'owner_id': post.get('owner_id'),
+        'post_id': post.get('id'),
+        'likes': likes,
+        'reposts': reposts,
+        'comments_count': comments,
+        'views': post.get('views', {}).get('count', 0) if 'views' in post else 0,
+        'engagement': likes + reposts + comments
+    }
+
+
+def refresh_counters(parser, post_refs, history_file=HISTORY_FILE):
+    """
+    Снять текущие счетчики постов и дописать их в историю
+
+    Каждый запрос execute сразу записывается на диск, поэтому прерванный
+    снимок сохраняет уже полученную часть.
+
+    Args:
+        parser: Экземпляр VKParser
+        post_refs: Список пар (owner_id, post_id)
+        history_file: Файл истории счетчиков
+
+    Returns:
+        Количество обновленных постов
+    """
+    snapshot_at = datetime.now()
+    history = CSVSink(history_file, HISTORY_COLUMNS)
+    try:
+        for i in range(0, len(post_refs), POSTS_PER_REQUEST):
+            chunk = post_refs[i:i + POSTS_PER_REQUEST]
+            posts = parser.get_posts_by_ids(chunk)
+            history.write([counters_to_row(post, snapshot_at) for post in posts])
+            history.commit()
+            print(f"  Обработано постов: {min(i + POSTS_PER_REQUEST, len(post_refs))}/{len(post_refs)}", flush=True)
+    finally:
+        history.close()
+    return history.count
+
+
+def main():
+    """Основная функция"""
+    print("=" * 60)
+    print("ОБНОВЛЕНИЕ СЧЕТЧИКОВ СОБРАННЫХ ПОСТОВ")
+    print("=" * 60)
+
+    if not os.path.exists('data'):
+        print("Папка data не существует. Сначала соберите данные.")
+        return
+
+    post_refs = load_post_refs(max_age_days=COUNTER_REFRESH_MAX_AGE_DAYS)
+    if not post_refs:
+        print("Не найдены собранные посты.")
+        return
+    requests_count = -(-len(post_refs) // POSTS_PER_REQUEST)
+    print(f"Постов для обновления: {len(post_refs)} (запросов к API: {requests_count})")
+
+    # Кэш ответов не используется: снимок должен содержать текущие значения
+    parser = VKParser(VK_ACCESS_TOKEN, api_url=VK_API_URL)
+    try:
+        updated = refresh_counters(parser, post_refs)
+    finally:
+        parser.close()
+
+    print(f"\n✓ Счетчики сохранены в {HISTORY_FILE}")
+    print(f"  Обновлено постов: {updated}")
+    if updated < len(post_refs):
+        print(f"⚠ Не получено постов (удалены или недоступны): {len(post_refs) - updated}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Параллельный расчет колонок по текстам
+Таблица делится на части, и список функций оценки (предобработка, тональность,
+намерение, темы) выполняется над частями в пуле процессов. Таблица целиком в
+процессы не передается: текстовые колонки один раз копируются в разделяемую
+память (байты UTF-8 подряд и массив смещений, как строковая колонка Arrow), и
+каждый процесс читает только строки своей части. Обратно возвращаются только
+рассчитанные значения, из которых собираются типизированные колонки в исходном
+порядке строк
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from text_preprocessing import as_strings
+
+try:
+    from config import SCORING_WORKERS
+except ImportError:
+    SCORING_WORKERS = None  # По умолчанию все ядра
+
+# Строк в одной части: частей в несколько раз больше, чем процессов, чтобы
+# процессы заканчивали работу примерно одновременно
+CHUNK_ROWS = 50_000
+
+# Меньше строк на процесс распределять не имеет смысла
+MIN_ROWS_PER_WORKER = 50_000
+
+
+class Scorer:
+    """
+    Функция оценки текстов
+
+    func получает списки строк колонок inputs (в том же порядке) и возвращает
+    словарь {колонка: значения} для каждой колонки outputs. Колонки, рассчитанные
+    предыдущими функциями списка, можно использовать как inputs следующих.
+    func должна быть функцией уровня модуля, чтобы передаваться в процессы
+    """
+
+    def __init__(self, func: Callable, inputs: Sequence[str], outputs: Dict[str, object]):
+        """
+        Args:
+            func: Функция оценки
+            inputs: Колонки-аргументы
+            outputs: Колонки результата и их типы (тип numpy, 'category' или object)
+        """
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = dict(outputs)
+
+
+class SharedTextColumn:
+    """Текстовая колонка в разделяемой памяти: байты UTF-8 подряд и смещения строк"""
+
+    def __init__(self, texts: List[str]):
+        encoded = [text.encode('utf-8', 'surrogatepass') for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        data = b''.join(encoded)
+        del encoded
+        self._data = SharedMemory(create=True, size=max(len(data), 1))
+        self._data.buf[:len(data)] = data
+        self._offsets = SharedMemory(create=True, size=offsets.nbytes)
+        np.ndarray(offsets.shape, dtype=np.int64, buffer=self._offsets.buf)[:] = offsets
+        self.spec = (self._data.name, self._offsets.name, len(texts))
+
+    def close(self):
+        """Освободить разделяемую память"""
+        for shm in (self._data, self._offsets):
+            shm.close()
+            shm.unlink()
+
+
+def _attach(name: str) -> SharedMemory:
+    """Подключиться к разделяемой памяти без передачи ее учету процесса"""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # До Python 3.13 параметра track нет; память освобождает создавший ее процесс
+        return SharedMemory(name=name)
+
+
+def read_texts(spec: Tuple[str, str, int], start: int, stop: int) -> List[str]:
+    """
+    Строки [start, stop) колонки из разделяемой памяти
+
+    Args:
+        spec: SharedTextColumn.spec
+        start: Первая строка
+        stop: Строка после последней
+
+    Returns:
+        Список строк
+    """
+    data_name, offsets_name, size = spec
+    data_shm, offsets_shm = _attach(data_name), _attach(offsets_name)
+    try:
+        offsets = np.ndarray((size + 1,), dtype=np.int64, buffer=offsets_shm.buf)[start:stop + 1].tolist()
+        data = bytes(data_shm.buf[offsets[0]:offsets[-1]])
+    finally:
+        data_shm.close()
+        offsets_shm.close()
+    base = offsets[0]
+    return [data[begin - base:end - base].decode('utf-8', 'surrogatepass')
+            for begin, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _run_scorers(columns: Dict[str, List[str]], scorers: Sequence[Scorer]) -> Dict[str, object]:
+    """Выполнить функции оценки по порядку над одной частью"""
+    columns = dict(columns)
+    result = {}
+    for scorer in scorers:
+        values = scorer.func(*[columns[name] for name in scorer.inputs])
+        for name, dtype in scorer.outputs.items():
+            column = values[name]
+            if dtype not in (object, 'category'):
+                column = np.asarray(column, dtype=dtype)
+            columns[name] = column
+            result[name] = column
+    return result
+
+
+def _run_chunk(task) -> Dict[str, object]:
+    """Часть в процессе пула: прочитать тексты из разделяемой памяти и выполнить оценку"""
+    specs, start, stop, scorers = task
+    columns = {name: read_texts(spec, start, stop) for name, spec in specs.items()}
+    return _run_scorers(columns, scorers)
+
+
+def _assemble(parts: List[Dict[str, object]], scorers: Sequence[Scorer], index: pd.Index) -> pd.DataFrame:
+    """Склеить результаты частей в типизированные колонки в исходном порядке строк"""
+    result = {}
+    for scorer in scorers:
+        for name, dtype in scorer.outputs.items():
+            if dtype == 'category':
+                result[name] = pd.Categorical([value for part in parts for value in part[name]])
+            elif dtype is object:
+                result[name] = pd.Series([value for part in parts for value in part[name]], dtype=object)
+            else:
+                result[name] = np.concatenate([part[name] for part in parts] or [np.array([], dtype=dtype)])
+    frame = pd.DataFrame(result)
+    frame.index = index
+    return frame
+
+
+def run_scorers(frame: pd.DataFrame, scorers: Sequence[Scorer], workers: Optional[int] = None,
+                chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Рассчитать колонки функциями оценки по частям таблицы
+
+    Args:
+        frame: Таблица с текстовыми колонками inputs
+        scorers: Функции оценки (выполняются по порядку)
+        workers: Число процессов (None - SCORING_WORKERS из config.py или все ядра; 1 - без процессов)
+        chunk_rows: Строк в одной части
+
+    Returns:
+        DataFrame рассчитанных колонок с индексом frame
+    """
+    produced = {name for scorer in scorers for name in scorer.outputs}
+    inputs = [name for name in dict.fromkeys(name for scorer in scorers for name in scorer.inputs)
+              if name not in produced]
+    size = len(frame)
+    workers = workers or SCORING_WORKERS or os.cpu_count() or 1
+    workers = min(workers, -(-size // MIN_ROWS_PER_WORKER))
+    if workers <= 1:
+        columns = {name: as_strings(frame[name]) for name in inputs}
+        parts = [_run_scorers({name: values[start:start + chunk_rows] for name, values in columns.items()}, scorers)
+                 for start in range(0, size, chunk_rows)]
+        return _assemble(parts, scorers, frame.index)
+
+    chunk_rows = min(chunk_rows, -(-size // (workers * 4)))
+    shared = {}
+    try:
+        for name in inputs:
+            shared[name] = SharedTextColumn(as_strings(frame[name]))
+        specs = {name: column.spec for name, column in shared.items()}
+        tasks = [(specs, start, min(start + chunk_rows, size), scorers) for start in range(0, size, chunk_rows)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_run_chunk, tasks))
+    finally:
+        for column in shared.values():
+            column.close()
+    return _assemble(parts, scorers, frame.index)
@@ -0,0 +1,232 @@
+"""
+Потоковая запись собранных данных
+Парсер передает записи в приемники постранично, файлы дописываются по мере сбора
+и принудительно сбрасываются на диск на границах пакетов, поэтому потребление
+памяти не зависит от размера стены
+"""
+
+import gzip
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+
+
+def _open_text(path: str, compress: bool, encoding: str):
+    """Открыть файл для дозаписи (gzip при compress=True)"""
+    if compress:
+        return gzip.open(path, 'at', encoding=encoding, newline='')
+    return open(path, 'a', encoding=encoding, newline='')
+
+
+def _sync(f, compress: bool):
+    """Сбросить буферы файла на диск"""
+    if compress:
+        # Завершаем текущий блок deflate, чтобы записанное можно было прочитать после сбоя
+        f.flush()
+        f.buffer.flush(zlib.Z_SYNC_FLUSH)
+        raw = f.buffer.fileobj
+    else:
+        f.flush()
+        raw = f
+    raw.flush()
+    os.fsync(raw.fileno())
+
+
+class NDJSONSink:
+    """Запись объектов в NDJSON (по объекту на строку)"""
+
+    def __init__(self, path: str, compress: bool = False):
+        """
+        Args:
+            path: Путь к файлу (при compress=True к имени добавляется .gz)
+            compress: Сжимать файл gzip
+        """
+        self.path = f"{path}.gz" if compress and not path.endswith('.gz') else path
+        self.compress = compress
+        self.count = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, records: List[Dict]):
+        """Дописать записи"""
+        if not records:
+            return
+        with self._lock:
+            if self._file is None:
+                self._file = _open_text(self.path, self.compress, 'utf-8')
+            for record in records:
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.count += len(records)
+
+    def commit(self):
+        """Сделать записанные данные устойчивыми к сбою"""
+        with self._lock:
+            if self._file is not None:
+                _sync(self._file, self.compress)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                _sync(self._file, self.compress)
+                self._file.close()
+                self._file = None
+
+
+class CSVSink:
+    """Запись строк в CSV с заголовком (utf-8-sig, как у остальных файлов проекта)"""
+
+    def __init__(self, path: str, columns: List[str], compress: bool = False):
+        """
+        Args:
+            path: Путь к файлу (при compress=True к имени добавляется .gz)
+            columns: Колонки CSV
+            compress: Сжимать файл gzip
+        """
+        self.path = f"{path}.gz" if compress and not path.endswith('.gz') else path
+        self.columns = columns
+        self.compress = compress
+        self.count = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, rows: Union[pd.DataFrame, List[Dict]]):
+        """
+        Дописать строки; заголовок пишется, только если файл новый
+
+        Args:
+            rows: DataFrame или список словарей; лишние колонки отбрасываются,
+                недостающие остаются пустыми
+        """
+        if len(rows) == 0:
+            return
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        frame = frame.reindex(columns=self.columns)
+        with self._lock:
+            header = False
+            if self._file is None:
+                header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                self._file = _open_text(self.path, self.compress, 'utf-8-sig' if header else 'utf-8')
+            frame.to_csv(self._file, header=header, index=False)
+            self.count += len(frame)
+
+    def commit(self):
+        """Сделать записанные данные устойчивыми к сбою"""
+        with self._lock:
+            if self._file is not None:
+                _sync(self._file, self.compress)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                _sync(self._file, self.compress)
+                self._file.close()
+                self._file = None
+
+
+class FanoutSink:
+    """Передача одних и тех же строк в несколько приемников"""
+
+    def __init__(self, *sinks):
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def write(self, rows):
+        for sink in self.sinks:
+            sink.write(rows)
+
+    def commit(self):
+        for sink in self.sinks:
+            sink.commit()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class TargetSink:
+    """
+    Приемник данных одной цели: CSV постов и комментариев и NDJSON с исходными объектами API
+
+    Строки CSV дополнительно передаются в общие приемники (например, сводные файлы
+    по всем целям).
+    """
+
+    def __init__(self, base_filename: str, post_columns: List[str], comment_columns: List[str],
+                 posts_to_frame: Callable, comments_to_frame: Callable, compress: bool = False,
+                 shared_posts: Optional[CSVSink] = None, shared_comments: Optional[CSVSink] = None,
+                 raw=None):
+        """
+        Args:
+            base_filename: Базовое имя файлов (без расширения)
+            post_columns: Колонки CSV постов
+            comment_columns: Колонки CSV комментариев
+            posts_to_frame: Функция (posts, target_id, owner_id) -> DataFrame строк CSV
+            comments_to_frame: Функция (comments, target_id, owner_id) -> DataFrame строк CSV
+            compress: Сжимать файлы gzip
+            shared_posts: Общий приемник строк постов
+            shared_comments: Общий приемник строк комментариев
+            raw: Приемник исходных объектов (None - NDJSON файл цели), например raw_archive.ArchiveSink
+        """
+        self.base_filename = base_filename
+        self.posts = CSVSink(f"{base_filename}_posts.csv", post_columns, compress)
+        self.comments = CSVSink(f"{base_filename}_comments.csv", comment_columns, compress)
+        self.raw = raw if raw is not None else NDJSONSink(f"{base_filename}.ndjson", compress)
+        self.posts_to_frame = posts_to_frame
+        self.comments_to_frame = comments_to_frame
+        self.shared_posts = shared_posts
+        self.shared_comments = shared_comments
+        self.target_id = None
+        self.owner_id = None
+        self._header = None
+
+    def open_target(self, target_id: str, owner_id: str, target_info: Dict):
+        """Запомнить цель; описание цели пишется в NDJSON перед первой записью"""
+        self.target_id = target_id
+        self.owner_id = owner_id
+        self._header = {'type': 'target', 'target_id': target_id, 'owner_id': owner_id,
+                        'target_info': target_info, 'parsed_at': datetime.now().isoformat()}
+
+    def _write_raw(self, record_type: str, items: List[Dict]):
+        records = [{'type': record_type, 'item': item} for item in items]
+        if self._header is not None:
+            records.insert(0, self._header)
+            self._header = None
+        self.raw.write(records)
+
+    def write_posts(self, posts: List[Dict]):
+        """Записать страницу постов"""
+        if not posts:
+            return
+        self._write_raw('post', posts)
+        rows = self.posts_to_frame(posts, self.target_id, self.owner_id)
+        self.posts.write(rows)
+        if self.shared_posts:
+            self.shared_posts.write(rows)
+
+    def write_comments(self, comments: List[Dict]):
+        """Записать комментарии"""
+        if not comments:
+            return
+        self._write_raw('comment', comments)
+        rows = self.comments_to_frame(comments, self.target_id, self.owner_id)
+        self.comments.write(rows)
+        if self.shared_comments:
+            self.shared_comments.write(rows)
+
+    def commit(self):
+        """Граница пакета: сбросить все файлы на диск"""
+        for sink in (self.posts, self.comments, self.raw, self.shared_posts, self.shared_comments):
+            if sink:
+                sink.commit()
+
+    def close(self):
+        for sink in (self.posts, self.comments, self.raw):
+            sink.close()
+
+    def saved_files(self) -> List[str]:
+        """Файлы, в которые были записаны данные"""
+        return [sink.path for sink in (self.posts, self.comments, self.raw) if sink.count]
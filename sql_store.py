@@ -0,0 +1,349 @@
+"""
+Локальная база SQLite с постами и комментариями
+Записи хранятся с составными ключами (owner_id, post_id) и (owner_id, comment_id):
+ID постов уникальны только в пределах стены. Повторная загрузка обновляет
+записи (upsert), индексы по дате, цели и посту позволяют получать срезы,
+например комментарии одной цели за квартал, без загрузки всех данных
+
+Загрузка собранных CSV файлов и примеры запросов:
+    python sql_store.py ingest
+    python sql_store.py info
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+from normalizer import POST_COLUMNS, COMMENT_COLUMNS
+
+
+SQL_STORE_PATH = 'data/vk_data.sqlite'
+
+POSTS = 'posts'
+COMMENTS = 'comments'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    owner_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    target_id TEXT,
+    date TEXT,
+    date_timestamp INTEGER,
+    text TEXT,
+    text_length INTEGER,
+    likes INTEGER,
+    reposts INTEGER,
+    comments_count INTEGER,
+    views INTEGER,
+    engagement INTEGER,
+    PRIMARY KEY (owner_id, post_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS posts_date ON posts (date_timestamp);
+CREATE INDEX IF NOT EXISTS posts_target_date ON posts (target_id, date_timestamp);
+
+CREATE TABLE IF NOT EXISTS comments (
+    owner_id INTEGER NOT NULL,
+    comment_id INTEGER NOT NULL,
+    post_id INTEGER,
+    target_id TEXT,
+    date TEXT,
+    date_timestamp INTEGER,
+    text TEXT,
+    text_length INTEGER,
+    likes INTEGER,
+    author_id INTEGER,
+    PRIMARY KEY (owner_id, comment_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS comments_post ON comments (owner_id, post_id);
+CREATE INDEX IF NOT EXISTS comments_date ON comments (date_timestamp);
+CREATE INDEX IF NOT EXISTS comments_target_date ON comments (target_id, date_timestamp);
+CREATE INDEX IF NOT EXISTS comments_author ON comments (author_id);
+
+CREATE TABLE IF NOT EXISTS ingested_files (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+"""
+
+COLUMNS = {POSTS: POST_COLUMNS, COMMENTS: COMMENT_COLUMNS}
+KEYS = {POSTS: ('owner_id', 'post_id'), COMMENTS: ('owner_id', 'comment_id')}
+INTEGER_COLUMNS = {'owner_id', 'post_id', 'comment_id', 'date_timestamp', 'text_length', 'likes',
+                   'reposts', 'comments_count', 'views', 'engagement', 'author_id'}
+
+
+def _timestamp(value) -> Optional[int]:
+    """Граница периода (дата, строка или Unix-время) в Unix-время по местному времени"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(pd.Timestamp(value).to_pydatetime().timestamp())
+
+
+class SQLStore:
+    """Потокобезопасное хранилище постов и комментариев в SQLite"""
+
+    def __init__(self, path: str = SQL_STORE_PATH):
+        """
+        Инициализация хранилища
+
+        Args:
+            path: Путь к файлу базы
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Индексы обновляются при каждой вставке: больший кэш страниц ускоряет загрузку
+        self._conn.execute("PRAGMA cache_size=-65536")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._statements = {kind: self._upsert_statement(kind) for kind in COLUMNS}
+
+    @staticmethod
+    def _upsert_statement(kind: str) -> str:
+        columns = COLUMNS[kind]
+        updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c not in KEYS[kind])
+        return (f"INSERT INTO {kind} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT ({', '.join(KEYS[kind])}) DO UPDATE SET {updates}")
+
+    @staticmethod
+    def _rows(kind: str, rows: Union[pd.DataFrame, List[Dict]]):
+        """Строки для executemany: целые числа как int, пропуски как NULL"""
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        frame = frame.reindex(columns=COLUMNS[kind])
+        for column in COLUMNS[kind]:
+            if column in INTEGER_COLUMNS:
+                frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('Int64')
+        # Вставка в порядке первичного ключа проходит по соседним страницам B-дерева
+        frame = frame.dropna(subset=list(KEYS[kind])).sort_values(list(KEYS[kind])).astype(object)
+        return frame.where(frame.notna(), None).itertuples(index=False, name=None)
+
+    def upsert(self, kind: str, rows: Union[pd.DataFrame, List[Dict]], commit: bool = True) -> int:
+        """
+        Добавить или обновить записи
+
+        Args:
+            kind: 'posts' или 'comments'
+            rows: DataFrame или список словарей с колонками POST_COLUMNS / COMMENT_COLUMNS
+            commit: Зафиксировать транзакцию
+
+        Returns:
+            Количество обработанных строк
+        """
+        with self._lock:
+            cursor = self._conn.executemany(self._statements[kind], self._rows(kind, rows))
+            if commit:
+                self._conn.commit()
+            return cursor.rowcount
+
+    def upsert_posts(self, rows, commit: bool = True) -> int:
+        return self.upsert(POSTS, rows, commit)
+
+    def upsert_comments(self, rows, commit: bool = True) -> int:
+        return self.upsert(COMMENTS, rows, commit)
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        """Выполнить произвольный SELECT и вернуть DataFrame"""
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def _select(self, kind: str, columns: Optional[List[str]], conditions: Dict, start, end,
+                order: str, limit: Optional[int]) -> pd.DataFrame:
+        where, params = [], []
+        for column, value in conditions.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                where.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            where.append("date_timestamp >= ?")
+            params.append(_timestamp(start))
+        if end is not None:
+            where.append("date_timestamp < ?")
+            params.append(_timestamp(end))
+        sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {kind}"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.query(sql, params)
+
+    def posts(self, target_id=None, owner_id=None, start=None, end=None,
+              columns: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Посты по условиям
+
+        Args:
+            target_id: Цель или список целей
+            owner_id: Владелец стены или список владельцев
+            start: Начало периода включительно (дата, строка 'YYYY-MM-DD' или Unix-время)
+            end: Конец периода не включительно
+            columns: Колонки (None - все)
+            limit: Максимальное количество строк
+
+        Returns:
+            DataFrame постов, отсортированный по дате
+        """
+        return self._select(POSTS, columns, {'target_id': target_id, 'owner_id': owner_id},
+                            start, end, 'date_timestamp', limit)
+
+    def comments(self, target_id=None, owner_id=None, post_id=None, author_id=None, start=None, end=None,
+                 columns: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Комментарии по условиям (аргументы как у posts, плюс пост и автор)
+
+        Returns:
+            DataFrame комментариев, отсортированный по дате
+        """
+        conditions = {'target_id': target_id, 'owner_id': owner_id, 'post_id': post_id, 'author_id': author_id}
+        return self._select(COMMENTS, columns, conditions, start, end, 'date_timestamp', limit)
+
+    def stats(self) -> Dict:
+        """Количество записей и период данных"""
+        with self._lock:
+            result = {}
+            for kind in COLUMNS:
+                count, first, last = self._conn.execute(
+                    f"SELECT COUNT(*), MIN(date), MAX(date) FROM {kind}"
+                ).fetchone()
+                result[kind] = {'count': count, 'min_date': first, 'max_date': last}
+            return result
+
+    def is_ingested(self, filename: str, path: str) -> bool:
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime FROM ingested_files WHERE filename = ?", (filename,)
+            ).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def ingest_csv(self, path: str, kind: str, chunksize: int = 100_000) -> int:
+        """
+        Загрузить CSV файл сбора частями в одной транзакции
+
+        При ошибке в любой части транзакция откатывается: в хранилище не
+        остается части файла без отметки в ingested_files.
+
+        Returns:
+            Количество загруженных строк
+        """
+        stat = os.stat(path)
+        total = 0
+        try:
+            for chunk in pd.read_csv(path, encoding='utf-8-sig', dtype={'target_id': str, 'text': str},
+                                     keep_default_na=False, chunksize=chunksize):
+                total += self.upsert(kind, chunk, commit=False)
+        except Exception:
+            with self._lock:
+                self._conn.rollback()
+            raise
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingested_files (filename, size, mtime, ingested_at) VALUES (?, ?, ?, ?)",
+                (os.path.basename(path), stat.st_size, stat.st_mtime, datetime.now().isoformat())
+            )
+            self._conn.commit()
+        return total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SQLStoreSink:
+    """Приемник строк для хранилища (тот же интерфейс, что у sinks.CSVSink)"""
+
+    def __init__(self, store: SQLStore, kind: str):
+        self.store = store
+        self.kind = kind
+        self.path = store.path
+        self.count = 0
+
+    def write(self, rows):
+        if len(rows) == 0:
+            return
+        self.count += self.store.upsert(self.kind, rows, commit=False)
+
+    def commit(self):
+        """Граница пакета: зафиксировать транзакцию"""
+        self.store.commit()
+
+    def close(self):
+        self.store.commit()
+
+
+def ingest_data_dir(store: SQLStore, data_dir: str = 'data') -> Dict[str, int]:
+    """
+    Загрузить в хранилище новые и изменившиеся CSV файлы сбора
+
+    Сводные и объединенные файлы пропускаются: в них те же записи.
+
+    Returns:
+        Количество загруженных строк по типам
+    """
+    counts = {POSTS: 0, COMMENTS: 0}
+    for filename in sorted(os.listdir(data_dir)):
+        if filename.endswith(('_posts.csv', '_posts.csv.gz')):
+            kind = POSTS
+        elif filename.endswith(('_comments.csv', '_comments.csv.gz')):
+            kind = COMMENTS
+        else:
+            continue
+        if 'summary' in filename:
+            continue
+        path = os.path.join(data_dir, filename)
+        if store.is_ingested(filename, path):
+            continue
+        try:
+            rows = store.ingest_csv(path, kind)
+        except Exception as e:
+            print(f"  Ошибка при загрузке {filename}: {e}")
+            continue
+        counts[kind] += rows
+        print(f"  {filename}: {rows} записей")
+    return counts
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Хранилище SQLite с постами и комментариями')
+    arg_parser.add_argument('command', choices=['ingest', 'info'],
+                            help='ingest - загрузить CSV файлы из data/, info - статистика хранилища')
+    arg_parser.add_argument('--data-dir', default='data', help='Папка с CSV файлами')
+    arg_parser.add_argument('--path', default=SQL_STORE_PATH, help='Файл базы')
+    args = arg_parser.parse_args()
+
+    store = SQLStore(args.path)
+    try:
+        if args.command == 'ingest':
+            print("Загрузка CSV файлов в хранилище...")
+            counts = ingest_data_dir(store, args.data_dir)
+            print(f"✓ Загружено постов: {counts[POSTS]}, комментариев: {counts[COMMENTS]}")
+        for kind, info in store.stats().items():
+            print(f"{kind}: {info['count']} записей, период: {info['min_date']} - {info['max_date']}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Хранилище собранных данных в формате Parquet
+Посты и комментарии хранятся как наборы Parquet файлов с разбиением по цели
+и году (data/dataset/posts/target_id=.../year=.../*.parquet) с типизированными
+колонками и сжатием zstd. При чтении загружаются только нужные колонки и
+разделы, например комментарии за один год
+
+Конвертация уже собранных CSV файлов:
+    python storage.py convert
+    python storage.py info
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from normalizer import POST_COLUMNS, COMMENT_COLUMNS, local_datetimes
+
+
+DATASET_DIR = 'data/dataset'
+
+POSTS = 'posts'
+COMMENTS = 'comments'
+
+# Типы колонок; date хранится как время, а не строка
+SCHEMAS = {
+    POSTS: pa.schema([
+        ('post_id', pa.int64()), ('target_id', pa.string()), ('owner_id', pa.int64()),
+        ('date', pa.timestamp('s')), ('date_timestamp', pa.int64()), ('text', pa.string()),
+        ('text_length', pa.int32()), ('likes', pa.int64()), ('reposts', pa.int64()),
+        ('comments_count', pa.int64()), ('views', pa.int64()), ('engagement', pa.int64()),
+        ('year', pa.int16()),
+    ]),
+    COMMENTS: pa.schema([
+        ('comment_id', pa.int64()), ('post_id', pa.int64()), ('target_id', pa.string()),
+        ('owner_id', pa.int64()), ('date', pa.timestamp('s')), ('date_timestamp', pa.int64()),
+        ('text', pa.string()), ('text_length', pa.int32()), ('likes', pa.int64()),
+        ('author_id', pa.int64()), ('year', pa.int16()),
+    ]),
+}
+COLUMNS = {POSTS: POST_COLUMNS, COMMENTS: COMMENT_COLUMNS}
+
+# Ключ записи: при повторном сборе новая версия поста или комментария заменяет старую
+KEYS = {POSTS: ['owner_id', 'post_id'], COMMENTS: ['owner_id', 'comment_id']}
+
+PARTITIONING = ds.partitioning(pa.schema([('target_id', pa.string()), ('year', pa.int16())]), flavor='hive')
+
+# Сколько строк копить перед записью файла: мелкие файлы замедляют чтение
+ROWS_PER_FILE = 200_000
+
+
+def dataset_path(kind: str, root: str = DATASET_DIR) -> str:
+    return os.path.join(root, kind)
+
+
+def to_table(kind: str, frame: pd.DataFrame) -> pa.Table:
+    """
+    Преобразовать таблицу в формате CSV (см. normalizer) в таблицу Arrow
+
+    Дата и год берутся из date_timestamp, строки без даты отбрасываются.
+
+    Args:
+        kind: 'posts' или 'comments'
+        frame: DataFrame с колонками POST_COLUMNS или COMMENT_COLUMNS
+    """
+    schema = SCHEMAS[kind]
+    frame = frame.reindex(columns=COLUMNS[kind]).reset_index(drop=True)
+    frame['date_timestamp'] = pd.to_numeric(frame['date_timestamp'], errors='coerce').astype('Int64')
+    frame = frame[(frame['date_timestamp'] > 0).fillna(False)].reset_index(drop=True)
+
+    frame['date'] = local_datetimes(frame['date_timestamp']).astype('datetime64[s]')
+    frame['year'] = frame['date'].dt.year.astype('int16')
+    frame['target_id'] = frame['target_id'].astype(str)
+    frame['text'] = frame['text'].fillna('').astype(str)
+    for field in schema:
+        if pa.types.is_integer(field.type) and field.name not in ('date_timestamp', 'year'):
+            frame[field.name] = pd.to_numeric(frame[field.name], errors='coerce').astype('Int64')
+    return pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False)
+
+
+def write_frame(kind: str, frame: pd.DataFrame, root: str = DATASET_DIR) -> int:
+    """
+    Дописать строки в набор данных
+
+    Каждый вызов создает новые файлы в затронутых разделах.
+
+    Returns:
+        Количество записанных строк
+    """
+    table = to_table(kind, frame)
+    if not table.num_rows:
+        return 0
+    # Время в имени файла: при чтении более поздние версии записей идут последними
+    basename = f"part-{time.time_ns()}-{os.getpid()}-{threading.get_ident()}-{{i}}.parquet"
+    ds.write_dataset(
+        table, dataset_path(kind, root), format='parquet', partitioning=PARTITIONING,
+        basename_template=basename, existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd')
+    )
+    return table.num_rows
+
+
+class ParquetDatasetSink:
+    """
+    Приемник строк для набора данных (тот же интерфейс, что у sinks.CSVSink)
+
+    Строки копятся в памяти и записываются файлами по ROWS_PER_FILE строк и при
+    закрытии. Устойчивость к сбою обеспечивают CSV и NDJSON файлы сбора: после
+    прерванного сбора недостающие строки переносятся командой convert.
+    """
+
+    def __init__(self, kind: str, root: str = DATASET_DIR, rows_per_file: int = ROWS_PER_FILE):
+        self.kind = kind
+        self.root = root
+        self.path = dataset_path(kind, root)
+        self.rows_per_file = rows_per_file
+        self.count = 0
+        self._frames = []
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    def write(self, rows):
+        if len(rows) == 0:
+            return
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        with self._lock:
+            self._frames.append(frame)
+            self._buffered += len(frame)
+            self.count += len(frame)
+            if self._buffered >= self.rows_per_file:
+                self._flush()
+
+    def _flush(self):
+        if self._frames:
+            write_frame(self.kind, pd.concat(self._frames, ignore_index=True), self.root)
+            self._frames = []
+            self._buffered = 0
+
+    def commit(self):
+        """Граница пакета: файлы пишутся только по заполнении буфера"""
+
+    def close(self):
+        with self._lock:
+            self._flush()
+
+
+def _filter(target_ids: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None,
+            expression: Optional[ds.Expression] = None) -> Optional[ds.Expression]:
+    """Условие отбора: по разделам (цели и годы) и произвольное выражение pyarrow"""
+    conditions = []
+    if target_ids is not None:
+        conditions.append(ds.field('target_id').isin([str(t) for t in target_ids]))
+    if years is not None:
+        conditions.append(ds.field('year').isin([int(y) for y in years]))
+    if expression is not None:
+        conditions.append(expression)
+    result = None
+    for condition in conditions:
+        result = condition if result is None else result & condition
+    return result
+
+
+def open_dataset(kind: str, root: str = DATASET_DIR) -> Optional[ds.Dataset]:
+    """Набор данных или None, если он еще не создан"""
+    path = dataset_path(kind, root)
+    if not os.path.isdir(path):
+        return None
+    return ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+
+
+def read(kind: str, columns: Optional[List[str]] = None, target_ids: Optional[Iterable[str]] = None,
+         years: Optional[Iterable[int]] = None, filter: Optional[ds.Expression] = None,
+         deduplicate: bool = True, root: str = DATASET_DIR) -> pd.DataFrame:
+    """
+    Прочитать посты или комментарии
+
+    Читаются только файлы нужных разделов и только нужные колонки.
+
+    Args:
+        kind: 'posts' или 'comments'
+        columns: Колонки (None - все)
+        target_ids: Только эти цели
+        years: Только эти годы
+        filter: Дополнительное условие, например ds.field('likes') > 10
+        deduplicate: Оставить одну, самую позднюю версию каждой записи
+        root: Папка набора данных
+
+    Returns:
+        DataFrame (пустой, если набора данных нет)
+    """
+    dataset = open_dataset(kind, root)
+    if dataset is None:
+        return pd.DataFrame(columns=columns or SCHEMAS[kind].names)
+    read_columns = list(columns) if columns else SCHEMAS[kind].names
+    if deduplicate:
+        read_columns += [key for key in KEYS[kind] if key not in read_columns]
+    table = dataset.to_table(columns=read_columns, filter=_filter(target_ids, years, filter))
+    frame = table.to_pandas()
+    if deduplicate and len(frame):
+        frame = frame.drop_duplicates(subset=KEYS[kind], keep='last')
+    return frame[columns].reset_index(drop=True) if columns else frame.reset_index(drop=True)
+
+
+def read_posts(**kwargs) -> pd.DataFrame:
+    """Прочитать посты (аргументы как у read)"""
+    return read(POSTS, **kwargs)
+
+
+def read_comments(**kwargs) -> pd.DataFrame:
+    """Прочитать комментарии (аргументы как у read)"""
+    return read(COMMENTS, **kwargs)
+
+
+def date_range(kind: str = POSTS, target_ids: Optional[Iterable[str]] = None, root: str = DATASET_DIR):
+    """Самая ранняя и самая поздняя дата в наборе данных (None, если данных нет)"""
+    dataset = open_dataset(kind, root)
+    if dataset is None:
+        return None
+    dates = dataset.to_table(columns=['date'], filter=_filter(target_ids)).column('date')
+    if not len(dates):
+        return None
+    bounds = pc.min_max(dates)
+    return pd.Timestamp(bounds['min'].as_py()), pd.Timestamp(bounds['max'].as_py())
+
+
+def _csv_kind(filename: str) -> Optional[str]:
+    if filename.endswith(('_posts.csv', '_posts.csv.gz')):
+        return POSTS
+    if filename.endswith(('_comments.csv', '_comments.csv.gz')):
+        return COMMENTS
+    return None
+
+
+def csv_signature(path: str) -> Optional[List]:
+    """Размер и время изменения файла (None, если файла нет)"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+
+def _manifest_path(root: str) -> str:
+    return os.path.join(root, 'converted.json')
+
+
+def _load_manifest(root: str) -> Dict[str, List]:
+    manifest_path = _manifest_path(root)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest: Dict[str, List], root: str):
+    os.makedirs(root, exist_ok=True)
+    with open(_manifest_path(root), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def mark_streamed(files: Dict[str, Optional[List]], root: str = DATASET_DIR):
+    """
+    Отметить CSV файлы сбора, строки которых уже записаны в набор данных через ParquetDatasetSink
+
+    Вызывается после закрытия приемников набора данных, чтобы convert_csv не
+    переносил эти файлы повторно. Файл, дописанный после прерванного запуска,
+    отмечается, только если его прежнее содержимое уже было перенесено.
+
+    Args:
+        files: Путь к CSV файлу -> csv_signature файла до начала записи (None - файл создан при сборе)
+        root: Папка набора данных
+    """
+    manifest = _load_manifest(root)
+    marked = False
+    for path, before in files.items():
+        filename = os.path.basename(path)
+        signature = csv_signature(path)
+        if signature is None or (before is not None and manifest.get(filename) != before):
+            continue
+        manifest[filename] = signature
+        marked = True
+    if marked:
+        _save_manifest(manifest, root)
+
+
+def convert_csv(data_dir: str = 'data', root: str = DATASET_DIR) -> Dict[str, int]:
+    """
+    Перенести CSV файлы сбора в набор данных
+
+    Сводные и объединенные файлы пропускаются: в них те же записи, что в
+    файлах целей. Уже перенесенные файлы и файлы, записанные в набор данных
+    при сборе (см. mark_streamed), повторно не читаются, если их размер и
+    время изменения не изменились.
+
+    Returns:
+        Количество перенесенных строк по типам
+    """
+    manifest = _load_manifest(root)
+
+    counts = {POSTS: 0, COMMENTS: 0}
+    for filename in sorted(os.listdir(data_dir)):
+        kind = _csv_kind(filename)
+        if kind is None or 'summary' in filename or 'ALL_' in filename:
+            continue
+        filepath = os.path.join(data_dir, filename)
+        signature = csv_signature(filepath)
+        if manifest.get(filename) == signature:
+            continue
+        try:
+            frame = pd.read_csv(filepath, encoding='utf-8-sig', dtype={'target_id': str, 'text': str})
+            rows = write_frame(kind, frame, root)
+        except Exception as e:
+            print(f"  Ошибка при конвертации {filename}: {e}")
+            continue
+        counts[kind] += rows
+        manifest[filename] = signature
+        print(f"  {filename}: {rows} записей")
+        _save_manifest(manifest, root)
+    return counts
+
+
+def _directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(dirpath, name))
+               for dirpath, _, names in os.walk(path) for name in names)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Набор данных Parquet с постами и комментариями')
+    arg_parser.add_argument('command', choices=['convert', 'info'],
+                            help='convert - перенести CSV файлы из data/, info - статистика набора данных')
+    arg_parser.add_argument('--data-dir', default='data', help='Папка с CSV файлами')
+    arg_parser.add_argument('--root', default=DATASET_DIR, help='Папка набора данных')
+    args = arg_parser.parse_args()
+
+    if args.command == 'convert':
+        print("Конвертация CSV файлов в Parquet...")
+        counts = convert_csv(args.data_dir, args.root)
+        print(f"✓ Перенесено постов: {counts[POSTS]}, комментариев: {counts[COMMENTS]}")
+
+    for kind in (POSTS, COMMENTS):
+        dataset = open_dataset(kind, args.root)
+        if dataset is None:
+            print(f"{kind}: набор данных не создан")
+            continue
+        rows = dataset.count_rows()
+        size_mb = _directory_size(dataset_path(kind, args.root)) / 1024 / 1024
+        years = sorted(set(dataset.to_table(columns=['year']).column('year').to_pylist()))
+        print(f"{kind}: {rows} записей, {len(dataset.files)} файлов, {size_mb:.1f} МБ, годы: {years}")
+
+
+if __name__ == "__main__":
+    main()
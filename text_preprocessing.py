@@ -0,0 +1,124 @@
+"""
+Пакетная предобработка текстов
+Те же шаги, что и preprocess_text из analysis.ipynb (удаление URL, упоминаний и
+хештегов, схлопывание пробелов, удаление спецсимволов, нижний регистр), но
+над целой колонкой: тексты части склеиваются через разделитель и каждое
+регулярное выражение выполняется один раз на всю часть.
+
+Разделитель \\x1e для регулярных выражений - пробельный символ и не буква,
+поэтому ни одна замена не переходит через границу текстов и результат
+совпадает с построчной обработкой. Пробелы схлопываются методами строк, а
+не регулярным выражением: замена каждого пробела была самым медленным шагом.
+Части, в которых разделитель встречается в самих текстах, обрабатываются
+построчно. Очень большие колонки можно обрабатывать в нескольких процессах
+через scoring_executor
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+try:
+    from config import PREPROCESS_WORKERS
+except ImportError:
+    PREPROCESS_WORKERS = 1  # По умолчанию в текущем процессе
+
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+MENTION_PATTERN = re.compile(r'@\w+|#\w+')
+SPACE_PATTERN = re.compile(r'\s+')
+SPECIAL_PATTERN = re.compile(r'[^\w\s]')
+
+SEPARATOR = '\x1e'
+
+# Текстов в одной части: склеенная часть занимает десятки МБ
+CHUNK_ROWS = 100_000
+
+def preprocess_text(text) -> str:
+    """
+    Предобработка одного текста (как в analysis.ipynb, с заранее скомпилированными выражениями)
+
+    Args:
+        text: Исходный текст (NaN и пустые значения дают пустую строку)
+
+    Returns:
+        Текст без URL, упоминаний, хештегов и спецсимволов в нижнем регистре
+    """
+    if pd.isna(text) or not text:
+        return ""
+    text = str(text)
+    text = URL_PATTERN.sub('', text)
+    text = MENTION_PATTERN.sub('', text)
+    text = SPACE_PATTERN.sub(' ', text)
+    text = SPECIAL_PATTERN.sub('', text)
+    return text.strip().lower()
+
+
+def as_strings(texts: pd.Series) -> List[str]:
+    """Тексты колонки строками: пропуски и пустые значения - пустые строки"""
+    if texts.dtype != object and pd.api.types.is_string_dtype(texts.dtype):
+        return texts.to_numpy(dtype=object, na_value='').tolist()
+    return [value if isinstance(value, str) else ('' if pd.isna(value) or not value else str(value))
+            for value in texts.tolist()]
+
+
+def preprocess_batch(texts: List[str]) -> List[str]:
+    """
+    Предобработка списка строк за один проход каждого выражения
+
+    Args:
+        texts: Строки (без пропусков)
+
+    Returns:
+        Список предобработанных текстов того же размера
+    """
+    if not texts:
+        return []
+    joined = SEPARATOR.join(texts)
+    if joined.count(SEPARATOR) != len(texts) - 1:
+        return [preprocess_text(text) for text in texts]
+    if 'http' in joined or 'www' in joined:
+        joined = URL_PATTERN.sub('', joined)
+    if '@' in joined or '#' in joined:
+        joined = MENTION_PATTERN.sub('', joined)
+    # split() делит по тем же пробельным символам, что и \s, а обрезка краев
+    # до удаления спецсимволов не меняет результат: в конце края обрезаются снова
+    joined = SEPARATOR.join([' '.join(text.split()) for text in joined.split(SEPARATOR)])
+    joined = SPECIAL_PATTERN.sub('', joined).lower()
+    return [text.strip() for text in joined.split(SEPARATOR)]
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def preprocess_series(texts: pd.Series, workers: Optional[int] = None,
+                      chunk_rows: int = CHUNK_ROWS) -> pd.Series:
+    """
+    Предобработка колонки текстов
+
+    Результат совпадает с texts.apply(preprocess_text).
+
+    Args:
+        texts: Колонка исходных текстов
+        workers: Число процессов (None - PREPROCESS_WORKERS из config.py, 1 - без процессов)
+        chunk_rows: Текстов в одной части
+
+    Returns:
+        Series предобработанных текстов с индексом texts
+    """
+    workers = workers or PREPROCESS_WORKERS or 1
+    if workers > 1:
+        from scoring_executor import Scorer, run_scorers
+        scorer = Scorer(preprocess_texts, ['text'], {'text_processed': object})
+        result = run_scorers(texts.to_frame('text'), [scorer], workers=workers, chunk_rows=chunk_rows)
+        return result['text_processed'].rename(texts.name)
+    values = as_strings(texts)
+    result = [text for chunk in _chunks(values, chunk_rows) for text in preprocess_batch(chunk)]
+    return pd.Series(result, index=texts.index, name=texts.name, dtype=object)
+
+
+def preprocess_texts(texts: List[str]) -> Dict[str, List[str]]:
+    """Функция оценки для scoring_executor: колонка text_processed"""
+    return {'text_processed': preprocess_batch(texts)}
@@ -0,0 +1,134 @@
+"""
+Индекс упоминаний тем в комментариях
+Колонка topics хранит у каждого комментария список тем. Индекс один раз
+переводит ее в пары (строка, номер темы) и булеву матрицу строк и тем, после
+чего число упоминаний, тональность по темам, динамика тем по периодам и
+выборки вида "комментарии о теме X в третьем квартале" считаются векторными
+операциями за один проход, без отдельной фильтрации таблицы для каждой темы
+"""
+
+from itertools import chain
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from lexicons import MEDICAL_TOPICS
+
+
+class TopicIndex:
+    """Принадлежность строк таблицы темам: пары (строка, тема) и булева матрица"""
+
+    def __init__(self, rows: np.ndarray, codes: np.ndarray, index: pd.Index,
+                 topics: Sequence[str] = tuple(MEDICAL_TOPICS)):
+        """
+        Args:
+            rows: Позиции строк упоминаний
+            codes: Номера тем упоминаний (в том же порядке, что и rows)
+            index: Индекс таблицы
+            topics: Названия тем по номерам
+
+        Повторы темы в одной строке учитываются один раз.
+        """
+        self.topics = list(topics)
+        self.index = index
+        size = max(len(self.topics), 1)
+        pairs = np.unique(np.asarray(rows, dtype=np.int64) * size + np.asarray(codes, dtype=np.int64))
+        self.rows = pairs // size
+        self.codes = pairs % size
+        self.matrix = np.zeros((len(index), len(self.topics)), dtype=bool)
+        self.matrix[rows, codes] = True
+
+    @classmethod
+    def from_lists(cls, topics: pd.Series, names: Optional[Sequence[str]] = None) -> 'TopicIndex':
+        """
+        Индекс по колонке списков тем
+
+        Args:
+            topics: Колонка списков тем (пропуски - без тем)
+            names: Названия и порядок тем (None - темы MEDICAL_TOPICS); другие темы не учитываются
+
+        Returns:
+            TopicIndex с индексом колонки
+        """
+        names = list(names if names is not None else MEDICAL_TOPICS)
+        values = [value if isinstance(value, (list, tuple)) else () for value in topics.tolist()]
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        rows = np.repeat(np.arange(len(values), dtype=np.int64), lengths)
+        codes = pd.Categorical(list(chain.from_iterable(values)), categories=names).codes.astype(np.int64)
+        known = codes >= 0
+        return cls(rows[known], codes[known], topics.index, names)
+
+    def mask(self, topic: str) -> np.ndarray:
+        """Булева маска строк, упоминающих тему"""
+        return self.matrix[:, self.topics.index(topic)]
+
+    def select(self, topic: str, where=None) -> pd.Index:
+        """
+        Строки, упоминающие тему
+
+        Args:
+            topic: Название темы
+            where: Дополнительное булево условие по строкам (Series с тем же индексом или массив)
+
+        Returns:
+            Индекс подходящих строк (для .loc)
+        """
+        mask = self.mask(topic)
+        if where is not None:
+            mask = mask & np.asarray(where, dtype=bool)
+        return self.index[mask]
+
+    def counts(self) -> pd.Series:
+        """Число строк, упоминающих каждую тему"""
+        return pd.Series(np.bincount(self.codes, minlength=len(self.topics)), index=self.topics)
+
+    def crosstab(self, groups) -> pd.DataFrame:
+        """
+        Число упоминаний тем по значениям groups
+
+        Args:
+            groups: Значение по строкам (тональность, год, квартал; пропуски не учитываются)
+
+        Returns:
+            DataFrame: строки - темы, колонки - значения groups по возрастанию
+        """
+        group_codes, uniques = pd.factorize(pd.Series(np.asarray(groups)), sort=True)
+        group_codes = group_codes[self.rows]
+        known = group_codes >= 0
+        cells = self.codes[known] * len(uniques) + group_codes[known]
+        counts = np.bincount(cells, minlength=len(self.topics) * len(uniques))
+        return pd.DataFrame(counts.reshape(len(self.topics), len(uniques)), index=self.topics, columns=uniques)
+
+    def mean(self, values) -> pd.Series:
+        """Среднее values по строкам каждой темы (NaN для тем без упоминаний)"""
+        values = np.asarray(values, dtype=np.float64)[self.rows]
+        sums = np.bincount(self.codes, weights=values, minlength=len(self.topics))
+        counts = np.bincount(self.codes, minlength=len(self.topics))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.Series(sums / counts, index=self.topics)
+
+    def sentiment_summary(self, sentiment) -> Dict[str, Dict]:
+        """
+        Тональность комментариев по темам (как topic_sentiment в analysis.ipynb)
+
+        Args:
+            sentiment: Тональность строк (-1, 0, 1)
+
+        Returns:
+            Словарь тема -> count, positive, negative, neutral, avg_sentiment для упомянутых тем
+        """
+        table = self.crosstab(sentiment)
+        counts = self.counts()
+        means = self.mean(sentiment)
+        summary = {}
+        for topic in self.topics:
+            if counts[topic] > 0:
+                summary[topic] = {
+                    'count': int(counts[topic]),
+                    'positive': int(table.at[topic, 1]) if 1 in table.columns else 0,
+                    'negative': int(table.at[topic, -1]) if -1 in table.columns else 0,
+                    'neutral': int(table.at[topic, 0]) if 0 in table.columns else 0,
+                    'avg_sentiment': means[topic],
+                }
+        return summary
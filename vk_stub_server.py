@@ -0,0 +1,393 @@
+"""
+Локальный сервер-заглушка VK API
+Отвечает на wall.get, wall.getComments, groups.getById, users.get и execute
+данными синтетических стен заданного размера, умеет добавлять задержку и
+ошибки превышения лимита. Нужен для замеров скорости сбора без токена и
+реальной группы (см. benchmark.py)
+
+Запуск:
+    python vk_stub_server.py --port 8080 --posts 5000 --latency 0.05
+
+Парсер направляется на заглушку параметром api_url:
+    VKParser(token, api_url='http://127.0.0.1:8080/method')
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+# Ошибки VK API, которые умеет возвращать заглушка
+ERROR_TOO_MANY_REQUESTS = 6
+ERROR_ACCESS_DENIED = 15
+ERROR_UNKNOWN_METHOD = 3
+
+# Слова для синтетических текстов (есть и эмоционально окрашенные, чтобы анализ не был пустым)
+WORDS = ['врач', 'клиника', 'прием', 'анализ', 'лечение', 'спасибо', 'хорошо', 'плохо',
+         'очередь', 'запись', 'больница', 'помогли', 'ужасно', 'отлично', 'вопрос', 'цена',
+         'доктор', 'диагноз', 'терапевт', 'рекомендую', 'жалоба', 'быстро', 'долго', 'результат']
+
+
+def _text(seed: int, words: int) -> str:
+    rnd = random.Random(seed)
+    return ' '.join(rnd.choice(WORDS) for _ in range(words))
+
+
+class SyntheticWall:
+    """
+    Детерминированная синтетическая стена
+
+    Посты генерируются по индексу, поэтому стена любого размера не занимает память.
+    Пост с индексом 0 - самый новый. Количество комментариев и ответов меняется
+    от поста к посту, в среднем равно comments_per_post и replies_per_comment.
+    """
+
+    def __init__(self, owner_id: int, posts: int = 1000, comments_per_post: int = 5,
+                 replies_per_comment: int = 2, interval: int = 3600,
+                 newest: Optional[int] = None):
+        """
+        Args:
+            owner_id: ID владельца стены
+            posts: Количество постов
+            comments_per_post: Среднее число комментариев первого уровня на пост (не более 499)
+            replies_per_comment: Среднее число ответов на комментарий (не более 499)
+            interval: Интервал между постами (секунды)
+            newest: Дата самого нового поста (по умолчанию - сутки назад)
+        """
+        self.owner_id = owner_id
+        self.posts = posts
+        self.comments_per_post = comments_per_post
+        self.replies_per_comment = replies_per_comment
+        self.interval = interval
+        self.newest = newest if newest is not None else int(time.time()) - 86400
+
+    def top_count(self, post_id: int) -> int:
+        return (post_id * 7919) % (2 * self.comments_per_post + 1)
+
+    def reply_count(self, comment_id: int) -> int:
+        return (comment_id // 1000 * 31) % (2 * self.replies_per_comment + 1)
+
+    def post(self, index: int) -> Dict:
+        post_id = self.posts - index
+        top_ids = [post_id * 1000000 + j * 1000 for j in range(self.top_count(post_id))]
+        total_comments = len(top_ids) + sum(self.reply_count(cid) for cid in top_ids)
+        return {
+            'id': post_id,
+            'owner_id': self.owner_id,
+            'from_id': self.owner_id,
+            'date': self.newest - index * self.interval,
+            'text': _text(post_id, 10 + post_id % 40),
+            'comments': {'count': total_comments},
+            'likes': {'count': (post_id * 13) % 200},
+            'reposts': {'count': (post_id * 7) % 30},
+            'views': {'count': 500 + (post_id * 101) % 5000},
+        }
+
+    def get(self, offset: int = 0, count: int = 20) -> Dict:
+        count = max(0, min(int(count), 100))
+        offset = max(0, int(offset))
+        items = [self.post(i) for i in range(offset, min(offset + count, self.posts))]
+        return {'count': self.posts, 'items': items}
+
+    def get_by_id(self, post_id: int) -> Optional[Dict]:
+        if not 1 <= post_id <= self.posts:
+            return None
+        return self.post(self.posts - post_id)
+
+    def _comment(self, comment_id: int, post_id: int, date: int) -> Dict:
+        return {
+            'id': comment_id,
+            'from_id': 1000 + comment_id % 50000,
+            'post_id': post_id,
+            'owner_id': self.owner_id,
+            'date': min(date, int(time.time())),
+            'text': _text(comment_id, 3 + comment_id % 15),
+            'likes': {'count': comment_id % 17},
+        }
+
+    def _replies(self, post_id: int, parent_id: int, parent_date: int) -> List[Dict]:
+        replies = []
+        for k in range(self.reply_count(parent_id)):
+            reply = self._comment(parent_id + k + 1, post_id, parent_date + (k + 1) * 10)
+            reply['parents_stack'] = [parent_id]
+            reply['reply_to_comment'] = parent_id
+            replies.append(reply)
+        return replies
+
+    def get_comments(self, post_id: int, offset: int = 0, count: int = 10,
+                     thread_items_count: int = 0, comment_id: Optional[int] = None) -> Dict:
+        post = self.get_by_id(post_id)
+        if post is None:
+            raise KeyError(post_id)
+        count = max(0, min(int(count), 100))
+        offset = max(0, int(offset))
+
+        if comment_id is not None:
+            top_date = post['date'] + ((comment_id % 1000000) // 1000 + 1) * 60
+            replies = self._replies(post_id, comment_id, top_date)
+            return {'count': len(replies), 'current_level_count': len(replies),
+                    'items': replies[offset:offset + count]}
+
+        top_total = self.top_count(post_id)
+        items = []
+        for j in range(offset, min(offset + count, top_total)):
+            comment = self._comment(post_id * 1000000 + j * 1000, post_id, post['date'] + (j + 1) * 60)
+            replies = self._replies(post_id, comment['id'], comment['date'])
+            comment['thread'] = {'count': len(replies), 'items': replies[:int(thread_items_count)]}
+            items.append(comment)
+        return {'count': post['comments']['count'], 'current_level_count': top_total, 'items': items}
+
+
+class VKApiError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class StubAPI:
+    """Логика методов API, задержек и ошибок (без HTTP)"""
+
+    def __init__(self, posts: int = 1000, comments_per_post: int = 5, replies_per_comment: int = 2,
+                 interval: int = 3600, latency: float = 0.0, error_rate: float = 0.0,
+                 rps_limit: float = 0, seed: int = 0):
+        """
+        Args:
+            posts: Количество постов на каждой стене
+            comments_per_post: Среднее число комментариев первого уровня на пост
+            replies_per_comment: Среднее число ответов на комментарий
+            interval: Интервал между постами (секунды)
+            latency: Задержка ответа на каждый HTTP-запрос (секунды)
+            error_rate: Доля запросов, на которые возвращается ошибка 6
+            rps_limit: Лимит запросов в секунду на токен (0 - без лимита), при превышении - ошибка 6
+            seed: Зерно генератора случайных ошибок
+        """
+        self.wall_params = dict(posts=posts, comments_per_post=comments_per_post,
+                                replies_per_comment=replies_per_comment, interval=interval)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rps_limit = rps_limit
+        self._random = random.Random(seed)
+        self._walls: Dict[int, SyntheticWall] = {}
+        self._recent: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def wall(self, owner_id) -> SyntheticWall:
+        owner_id = int(owner_id)
+        with self._lock:
+            if owner_id not in self._walls:
+                self._walls[owner_id] = SyntheticWall(owner_id, **self.wall_params)
+            return self._walls[owner_id]
+
+    @staticmethod
+    def resolve_group_id(value: str) -> int:
+        value = str(value).strip().lstrip('-')
+        if value.isdigit():
+            return int(value)
+        return zlib.crc32(value.encode('utf-8')) % 1000000 + 1
+
+    def _check_limits(self, token: str):
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.counters['injected_errors'] += 1
+                raise VKApiError(ERROR_TOO_MANY_REQUESTS, 'Too many requests per second')
+            if self.rps_limit:
+                now = time.monotonic()
+                recent = self._recent.setdefault(token, deque())
+                while recent and now - recent[0] > 1.0:
+                    recent.popleft()
+                if len(recent) >= self.rps_limit:
+                    self.counters['rate_limited'] += 1
+                    raise VKApiError(ERROR_TOO_MANY_REQUESTS, 'Too many requests per second')
+                recent.append(now)
+
+    def handle(self, method: str, params: Dict) -> Dict:
+        """Обработать HTTP-запрос к методу и вернуть тело ответа"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters[f"method:{method}"] += 1
+        try:
+            self._check_limits(params.get('access_token', ''))
+            return {'response': self.call(method, params)}
+        except VKApiError as e:
+            with self._lock:
+                self.counters['errors'] += 1
+            return {'error': {'error_code': e.code, 'error_msg': e.message,
+                              'request_params': [{'key': 'method', 'value': method}]}}
+
+    def call(self, method: str, params: Dict):
+        """Выполнить метод API"""
+        with self._lock:
+            self.counters['calls'] += 1
+        if method == 'execute':
+            return self.execute(params.get('code', ''))
+        if method == 'wall.get':
+            return self.wall(params.get('owner_id', 0)).get(params.get('offset', 0), params.get('count', 20))
+        if method == 'wall.getById':
+            posts = []
+            for ref in str(params.get('posts', '')).split(','):
+                if '_' in ref:
+                    owner_id, post_id = ref.split('_', 1)
+                    post = self.wall(owner_id).get_by_id(int(post_id))
+                    if post:
+                        posts.append(post)
+            return posts
+        if method == 'wall.getComments':
+            try:
+                return self.wall(params.get('owner_id', 0)).get_comments(
+                    int(params['post_id']), params.get('offset', 0), params.get('count', 10),
+                    params.get('thread_items_count', 0),
+                    int(params['comment_id']) if params.get('comment_id') else None
+                )
+            except KeyError:
+                raise VKApiError(ERROR_ACCESS_DENIED, 'Access denied: post was not found')
+        if method == 'groups.getById':
+            ids = str(params.get('group_ids') or params.get('group_id') or '').split(',')
+            groups = []
+            for value in filter(None, ids):
+                group_id = self.resolve_group_id(value)
+                groups.append({'id': group_id, 'name': f'Группа {group_id}',
+                               'screen_name': value if not value.lstrip('-').isdigit() else f'club{group_id}',
+                               'is_closed': 0, 'type': 'group', 'members_count': 1000 + group_id % 100000})
+            return groups
+        if method == 'users.get':
+            ids = str(params.get('user_ids') or '').split(',')
+            return [{'id': int(user_id), 'first_name': f'Имя{user_id}', 'last_name': f'Фамилия{user_id}',
+                     'can_access_closed': True, 'is_closed': False}
+                    for user_id in ids if user_id.strip().lstrip('-').isdigit()]
+        raise VKApiError(ERROR_UNKNOWN_METHOD, f'Unknown method passed: {method}')
+
+    def execute(self, code: str) -> List:
+        """Выполнить код вида return [API.method({...}), ...]; ошибки вызовов дают False"""
+        results = []
+        for method, params_json in re.findall(r'API\.([\w.]+)\((\{.*?\})\)(?=\s*[,\]])', code):
+            try:
+                results.append(self.call(method, json.loads(params_json)))
+            except VKApiError:
+                results.append(False)
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters)
+
+    def reset_stats(self):
+        with self._lock:
+            self.counters.clear()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1: соединения переиспользуются (keep-alive), как у настоящего API
+    protocol_version = 'HTTP/1.1'
+    api: StubAPI = None
+
+    def _send_json(self, body, status: int = 200):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, params: Dict):
+        path = urlparse(self.path).path
+        if path == '/stats':
+            self._send_json(self.api.stats())
+            return
+        match = re.match(r'^/method/([\w.]+)$', path)
+        if not match:
+            self._send_json({'error': 'not found'}, status=404)
+            return
+        self._send_json(self.api.handle(match.group(1), params))
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self._dispatch({k: v[-1] for k, v in query.items()})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        params = {k: v[-1] for k, v in parse_qs(body).items()}
+        params.update({k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()})
+        self._dispatch(params)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """Сервер-заглушка в фоновом потоке (для тестов и замеров)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, **api_params):
+        """
+        Args:
+            host: Адрес
+            port: Порт (0 - любой свободный)
+            **api_params: Параметры StubAPI (размер стен, задержка, ошибки)
+        """
+        self.api = StubAPI(**api_params)
+        handler = type('Handler', (_Handler,), {'api': self.api})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/method"
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Локальная заглушка VK API')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--posts', type=int, default=1000, help='Постов на каждой стене')
+    arg_parser.add_argument('--comments', type=int, default=5, help='Среднее число комментариев на пост')
+    arg_parser.add_argument('--replies', type=int, default=2, help='Среднее число ответов на комментарий')
+    arg_parser.add_argument('--interval', type=int, default=3600, help='Интервал между постами (секунды)')
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа (секунды)')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов с ошибкой 6')
+    arg_parser.add_argument('--rps-limit', type=float, default=0, help='Лимит запросов в секунду на токен')
+    args = arg_parser.parse_args()
+
+    server = StubServer(args.host, args.port, posts=args.posts, comments_per_post=args.comments,
+                        replies_per_comment=args.replies, interval=args.interval,
+                        latency=args.latency, error_rate=args.error_rate, rps_limit=args.rps_limit)
+    print(f"✓ Заглушка VK API запущена: {server.api_url}")
+    print(f"  Статистика запросов: http://{args.host}:{args.port}/stats")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nОстановка сервера")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()